@@ -0,0 +1,290 @@
+"""
+Score ATS local : couverture pondérée des mots-clés de l'offre dans le CV
+
+- tokenisation et racinisation légère (français, anglais, néerlandais)
+- termes de l'offre issus de l'analyse partagée (job_analysis.py) :
+  termes techniques (poids 3), compétences demandées (poids 2), autres
+  mots-clés fréquents (poids 1). Hors taxonomie et termes techniques, un
+  mot ne compte que s'il peut désigner une compétence : ni mot générique
+  de l'offre (_GENERIC_TERMS, par langue), ni verbe conjugué ou participe
+  ("recherchons", "concevez", "recherché"), et, pour les mots-clés
+  fréquents, présent au moins deux fois
+- compétences de la taxonomie (skill_taxonomy.py) reconnues sous leurs
+  synonymes ("JS" = "JavaScript", "Excel" = "Microsoft Excel") : poids 3,
+  2 pour les langues et savoir-être ; un seul passage sur le CV
+- score = 85 % couverture pondérée + 15 % structure du CV (rubriques, e-mail)
+
+Les expressions régulières et tables de racinisation sont compilées à
+l'import ; le profil de chaque offre est mémorisé. Un score prend
+moins d'une milliseconde (voir benchmarks/bench_ats_scoring.py).
+"""
+import re
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+from job_analysis import STOPWORDS, analyze_job_description, extract_tech_terms
+from skill_taxonomy import ACCENT_FOLD, TAXONOMY, TOKEN_PATTERN, longest_matches
+from skill_taxonomy import normalize_token as skill_form
+
+SCORER_VERSION = "3"
+
+TECH_WEIGHT = 3.0
+REQUIRED_WEIGHT = 2.0
+KEYWORD_WEIGHT = 1.0
+COVERAGE_SHARE = 0.85
+
+MAX_REPORTED_TERMS = 15
+PROFILE_CACHE_SIZE = 256
+
+# Accents retirés mot par mot (mémorisé) : "Expérience" et "experience" se confondent
+_FOLD = ACCENT_FOLD
+# Même découpage que la taxonomie : "c++", "c#", ".net", "node.js" restent entiers
+_TOKEN = TOKEN_PATTERN
+_ALL_STOPWORDS = {word.translate(_FOLD) for words in STOPWORDS.values() for word in words}
+# Termes d'offre trop génériques pour compter comme mots-clés (formes sans accents)
+_GENERIC_TERMS_BY_LANGUAGE = {
+    "french": {
+        "ans", "annee", "annees", "minimum", "maitrise", "connaissance", "connaissances",
+        "bonne", "bon", "bonnes", "bons", "excellent", "excellente", "sein", "esprit", "capacite",
+        "profil", "poste", "mission", "missions", "professionnel", "professionnelle",
+        "nouveau", "nouvelle", "nouvelles", "nouveaux", "produit", "produits", "plateforme",
+        "fonctionnalite", "fonctionnalites", "equipe", "equipes", "entreprise", "societe",
+        "client", "clients", "groupe", "offre", "contrat", "cdi", "cdd", "h/f", "f/h",
+        "candidat", "candidate", "recherche", "rejoindre", "rejoignez", "participation",
+        "mise", "place", "cadre", "environnement", "projet", "projets", "travail", "sujet",
+        "sujets", "besoin", "besoins", "idealement", "souhaite", "niveau", "domaine",
+        "teletravail", "tickets", "restaurant", "mutuelle", "avantages", "remuneration", "salaire",
+        "similaire", "courant", "ecole", "ingenieur", "diplome", "diplomee", "semaine", "jours",
+    },
+    "english": {
+        "years", "year", "experience", "knowledge", "strong", "good", "excellent", "ability",
+        "plus", "profile", "role", "professional", "new", "product", "platform", "feature",
+        "features", "team", "teams", "company", "client", "clients", "candidate", "join",
+        "looking", "opportunity", "environment", "project", "projects", "work", "working",
+        "level", "field", "ideally", "preferred", "benefits", "salary", "full-time", "part-time",
+    },
+    "dutch": {
+        "jaar", "jaren", "ervaring", "kennis", "goede", "goed", "sterke", "minimaal", "profiel",
+        "functie", "professioneel", "nieuwe", "nieuw", "product", "platform", "team", "teams",
+        "bedrijf", "organisatie", "klant", "klanten", "kandidaat", "zoeken", "zoekt", "wij",
+        "werk", "werken", "project", "projecten", "niveau", "omgeving", "bieden", "salaris",
+    },
+}
+_GENERIC_TERMS = set().union(*_GENERIC_TERMS_BY_LANGUAGE.values())
+# Verbes conjugués et participes (mot brut, avec accents) : pas des compétences.
+# "-ions" (solutions), "-ier" (fichier) et "-ité" (sécurité) sont des noms.
+_VERB_FORMS = {
+    "french": re.compile(r"(?:(?<!i)ons|ez|(?<!i)er|(?<!it)ée?s?)$"),
+    "english": re.compile(r"(?:ed|ly)$"),
+}
+# Un mot-clé fréquent (poids 1) hors taxonomie doit revenir au moins autant de fois dans l'offre
+MIN_KEYWORD_COUNT = 2
+# Catégories de la taxonomie pondérées comme des compétences demandées
+_SOFT_CATEGORIES = {"soft", "language"}
+
+# Suffixes retirés (le plus long d'abord), la racine garde au moins 3 lettres
+_SUFFIXES = {
+    "french": (
+        "issements", "issement", "atrices", "ateurs", "ations", "atrice", "ateur",
+        "ation", "ements", "ement", "euses", "ences", "ances", "iques", "ites",
+        "euse", "eurs", "ence", "ance", "ique", "ions", "ite", "eur", "ion",
+        "ees", "ee", "es", "er", "ez", "e", "s", "x",
+    ),
+    "english": (
+        "ational", "ations", "ation", "ments", "ment", "ness", "ings", "ing",
+        "ities", "ity", "ers", "er", "ies", "ied", "ed", "es", "ly", "e", "s",
+    ),
+    "dutch": (
+        "heden", "ingen", "aars", "heid", "lijk", "ing", "aar", "ers", "en",
+        "er", "e", "s",
+    ),
+}
+_SUFFIX_PATTERNS = {
+    language: re.compile(r"^(.{3,}?)(?:" + "|".join(suffixes) + r")$")
+    for language, suffixes in _SUFFIXES.items()
+}
+
+_SECTIONS = (
+    re.compile(r"exp[ée]rience|parcours|ervaring"),
+    re.compile(r"education|formation|opleiding|dipl[ôo]me"),
+    re.compile(r"skills|comp[ée]tences|vaardigheden|competenties"),
+    re.compile(r"@[a-z0-9-]+\.[a-z]"),
+)
+
+ProfileKey = Union[str, int]  # racine d'un mot ou identifiant de compétence
+_profiles: "OrderedDict[str, Tuple[str, List[Tuple[ProfileKey, str, float]]]]" = OrderedDict()
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str, language: str) -> str:
+    """Racine d'un mot replié (les termes techniques restent intacts)"""
+    if not token.isalpha() or len(token) <= 4:
+        return token
+    pattern = _SUFFIX_PATTERNS.get(language, _SUFFIX_PATTERNS["english"])
+    # Deux passes : "management" -> "manage" -> "manag" (comme "manager")
+    for _ in range(2):
+        match = pattern.match(token)
+        if not match:
+            break
+        token = match.group(1)
+    return token
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token: str) -> Optional[str]:
+    """Mot sans accents ni ponctuation finale, None pour les mots outils et nombres"""
+    token = token.rstrip(".-").translate(_FOLD)
+    if token in _ALL_STOPWORDS or token.replace(".", "").isdigit():
+        return None
+    if len(token) < 2 and token.isalpha():
+        return None
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots normalisés hors mots outils"""
+    return [
+        token for token in map(normalize_token, _TOKEN.findall(text.lower()))
+        if token
+    ]
+
+
+def _profile_language(words: Counter) -> str:
+    """Langue d'un CV d'après les mots outils (comptés une fois pour le score)"""
+    scores = {
+        language: sum(words[word] for word in stopwords)
+        for language, stopwords in STOPWORDS.items()
+    }
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else "english"
+
+
+def stem_set(words, language: str) -> set:
+    """Racines des mots (bruts, en minuscules) d'un texte"""
+    stems = set()
+    for word in words:
+        token = normalize_token(word)
+        if token:
+            stems.add(stem(token, language))
+    return stems
+
+
+def skill_matches(raw_words: List[str]) -> List[Tuple[int, int, int]]:
+    """Compétences de la taxonomie dans une suite de mots bruts (id, début, fin)"""
+    return longest_matches(TAXONOMY.scan(raw_words))
+
+
+def skill_like(word: str, language: str) -> bool:
+    """Mot brut (minuscules, accents) qui peut désigner une compétence : ni générique ni verbe conjugué"""
+    if normalize_token(word) in _GENERIC_TERMS:
+        return False
+    pattern = _VERB_FORMS.get(language)
+    return not (pattern and word.isalpha() and pattern.search(word))
+
+
+def _build_profile(analysis: dict) -> List[Tuple[ProfileKey, str, float]]:
+    """Termes pondérés de l'offre : (racine ou id de compétence, forme affichée, poids)"""
+    language = analysis["language"]
+    terms: Dict[ProfileKey, Tuple[str, float]] = {}
+
+    # Les mots d'une compétence reconnue ne comptent pas une seconde fois seuls
+    raw = _TOKEN.findall(analysis["cleaned_text"].lower())
+    covered = set()
+    for skill_id, start, end in skill_matches(raw):
+        category = TAXONOMY.categories[skill_id]
+        weight = REQUIRED_WEIGHT if category in _SOFT_CATEGORIES else TECH_WEIGHT
+        terms[skill_id] = (TAXONOMY.names[skill_id], weight)
+        covered.update(skill_form(word) for word in raw[start:end])
+
+    counts = Counter(normalize_token(word) for word in raw)
+
+    def add(display: str, weight: float, tech: bool = False, min_count: int = 1):
+        words = [(normalize_token(word), word) for word in _TOKEN.findall(display.lower())]
+        words = [(token, word) for token, word in words if token]
+        tokens = [
+            token for token, word in words
+            if token not in _GENERIC_TERMS and counts[token] >= min_count and (tech or skill_like(word, language))
+        ]
+        # Forme affichée : le terme d'origine s'il tient en un mot, sinon le mot retenu
+        whole = len(words) == 1
+        for token in tokens:
+            if skill_form(token) in covered:
+                continue
+            key = stem(token, language)
+            if key not in terms or terms[key][1] < weight:
+                terms[key] = (display if whole else token, weight)
+
+    for keyword in analysis["keywords"]:
+        add(keyword, KEYWORD_WEIGHT, min_count=MIN_KEYWORD_COUNT)
+    for skill in analysis["required_skills"]:
+        add(skill, REQUIRED_WEIGHT)
+    for term in extract_tech_terms(analysis["cleaned_text"]):
+        add(term, TECH_WEIGHT, tech=True)
+    return [(key, display, weight) for key, (display, weight) in terms.items()]
+
+
+def job_profile(job_description: str) -> Tuple[str, List[Tuple[ProfileKey, str, float]]]:
+    """Langue et termes pondérés d'une offre (mémorisés par texte de l'offre)"""
+    cached = _profiles.get(job_description)
+    if cached is not None:
+        _profiles.move_to_end(job_description)
+        return cached
+    analysis = analyze_job_description(job_description)
+    cached = analysis["language"], _build_profile(analysis)
+    _profiles[job_description] = cached
+    if len(_profiles) > PROFILE_CACHE_SIZE:
+        _profiles.popitem(last=False)
+    return cached
+
+
+def structure_score(lowered_cv: str) -> float:
+    """Part des rubriques attendues présentes (expérience, formation, compétences, e-mail)"""
+    return sum(1 for pattern in _SECTIONS if pattern.search(lowered_cv)) / len(_SECTIONS)
+
+
+def score_cv(cv_text: str, job_description: str) -> dict:
+    """
+    Score ATS (0-100) d'un CV pour une offre, avec les termes de l'offre
+    trouvés et manquants (les plus importants d'abord).
+    """
+    job_language, profile = job_profile(job_description)
+    lowered = cv_text.lower()
+    raw = _TOKEN.findall(lowered)
+    words = Counter(raw)
+    cv_language = _profile_language(words)
+    cv_keys = stem_set(words, cv_language)
+    if cv_language != job_language:
+        cv_keys |= stem_set(words, job_language)
+    cv_keys.update(skill_id for skill_id, _, _ in skill_matches(raw))
+
+    matched, missing = [], []
+    matched_weight = total_weight = 0.0
+    for key, display, weight in profile:
+        total_weight += weight
+        if key in cv_keys:
+            matched_weight += weight
+            matched.append((weight, display))
+        else:
+            missing.append((weight, display))
+
+    structure = structure_score(lowered)
+    if total_weight:
+        coverage = matched_weight / total_weight
+        score = 100 * (COVERAGE_SHARE * coverage + (1 - COVERAGE_SHARE) * structure)
+    else:
+        coverage = None  # offre sans terme exploitable : structure seule
+        score = 100 * structure
+
+    def top(terms):
+        return [display for _, display in sorted(terms, key=lambda t: -t[0])[:MAX_REPORTED_TERMS]]
+
+    return {
+        "score": int(round(score)),
+        "coverage": round(coverage, 3) if coverage is not None else None,
+        "structure": round(structure, 2),
+        "matched": top(matched),
+        "missing": top(missing),
+        "language": job_language,
+        "version": SCORER_VERSION,
+    }
@@ -0,0 +1,87 @@
+"""
+Disjoncteur (circuit breaker) pour un service amont
+
+Après failure_threshold échecs consécutifs (timeouts, erreurs réseau, 5xx),
+le disjoncteur s'ouvre : les appels échouent immédiatement au lieu d'attendre
+un service en panne. Après reset_timeout secondes, un seul appel de test est
+autorisé (semi-ouvert) ; s'il réussit le circuit se referme, sinon il se
+rouvre pour un nouveau délai.
+"""
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Appel refusé : le service amont est considéré indisponible"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} temporairement indisponible, nouvel essai dans {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Disjoncteur fermé / ouvert / semi-ouvert"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._changed_at = time.monotonic()
+        # Appel de test en cours (semi-ouvert) : expire s'il ne rend jamais la main
+        self._probe_deadline = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        icons = {CLOSED: "✅", OPEN: "🛑", HALF_OPEN: "🔍"}
+        print(f"{icons[state]} Disjoncteur {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._changed_at = time.monotonic()
+        if state == OPEN:
+            self.opened += 1
+            self._opened_at = self._changed_at
+
+    def check(self):
+        """Autoriser l'appel ou relever CircuitOpen"""
+        now = time.monotonic()
+        if self.state == OPEN:
+            retry_in = self._opened_at + self.reset_timeout - now
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpen(self.name, retry_in)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if now < self._probe_deadline:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self._probe_deadline - now)
+            self._probe_deadline = now + self.reset_timeout
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probe_deadline = 0.0
+        self._transition(CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_deadline = 0.0
+        # Déjà ouvert (échec d'un appel parti avant l'ouverture) : le délai ne repart pas,
+        # _opened_at n'est fixé qu'au passage à OPEN (_transition)
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._transition(OPEN)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "seconds_in_state": round(time.monotonic() - self._changed_at, 1),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
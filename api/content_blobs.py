@@ -0,0 +1,230 @@
+"""
+Textes stockés une seule fois, compressés et adressés par leur contenu
+
+Chaque document generated_cvs recopiait le CV d'origine, le CV optimisé et
+l'offre d'emploi : le même CV et la même offre étaient stockés des
+dizaines de fois. Chaque texte est maintenant un blob de la collection
+content_blobs, identifié par le SHA-256 de son contenu et compressé
+(zstd si zstandard est installé, sinon zlib) ; generated_cvs ne garde que
+les identifiants (champs *_blob) : un client qui lit generated_cvs
+directement n'y trouve plus original_content / optimized_content /
+job_description, seulement original_content_blob, etc. (textes à relire
+par l'API, voir resolve_generated_cvs).
+
+- Écriture : les blobs sont ajoutés au même WriteBatch que les CV qui les
+  référencent (pas de référence orpheline) ; un blob déjà écrit par ce
+  worker n'est pas réécrit.
+- Lecture : les blobs d'un historique sont lus en un seul get_all,
+  chacun une fois, et les textes décompressés restent en cache.
+- Les anciens documents (textes en clair) sont relus tels quels.
+
+Les CV (PERSONAL_FIELDS) sont des données personnelles : leur blob
+appartient à un utilisateur (identifiant = SHA-256 de l'uid et du texte,
+champ owner), il n'est partagé qu'entre ses propres CV générés. Les offres
+d'emploi, textes publics, restent partagées entre utilisateurs.
+delete_user_content supprime l'historique d'un utilisateur et ses blobs.
+
+Un blob est immuable : un identifiant désigne toujours le même texte. Le
+format (codec, size) est écrit dans chaque blob ; un nouveau codec s'ajoute
+à decode_blob sans réécrire les anciens. stored_blobs (par worker, avec
+TTL) n'est qu'une indication : au pire, un blob identique est réécrit.
+"""
+import hashlib
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from result_cache import ResultCache
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+BLOB_COLLECTION = "content_blobs"
+# Champs texte de generated_cvs -> champ de référence
+BLOB_FIELDS = {
+    "original_content": "original_content_blob",
+    "optimized_content": "optimized_content_blob",
+    "job_description": "job_description_blob",
+}
+# Textes propres à un utilisateur : blob à son nom, supprimé avec son historique
+PERSONAL_FIELDS = ("original_content", "optimized_content")
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", 6))
+# Champs d'un historique hors textes
+HISTORY_METADATA = ["created_at", "ats_score", "prompt_version", "is_downloaded"]
+
+# Identifiants déjà écrits (par ce worker) et textes déjà relus
+stored_blobs = ResultCache("content_blobs_stored", max_entries=int(os.getenv("BLOB_CACHE_SIZE", 5000)), ttl=86400)
+blob_text_cache = ResultCache("content_blobs", max_entries=int(os.getenv("BLOB_CACHE_SIZE", 5000)), ttl=3600)
+
+# text_bytes : tous les textes sauvegardés ; raw_bytes / stored_bytes : blobs écrits, avant / après compression
+_stats = {"blobs_written": 0, "blobs_skipped": 0, "text_bytes": 0, "raw_bytes": 0, "stored_bytes": 0, "blobs_read": 0,
+          "blobs_deleted": 0}
+
+
+def blob_id(text: str, owner: Optional[str] = None) -> str:
+    """SHA-256 du texte, précédé de l'uid pour un blob personnel"""
+    data = text.encode("utf-8")
+    if owner is not None:
+        data = owner.encode("utf-8") + b"\0" + data
+    return hashlib.sha256(data).hexdigest()
+
+
+def encode_blob(text: str) -> dict:
+    raw = text.encode("utf-8")
+    if ZSTD_AVAILABLE:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=BLOB_COMPRESSION_LEVEL).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, BLOB_COMPRESSION_LEVEL)
+    if len(data) >= len(raw):
+        codec, data = "raw", raw
+    return {"codec": codec, "data": data, "size": len(raw)}
+
+
+def decode_blob(blob: dict) -> str:
+    codec, data = blob["codec"], bytes(blob["data"])
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Blob zstd illisible : zstandard n'est pas installé")
+        data = zstandard.ZstdDecompressor().decompress(data, max_output_size=blob.get("size") or 0)
+    elif codec == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+def add_to_batch(db, batch, cv_data: dict, written: set) -> dict:
+    """
+    Ajouter au batch les blobs de cv_data pas encore écrits (written : ceux
+    déjà ajoutés à ce batch) et retourner une copie de cv_data où les textes
+    sont remplacés par leurs références. cv_data n'est pas modifié : un lot
+    en échec peut être réécrit. Les CV sont écrits dans des blobs au nom de
+    cv_data["user_id"].
+    """
+    cv_data = dict(cv_data)
+    for field, ref_field in BLOB_FIELDS.items():
+        text = cv_data.pop(field, None)
+        if text is None:
+            continue
+        owner = cv_data.get("user_id") if field in PERSONAL_FIELDS else None
+        key = blob_id(text, owner)
+        cv_data[ref_field] = key
+        _stats["text_bytes"] += len(text.encode("utf-8"))
+        if key in written or stored_blobs.get(key):
+            _stats["blobs_skipped"] += 1
+            continue
+        blob = encode_blob(text)
+        if owner is not None:
+            blob["owner"] = owner
+        batch.set(db.collection(BLOB_COLLECTION).document(key), blob)
+        written.add(key)
+        _stats["raw_bytes"] += blob["size"]
+        _stats["stored_bytes"] += len(blob["data"])
+    return cv_data
+
+
+def mark_stored(keys: Iterable[str]):
+    """Après le commit du batch qui contient ces blobs"""
+    for key in keys:
+        stored_blobs.set(key, True)
+        _stats["blobs_written"] += 1
+
+
+def load_texts(db, keys: Iterable[str]) -> Dict[str, str]:
+    """Textes des blobs demandés (cache, sinon un seul get_all pour les manquants)"""
+    texts = {}
+    missing = []
+    for key in set(keys):
+        text = blob_text_cache.get(key)
+        if text is None:
+            missing.append(key)
+        else:
+            texts[key] = text
+    if missing:
+        refs = [db.collection(BLOB_COLLECTION).document(key) for key in missing]
+        for snapshot in db.get_all(refs):
+            if snapshot.exists:
+                text = decode_blob(snapshot.to_dict())
+                blob_text_cache.set(snapshot.id, text)
+                texts[snapshot.id] = text
+                _stats["blobs_read"] += 1
+    return texts
+
+
+def history_fields(fields: Iterable[str]) -> List[str]:
+    """Champs à lire dans generated_cvs : métadonnées, références, et textes en clair des anciens documents"""
+    fields = list(fields)
+    return HISTORY_METADATA + [BLOB_FIELDS[field] for field in fields] + fields
+
+
+def resolve_generated_cvs(db, documents: List[dict], fields: Iterable[str] = tuple(BLOB_FIELDS)) -> List[dict]:
+    """Remettre les textes demandés dans des documents generated_cvs (anciens documents : textes en clair), retirer les autres"""
+    ref_fields = [BLOB_FIELDS[field] for field in fields]
+    texts = load_texts(db, (doc[ref] for doc in documents for ref in ref_fields if doc.get(ref)))
+    for doc in documents:
+        for field, ref_field in BLOB_FIELDS.items():
+            key = doc.pop(ref_field, None)
+            if field not in fields:
+                doc.pop(field, None)
+            elif key is not None:
+                doc[field] = texts.get(key)
+    return documents
+
+
+def _delete_refs(db, refs: list):
+    """Suppressions par WriteBatch (500 écritures au plus)"""
+    for start in range(0, len(refs), 500):
+        batch = db.batch()
+        for ref in refs[start:start + 500]:
+            batch.delete(ref)
+        batch.commit()
+
+
+def _referenced(db, key: str) -> bool:
+    """Un document generated_cvs référence-t-il encore ce blob ?"""
+    for ref_field in BLOB_FIELDS.values():
+        if list(db.collection("generated_cvs").where(ref_field, "==", key).limit(1).stream()):
+            return True
+    return False
+
+
+def delete_user_content(db, uid: str) -> dict:
+    """
+    Supprimer l'historique (generated_cvs) d'un utilisateur et les blobs de
+    ses CV : ceux à son nom, et ceux d'avant les blobs personnels (sans
+    owner, identifiant = hash du texte seul) qui ne sont plus référencés.
+    Les offres d'emploi partagées restent. Synchrone (appels Firestore).
+    """
+    personal_refs = [BLOB_FIELDS[field] for field in PERSONAL_FIELDS]
+    documents = list(db.collection("generated_cvs").where("user_id", "==", uid).select(personal_refs).stream())
+    legacy_keys = set()
+    for doc in documents:
+        data = doc.to_dict() or {}
+        legacy_keys.update(data[ref] for ref in personal_refs if data.get(ref))
+    _delete_refs(db, [doc.reference for doc in documents])
+
+    keys = {blob.id for blob in db.collection(BLOB_COLLECTION).where("owner", "==", uid).select(["owner"]).stream()}
+    legacy_keys -= keys
+    if legacy_keys:
+        refs = [db.collection(BLOB_COLLECTION).document(key) for key in legacy_keys]
+        for snapshot in db.get_all(refs, field_paths=["owner"]):
+            if snapshot.exists and "owner" not in (snapshot.to_dict() or {}) and not _referenced(db, snapshot.id):
+                keys.add(snapshot.id)
+    _delete_refs(db, [db.collection(BLOB_COLLECTION).document(key) for key in keys])
+
+    for key in keys:
+        stored_blobs.delete(key)
+        blob_text_cache.delete(key)
+    _stats["blobs_deleted"] += len(keys)
+    return {"generated_cvs": len(documents), "blobs": len(keys)}
+
+
+def content_blob_stats() -> dict:
+    stats = dict(_stats)
+    stats["codec"] = "zstd" if ZSTD_AVAILABLE else "zlib"
+    stats["compression_ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 2) if stats["stored_bytes"] else 0.0
+    # Compression et déduplication ensemble
+    stats["storage_ratio"] = round(stats["text_bytes"] / stats["stored_bytes"], 2) if stats["stored_bytes"] else 0.0
+    stats["text_cache"] = blob_text_cache.stats()
+    return stats
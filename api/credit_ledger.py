@@ -0,0 +1,367 @@
+"""
+Grand livre des crédits : soldes modifiés atomiquement, écritures en append-only
+
+Les crédits étaient lus, modifiés en Python puis réécrits : deux requêtes
+simultanées perdaient une mise à jour. Chaque mouvement passe désormais
+par une transaction Firestore (débit : le solde est vérifié et décrémenté
+dans la même transaction) et laisse une écriture dans la collection
+credit_ledger (uid, delta, motif, solde après, référence).
+
+- Écritures du livre regroupées : celles des débits et crédits ordinaires
+  sont mises en file et écrites par lots (LEDGER_BATCH_SIZE, au plus tard
+  toutes les LEDGER_FLUSH_INTERVAL secondes, et à l'arrêt).
+- Paiements idempotents : un crédit avec idempotency_key (session Stripe)
+  écrit son entrée dans la transaction ; la confirmation et le webhook ne
+  peuvent plus créditer deux fois la même session.
+- Comptes très sollicités (CREDIT_HOT_ACCOUNTS) : le solde est réparti sur
+  CREDIT_SHARDS compteurs (le champ credits du document utilisateur, puis
+  users/{uid}/credit_shards/{i}), ce qui évite la limite d'écritures par
+  document.
+
+MemoryCreditStore reproduit ce comportement en mémoire (verrou et latence
+par document) pour les tests de charge, voir benchmarks/bench_credit_ledger.py.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from firebase_admin import firestore
+    FIRESTORE_AVAILABLE = True
+except ImportError:
+    FIRESTORE_AVAILABLE = False
+
+LEDGER_COLLECTION = "credit_ledger"
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", 100))
+LEDGER_FLUSH_INTERVAL = float(os.getenv("LEDGER_FLUSH_INTERVAL", 2))
+CREDIT_SHARDS = int(os.getenv("CREDIT_SHARDS", 8))
+CREDIT_HOT_ACCOUNTS = {uid.strip() for uid in os.getenv("CREDIT_HOT_ACCOUNTS", "").split(",") if uid.strip()}
+# Limite Firestore d'un WriteBatch
+MAX_BATCH_WRITES = 500
+
+
+class InsufficientCredits(Exception):
+    """Solde inférieur au débit demandé"""
+
+
+class UnknownAccount(Exception):
+    """Pas de document utilisateur"""
+
+
+def ledger_entry(uid: str, delta: int, reason: str, balance: Optional[int], reference: Optional[str] = None) -> dict:
+    return {
+        "uid": uid,
+        "delta": delta,
+        "reason": reason,
+        "balance_after": balance,
+        "reference": reference,
+        # Heure du mouvement (Timestamp Firestore), même type pour les entrées par lots et idempotentes
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+class FirestoreCreditStore:
+    """Soldes dans users/{uid} (et ses compteurs répartis), livre dans credit_ledger"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _counter(self, uid: str, shard: int):
+        user_ref = self.db.collection('users').document(uid)
+        return user_ref if shard == 0 else user_ref.collection('credit_shards').document(str(shard))
+
+    def debit(self, uid: str, shards: List[int], amount: int) -> int:
+        """Transaction : lire les compteurs, vérifier le total, décrémenter. Retourne le total restant."""
+        refs = [self._counter(uid, shard) for shard in shards]
+
+        @firestore.transactional
+        def run(transaction):
+            snapshots = [ref.get(transaction=transaction) for ref in refs]
+            if shards[0] == 0 and not snapshots[0].exists:
+                raise UnknownAccount(uid)
+            values = [(snapshot.to_dict() or {}).get("credits", 0) if snapshot.exists else 0 for snapshot in snapshots]
+            total = sum(values)
+            if total < amount:
+                raise InsufficientCredits(f"{total} < {amount}")
+            remaining = amount
+            for ref, snapshot, value in zip(refs, snapshots, values):
+                take = min(value, remaining)
+                if take > 0:
+                    transaction.set(ref, {"credits": value - take}, merge=True)
+                    remaining -= take
+            return total - amount
+
+        return run(self.db.transaction())
+
+    def credit(self, uid: str, shard: int, amount: int, entry: Optional[dict] = None,
+               entry_id: Optional[str] = None) -> Tuple[Optional[int], bool]:
+        """
+        Ajouter amount au compteur. Avec entry_id, l'entrée du livre est
+        créée dans la même transaction ; si elle existe déjà, rien n'est
+        ajouté. Retourne (solde du compteur 0 ou None si compteur réparti, appliqué).
+        """
+        user_ref = self.db.collection('users').document(uid)
+        counter_ref = self._counter(uid, shard)
+        entry_ref = self.db.collection(LEDGER_COLLECTION).document(entry_id) if entry_id else None
+
+        @firestore.transactional
+        def run(transaction):
+            if entry_ref is not None:
+                existing = entry_ref.get(transaction=transaction)
+                if existing.exists:
+                    return existing.to_dict().get("balance_after"), False
+            balance = None
+            if shard == 0:
+                snapshot = user_ref.get(transaction=transaction)
+                if not snapshot.exists:
+                    raise UnknownAccount(uid)
+                balance = (snapshot.to_dict() or {}).get("credits", 0) + amount
+                transaction.update(user_ref, {"credits": balance})
+            else:
+                transaction.set(counter_ref, {"credits": firestore.Increment(amount)}, merge=True)
+            if entry_ref is not None:
+                transaction.create(entry_ref, {**entry, "balance_after": balance})
+            return balance, True
+
+        if shard != 0 and not user_ref.get().exists:
+            raise UnknownAccount(uid)
+        return run(self.db.transaction())
+
+    def balance(self, uid: str, shards: Iterable[int]) -> Optional[int]:
+        total = 0
+        for shard in shards:
+            snapshot = self._counter(uid, shard).get(field_paths=["credits"])
+            if shard == 0 and not snapshot.exists:
+                return None
+            total += (snapshot.to_dict() or {}).get("credits", 0) if snapshot.exists else 0
+        return total
+
+    def append(self, entries: List[dict]):
+        for start in range(0, len(entries), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for entry in entries[start:start + MAX_BATCH_WRITES]:
+                batch.set(self.db.collection(LEDGER_COLLECTION).document(), entry)
+            batch.commit()
+
+
+class MemoryCreditStore:
+    """
+    Équivalent en mémoire de FirestoreCreditStore pour les tests de charge :
+    un verrou par compteur, tenu pendant latency secondes par transaction
+    (aller-retour simulé), comme la contention d'un document Firestore.
+    """
+
+    def __init__(self, balances: Optional[Dict[str, int]] = None, latency: float = 0.0):
+        self.latency = latency
+        self.counters: Dict[Tuple[str, int], int] = {(uid, 0): credits for uid, credits in (balances or {}).items()}
+        self.entries: List[dict] = []
+        self.keyed: Dict[str, dict] = {}
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.transactions = 0
+
+    def _lock(self, key: tuple) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _transaction(self, keys: List[Tuple[str, int]]):
+        locks = [self._lock(key) for key in sorted(set(keys))]
+        for lock in locks:
+            lock.acquire()
+        self.transactions += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return locks
+
+    def debit(self, uid: str, shards: List[int], amount: int) -> int:
+        keys = [(uid, shard) for shard in shards]
+        locks = self._transaction(keys)
+        try:
+            if shards[0] == 0 and (uid, 0) not in self.counters:
+                raise UnknownAccount(uid)
+            total = sum(self.counters.get(key, 0) for key in keys)
+            if total < amount:
+                raise InsufficientCredits(f"{total} < {amount}")
+            remaining = amount
+            for key in keys:
+                take = min(self.counters.get(key, 0), remaining)
+                self.counters[key] = self.counters.get(key, 0) - take
+                remaining -= take
+            return total - amount
+        finally:
+            for lock in locks:
+                lock.release()
+
+    def credit(self, uid: str, shard: int, amount: int, entry: Optional[dict] = None,
+               entry_id: Optional[str] = None) -> Tuple[Optional[int], bool]:
+        if (uid, 0) not in self.counters:
+            raise UnknownAccount(uid)
+        # Verrou de la clé pris avant ceux des compteurs : deux crédits de même clé
+        # sur des compteurs différents ne peuvent pas s'appliquer tous les deux
+        with self._lock(("ledger", entry_id)) if entry_id is not None else nullcontext():
+            locks = self._transaction([(uid, shard)])
+            try:
+                if entry_id is not None and entry_id in self.keyed:
+                    return self.keyed[entry_id]["balance_after"], False
+                self.counters[(uid, shard)] = self.counters.get((uid, shard), 0) + amount
+                balance = self.counters[(uid, 0)] if shard == 0 else None
+                if entry_id is not None:
+                    with self._guard:
+                        self.keyed[entry_id] = {**entry, "balance_after": balance}
+                        self.entries.append(self.keyed[entry_id])
+                return balance, True
+            finally:
+                for lock in locks:
+                    lock.release()
+
+    def balance(self, uid: str, shards: Iterable[int]) -> Optional[int]:
+        if (uid, 0) not in self.counters:
+            return None
+        return sum(self.counters.get((uid, shard), 0) for shard in shards)
+
+    def append(self, entries: List[dict]):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._guard:
+            self.entries.extend(entries)
+
+
+class CreditLedger:
+    """Débits et crédits atomiques, écritures du livre regroupées par lots"""
+
+    def __init__(self, store, batch_size: int = LEDGER_BATCH_SIZE, flush_interval: float = LEDGER_FLUSH_INTERVAL,
+                 hot_accounts: Iterable[str] = CREDIT_HOT_ACCOUNTS, shards: int = CREDIT_SHARDS):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hot_accounts = set(hot_accounts)
+        self.shards = max(1, shards)
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.debits = 0
+        self.credits = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.entries_written = 0
+        self.batches_written = 0
+        self.flush_errors = 0
+
+    def sharded(self, uid: str) -> bool:
+        return uid in self.hot_accounts and self.shards > 1
+
+    def _shards(self, uid: str) -> List[int]:
+        return list(range(self.shards)) if self.sharded(uid) else [0]
+
+    def debit(self, uid: str, amount: int, reason: str, reference: Optional[str] = None) -> int:
+        """Retirer amount crédits ; retourne le nouveau solde. Lève InsufficientCredits / UnknownAccount."""
+        try:
+            if self.sharded(uid):
+                # Un compteur au hasard d'abord (pas de contention), tous si son solde ne suffit pas
+                try:
+                    self.store.debit(uid, [random.randrange(self.shards)], amount)
+                except InsufficientCredits:
+                    self.store.debit(uid, self._shards(uid), amount)
+                balance = self.store.balance(uid, self._shards(uid))
+            else:
+                balance = self.store.debit(uid, [0], amount)
+        except (InsufficientCredits, UnknownAccount):
+            with self._lock:
+                self.rejected += 1
+            raise
+        self._record(ledger_entry(uid, -amount, reason, balance, reference))
+        with self._lock:
+            self.debits += 1
+        return balance
+
+    def credit(self, uid: str, amount: int, reason: str, reference: Optional[str] = None,
+               idempotency_key: Optional[str] = None) -> Tuple[int, bool]:
+        """
+        Ajouter amount crédits ; retourne (nouveau solde, appliqué). Avec
+        idempotency_key, un second appel pour la même clé n'ajoute rien
+        (appliqué = False, solde enregistré lors du premier).
+        """
+        shard = random.randrange(self.shards) if self.sharded(uid) else 0
+        entry = ledger_entry(uid, amount, reason, None, reference)
+        balance, applied = self.store.credit(uid, shard, amount, entry if idempotency_key else None, idempotency_key)
+        if balance is None:
+            balance = self.store.balance(uid, self._shards(uid))
+        with self._lock:
+            if applied:
+                self.credits += 1
+            else:
+                self.duplicates += 1
+        if applied and not idempotency_key:
+            self._record({**entry, "balance_after": balance})
+        return balance, applied
+
+    def balance(self, uid: str) -> Optional[int]:
+        return self.store.balance(uid, self._shards(uid))
+
+    # --- Écritures du livre par lots ---
+
+    def _record(self, entry: dict):
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+        if full or self._thread is None:
+            # Sans flusher en arrière-plan (tests, scripts) : écriture immédiate
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+            if not entries:
+                return
+            try:
+                self.store.append(entries)
+                with self._lock:
+                    self.entries_written += len(entries)
+                    self.batches_written += 1
+            except Exception as e:
+                # Remises en file : réessayées au prochain lot
+                with self._lock:
+                    self._pending[:0] = entries
+                    self.flush_errors += 1
+                print(f"⚠️ Livre des crédits: {len(entries)} écritures non enregistrées ({e})")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="credit-ledger", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Arrêter le flusher et écrire les entrées en attente"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "debits": self.debits,
+                "credits": self.credits,
+                "duplicate_credits": self.duplicates,
+                "rejected": self.rejected,
+                "pending_entries": len(self._pending),
+                "entries_written": self.entries_written,
+                "batches_written": self.batches_written,
+                "flush_errors": self.flush_errors,
+                "hot_accounts": len(self.hot_accounts),
+                "shards": self.shards,
+            }
+
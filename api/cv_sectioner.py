@@ -0,0 +1,465 @@
+"""
+Découpage local d'un CV en rubriques (sans appel à l'IA)
+
+Remplit les champs de CVParsingResponse en quelques millisecondes à partir
+du texte extrait du PDF : titres de rubriques en français, anglais et
+néerlandais, périodes ("Janvier 2020 - Présent", "2018-2020", "sinds
+2021"), e-mail / téléphone / liens, puces regroupées en descriptions.
+
+Chaque champ reçoit une confiance (0-1) ; "overall" est la moyenne des
+champs essentiels (nom, contact, expériences, formations, compétences).
+/parse-cv ne fait appel à l'IA que pour enrichir le CV selon une offre ou
+quand la confiance est trop basse (CV_SECTIONER_MIN_CONFIDENCE) : pour
+"overall", mais aussi pour les expériences et les formations prises
+séparément ("gate" : la plus basse des trois). Une entrée sans période
+est peu fiable (découpage probablement faux) et fait baisser son champ.
+"""
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from input_compaction import normalize_text
+from skill_taxonomy import ACCENT_FOLD, TAXONOMY
+
+CV_SECTIONER_MIN_CONFIDENCE = float(os.getenv("CV_SECTIONER_MIN_CONFIDENCE", 0.75))
+
+FIELDS = (
+    "name", "contact", "title", "summary", "experience", "education",
+    "technicalSkills", "softSkills", "certifications", "additionalInfo",
+)
+CORE_FIELDS = ("name", "contact", "experience", "education", "technicalSkills")
+# Champs jugés séparément pour décider de se passer de l'IA
+GATE_FIELDS = ("experience", "education")
+
+# Titres de rubriques (minuscules, sans accents ni ponctuation)
+HEADINGS = {
+    "summary": (
+        "profil", "profile", "profil professionnel", "resume", "resume professionnel", "summary",
+        "professional summary", "about me", "a propos", "a propos de moi", "objectif",
+        "objectif professionnel", "objective", "career objective", "profiel", "persoonlijk profiel",
+        "over mij", "samenvatting",
+    ),
+    "experience": (
+        "experience", "experiences", "experience professionnelle", "experiences professionnelles",
+        "parcours professionnel", "historique professionnel", "stages", "work experience",
+        "professional experience", "employment", "employment history", "work history", "career",
+        "internships", "werkervaring", "ervaring", "beroepservaring", "professionele ervaring",
+        "loopbaan", "werkgeschiedenis", "stages en werkervaring",
+    ),
+    "education": (
+        "formation", "formations", "education", "etudes", "diplomes", "diplomes et formations",
+        "formation academique", "parcours academique", "cursus", "academic background",
+        "education and training", "opleiding", "opleidingen", "studies", "onderwijs", "scholing",
+    ),
+    "skills": (
+        "competences", "competences techniques", "competences cles", "competences informatiques",
+        "outils", "logiciels", "informatique", "skills", "technical skills", "hard skills",
+        "key skills", "core competencies", "it skills", "tools", "technologies",
+        "tools technologies", "software", "vaardigheden", "technische vaardigheden",
+        "competenties", "kennis", "kennis en vaardigheden", "ict vaardigheden",
+    ),
+    "soft_skills": (
+        "soft skills", "savoir etre", "qualites", "atouts", "qualites personnelles",
+        "competences personnelles", "competences comportementales", "personal skills",
+        "interpersonal skills", "strengths", "persoonlijke vaardigheden", "eigenschappen",
+        "sterke punten",
+    ),
+    "certifications": (
+        "certifications", "certification", "certificats", "certificates", "licenses",
+        "licenses and certifications", "licences et certifications", "certificaten",
+        "certificeringen",
+    ),
+    "languages": (
+        "langues", "languages", "language skills", "competences linguistiques", "talen",
+        "talenkennis",
+    ),
+    "additional": (
+        "centres d interet", "centres d interets", "loisirs", "interets", "hobbies", "hobby s",
+        "interests", "informations complementaires", "additional information", "divers",
+        "autres", "projets", "projects", "benevolat", "volunteering", "publications",
+        "references", "interesses", "overige", "projecten", "vrijwilligerswerk",
+    ),
+    "contact": (
+        "contact", "coordonnees", "informations personnelles", "personal information",
+        "personal details", "contactgegevens", "persoonlijke gegevens",
+    ),
+}
+_HEADING_SECTION = {heading: section for section, headings in HEADINGS.items() for heading in headings}
+MAX_HEADING_WORDS = 5
+
+_MONTH = (
+    r"(?:janvier|janv|f[ée]vrier|f[ée]vr|f[ée]v|mars|avril|avr|mai|juin|juillet|juil|ao[uû]t|"
+    r"septembre|sept|octobre|novembre|d[ée]cembre|d[ée]c|"
+    r"january|jan|february|feb|march|mar|april|apr|may|june|jun|july|jul|august|aug|"
+    r"september|sep|october|oct|november|nov|december|"
+    r"januari|februari|maart|mei|juni|juli|augustus|oktober|okt)\.?"
+)
+_DATE = rf"(?:{_MONTH}\s+(?:19|20)\d{{2}}|(?:0?[1-9]|1[0-2])[/.](?:19|20)\d{{2}}|(?:19|20)\d{{2}})"
+_ONGOING = r"(?:pr[ée]sent|aujourd'hui|aujourd’hui|actuel(?:lement)?|en cours|now|present|current|today|heden|nu|huidig)"
+DATE_RANGE = re.compile(
+    rf"(?:(?:depuis|since|sinds)\s+{_DATE}|{_DATE}\s*(?:-|–|—|à|au|to|until|tot|till|→|>)\s*(?:{_DATE}|{_ONGOING}))",
+    re.IGNORECASE,
+)
+SINGLE_DATE = re.compile(rf"\b{_DATE}\b", re.IGNORECASE)
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+URL = re.compile(
+    r"(?:https?://|www\.)\S+|\b(?:linkedin\.com|github\.com|gitlab\.com|behance\.net|dribbble\.com)/\S+",
+    re.IGNORECASE,
+)
+PHONE = re.compile(r"(?<![\w/])(?:\+|00)?\d[\d .\-/()]{7,}\d(?!\w)")
+POSTAL_CITY = re.compile(r"\b\d{4,5}\s+[A-ZÀ-Ý][\w\-' ]+")
+BULLET = re.compile(r"^\s*(?:[-•*·▪►✓➢–o]|\d+[.)])\s+")
+_LABEL = re.compile(r"^(?:e-?mail|mail|t[ée]l(?:[ée]phone)?|phone|mobile|gsm|tel|adresse|address|adres|linkedin|site(?: web)?|website)\s*:\s*", re.IGNORECASE)
+_NAME_WORD = re.compile(r"^[A-ZÀ-Ý][a-zà-ÿ'\-]+$|^[A-ZÀ-Ý'\-]{2,}$|^(?:de|van|der|den|le|la|du|von|d'[A-ZÀ-Ý]\w+)$")
+_INSTITUTION = re.compile(
+    r"universit|[ée]cole|school|college|coll[èe]ge|lyc[ée]e|institut|academ|hogeschool|iut|"
+    r"business school|campus|faculte|faculté|faculty|atheneum|conservatoire",
+    re.IGNORECASE,
+)
+_HEADER_SPLIT = re.compile(r"\s+(?:chez|at|bij|@|-|–|—|\|)\s+|,\s+")
+_ITEM_SPLIT = re.compile(r"[,;|•·▪]|\s+-\s+")
+_SEPARATORS = " \t-–—|,:;"
+# Au-delà, un élément de liste de compétences est une phrase
+MAX_SKILL_WORDS = 5
+
+
+def fold(text: str) -> str:
+    """Forme de comparaison des titres : minuscules, sans accents ni ponctuation"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower().translate(ACCENT_FOLD)).split())
+
+
+def heading_of(line: str) -> Optional[Tuple[str, str]]:
+    """(rubrique, contenu sur la même ligne) si la ligne est un titre de rubrique"""
+    head, _, rest = line.partition(":")
+    for candidate, content in ((line, ""), (head, rest.strip())):
+        words = candidate.split()
+        if not words or len(words) > MAX_HEADING_WORDS * 2:
+            continue
+        # "E X P E R I E N C E"
+        if len(words) > 3 and all(len(word) == 1 for word in words):
+            candidate = "".join(words)
+        key = fold(candidate)
+        if key in _HEADING_SECTION and len(key.split()) <= MAX_HEADING_WORDS:
+            return _HEADING_SECTION[key], content
+    return None
+
+
+def _strip_bullet(line: str) -> str:
+    return BULLET.sub("", line).strip()
+
+
+def _period(line: str) -> Optional[re.Match]:
+    """Période de la ligne (intervalle, ou date seule en début/fin de ligne courte)"""
+    match = DATE_RANGE.search(line)
+    if match:
+        return match
+    match = SINGLE_DATE.search(line)
+    if match and len(line.split()) <= 12:
+        before, after = line[:match.start()].strip(_SEPARATORS), line[match.end():].strip(_SEPARATORS)
+        if not before or not after:
+            return match
+    return None
+
+
+def _clean_period(text: str) -> str:
+    return re.sub(r"\s*(?:-|–|—|→|>)\s*", " - ", " ".join(text.split()))
+
+
+def group_bullets(lines: List[str]) -> List[str]:
+    """Puces et lignes de suite regroupées en phrases"""
+    items: List[str] = []
+    for line in lines:
+        is_bullet = bool(BULLET.match(line))
+        text = _strip_bullet(line)
+        if not text:
+            continue
+        continues = items and not is_bullet and (text[0].islower() or items[-1][-1] not in ".!?;:")
+        if continues:
+            items[-1] = f"{items[-1]} {text}"
+        else:
+            items.append(text)
+    return items
+
+
+def _is_title(line: str) -> bool:
+    """Ligne d'intitulé (poste, société, diplôme) plutôt que suite de description"""
+    return (not BULLET.match(line) and line[:1].isupper() and len(line.split()) <= 10
+            and not line.endswith("."))
+
+
+def _split_entries(lines: List[str]) -> List[Tuple[List[str], Optional[str], List[str]]]:
+    """
+    Entrées d'une rubrique expérience/formation : (lignes d'en-tête sans la
+    période, période, lignes de description). Une entrée commence à une
+    ligne qui porte une période, précédée d'au plus deux lignes de titre.
+    """
+    anchors = [i for i, line in enumerate(lines) if not BULLET.match(line) and _period(line)]
+    if not anchors:
+        # Pas de dates : une entrée par ligne de titre suivie de puces
+        entries, current = [], None
+        for line in lines:
+            if BULLET.match(line) and current is not None:
+                current[2].append(line)
+            else:
+                current = ([line], None, [])
+                entries.append(current)
+        return entries
+
+    starts, previous = [], -1
+    for anchor in anchors:
+        start = anchor
+        while start - 1 > previous and anchor - start < 2 and _is_title(lines[start - 1]):
+            start -= 1
+        starts.append((start, anchor))
+        previous = anchor
+
+    entries = []
+    if starts[0][0] > 0:
+        entries.append((lines[:1], None, lines[1:starts[0][0]]))
+    for position, (start, anchor) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(lines)
+        match = _period(lines[anchor])
+        rest = lines[anchor][:match.start()] + " " + lines[anchor][match.end():]
+        rest = re.sub(r"\(\s*\)", "", rest).strip(_SEPARATORS)
+        header = lines[start:anchor] + ([rest] if rest else [])
+        entries.append((header, _clean_period(match.group(0)), lines[anchor + 1:end]))
+    return entries
+
+
+def _header_parts(header: List[str]) -> List[str]:
+    """Intitulé et organisation : deux lignes, ou une ligne "Poste chez Société" """
+    parts = [part.strip(_SEPARATORS) for part in header if part.strip(_SEPARATORS)]
+    if len(parts) == 1:
+        parts = [part.strip(_SEPARATORS) for part in _HEADER_SPLIT.split(parts[0], maxsplit=2) if part.strip(_SEPARATORS)]
+    return parts
+
+
+def parse_experience(lines: List[str]) -> List[dict]:
+    experience = []
+    for header, period, description in _split_entries(lines):
+        parts = _header_parts(header)
+        experience.append({
+            "company": ", ".join(parts[1:]),
+            "position": parts[0] if parts else "",
+            "period": period or "",
+            "description": group_bullets(description),
+        })
+    return experience
+
+
+def parse_education(lines: List[str]) -> List[dict]:
+    education = []
+    for header, period, description in _split_entries(lines):
+        parts = _header_parts(header)
+        # L'établissement est reconnu à son nom ("Université", "School"...), sinon en second
+        institution_index = next((i for i, part in enumerate(parts) if _INSTITUTION.search(part)), 1)
+        institution = parts[institution_index] if institution_index < len(parts) else ""
+        others = [part for i, part in enumerate(parts) if i != institution_index]
+        education.append({
+            "institution": institution,
+            "degree": others[0] if others else "",
+            "period": period or "",
+            "description": " ".join(others[1:] + group_bullets(description)),
+        })
+    return education
+
+
+def split_items(lines: List[str]) -> List[str]:
+    """Éléments d'une liste (virgules, puces, barres), sans libellé "Langages :" """
+    items, seen = [], set()
+    for line in lines:
+        text = _strip_bullet(line)
+        label, sep, rest = text.partition(":")
+        if sep and len(label.split()) <= 3 and rest.strip():
+            text = rest
+        for item in _ITEM_SPLIT.split(text):
+            item = item.strip(_SEPARATORS + ".")
+            if not item:
+                continue
+            # Phrase : seules les compétences reconnues sont gardées
+            for value in ([item] if len(item.split()) <= MAX_SKILL_WORDS else TAXONOMY.skills_in(item)):
+                if value.casefold() not in seen:
+                    seen.add(value.casefold())
+                    items.append(value)
+    return items
+
+
+def is_soft_skill(item: str) -> bool:
+    ids = TAXONOMY.skill_ids(item)
+    return bool(ids) and all(TAXONOMY.categories[skill_id] == "soft" for skill_id in ids)
+
+
+def _contact_parts(lines: List[str], text: str) -> Tuple[List[str], set]:
+    """E-mail, téléphone, liens, ville ; et les lignes de contact (à ne pas réutiliser)"""
+    emails = EMAIL.findall(text)
+    urls = [url.rstrip(".,;)") for url in URL.findall(text) if "@" not in url]
+    phones = []
+    for match in PHONE.finditer(text):
+        digits = re.sub(r"\D", "", match.group(0))
+        if 9 <= len(digits) <= 15 and not DATE_RANGE.fullmatch(match.group(0).strip()):
+            phones.append(match.group(0).strip())
+    contact_lines = set()
+    city = ""
+    for line in lines:
+        if EMAIL.search(line) or URL.search(line) or any(phone in line for phone in phones) or _LABEL.match(line):
+            contact_lines.add(line)
+        elif not city and POSTAL_CITY.search(line) and not _period(line) and len(line.split()) <= 8:
+            city = POSTAL_CITY.search(line).group(0).strip()
+            contact_lines.add(line)
+    parts = ([city] if city else []) + phones[:1] + emails[:1] + urls
+    return list(dict.fromkeys(parts)), contact_lines
+
+
+def _looks_like_name(line: str) -> bool:
+    words = line.split()
+    return 2 <= len(words) <= 4 and len(line) <= 40 and all(_NAME_WORD.match(word) for word in words)
+
+
+class CVSectioner:
+    """Découpage par règles ; compteurs pour /metrics"""
+
+    def __init__(self):
+        self.calls = 0
+        self.confident = 0
+        self.total_seconds = 0.0
+
+    def section(self, cv_text: str) -> dict:
+        """
+        Champs de CVParsingResponse, plus "confidence" (par champ et
+        "overall") et "sections" (rubriques trouvées).
+        """
+        start = time.perf_counter()
+        # Numéros de page gardés : une ligne "2/3" ou "09/2019" peut être une période
+        text = normalize_text(cv_text or "", drop_page_numbers=False)
+        lines = [line for line in text.split("\n") if line]
+
+        header: List[str] = []
+        sections: Dict[str, List[str]] = {}
+        current = None
+        for line in lines:
+            heading = heading_of(line)
+            if heading:
+                current = heading[0]
+                sections.setdefault(current, [])
+                if heading[1]:
+                    sections[current].append(heading[1])
+            elif current is None:
+                header.append(line)
+            else:
+                sections[current].append(line)
+
+        contact, contact_lines = _contact_parts(header + sections.get("contact", []), text)
+        header_rest = [line for line in header if line not in contact_lines]
+        confidence: Dict[str, float] = {"name": 0.0}
+
+        name = ""
+        for position, line in enumerate(header_rest[:3]):
+            if _looks_like_name(line):
+                name = line
+                confidence["name"] = 0.9 if position == 0 else 0.7
+                header_rest.remove(line)
+                break
+        # Nom retrouvé dans l'adresse e-mail : quasi certain
+        email_text = " ".join(EMAIL.findall(text)).lower().translate(ACCENT_FOLD)
+        if name and any(len(word) > 2 and word.lower().translate(ACCENT_FOLD) in email_text for word in name.split()):
+            confidence["name"] = 1.0
+
+        title = ""
+        if header_rest and len(header_rest[0].split()) <= 8 and not header_rest[0].endswith("."):
+            title = header_rest.pop(0)
+        confidence["title"] = 0.7 if title else 0.0
+
+        has_email, has_phone = bool(email_text), any(PHONE.fullmatch(part) for part in contact)
+        confidence["contact"] = 1.0 if has_email and has_phone else 0.8 if has_email or has_phone else 0.0
+
+        if "summary" in sections:
+            summary = " ".join(group_bullets(sections["summary"]))
+            confidence["summary"] = 0.9
+        else:
+            summary = " ".join(header_rest)
+            confidence["summary"] = 0.5 if summary else 0.0
+
+        experience = parse_experience(sections.get("experience", []))
+        education = parse_education(sections.get("education", []))
+        confidence["experience"] = self._entries_confidence("experience" in sections, experience, "position")
+        confidence["education"] = self._entries_confidence("education" in sections, education, "degree")
+
+        skills = split_items(sections.get("skills", []))
+        soft = split_items(sections.get("soft_skills", []))
+        if "soft_skills" not in sections:
+            soft = [item for item in skills if is_soft_skill(item)]
+        skills = [item for item in skills if item not in soft]
+        confidence["technicalSkills"] = (0.9 if len(skills) >= 3 else 0.6) if skills else 0.0
+        confidence["softSkills"] = 0.8 if "soft_skills" in sections else 0.5 if soft else 0.0
+
+        certifications = group_bullets(sections.get("certifications", []))
+        confidence["certifications"] = 0.9 if certifications else 0.0
+
+        # Langues en dernier (comme le prompt de parsing)
+        additional = []
+        if sections.get("additional"):
+            additional.append(", ".join(group_bullets(sections["additional"])))
+        if sections.get("languages"):
+            additional.append(", ".join(split_items(sections["languages"])))
+        additional_info = " | ".join(additional)
+        confidence["additionalInfo"] = 0.8 if additional_info else 0.0
+
+        confidence["overall"] = round(sum(confidence[field] for field in CORE_FIELDS) / len(CORE_FIELDS), 3)
+        confidence["gate"] = min(confidence["overall"], *(confidence[field] for field in GATE_FIELDS))
+        confidence = {field: round(value, 3) for field, value in confidence.items()}
+
+        self.calls += 1
+        self.confident += confidence["gate"] >= CV_SECTIONER_MIN_CONFIDENCE
+        self.total_seconds += time.perf_counter() - start
+        return {
+            "name": name,
+            "contact": " | ".join(contact),
+            "title": title,
+            "summary": summary,
+            "experience": experience,
+            "education": education,
+            "technicalSkills": ", ".join(skills),
+            "softSkills": ", ".join(soft),
+            "certifications": certifications,
+            "additionalInfo": additional_info,
+            "confidence": confidence,
+            "sections": sorted(sections),
+        }
+
+    @staticmethod
+    def _entries_confidence(found: bool, entries: List[dict], title_field: str) -> float:
+        if not found:
+            return 0.0
+        if not entries:
+            return 0.2
+        # Entrée datée : 0.7 à 1.0 ; sans période : 0.2 à 0.4 au plus
+        scores = [
+            (0.7 + 0.3 * bool(entry[title_field])) if entry["period"] else (0.2 + 0.2 * bool(entry[title_field]))
+            for entry in entries
+        ]
+        return sum(scores) / len(scores)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "confident": self.confident,
+            "min_confidence": CV_SECTIONER_MIN_CONFIDENCE,
+            "avg_ms": round(1000 * self.total_seconds / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+sectioner = CVSectioner()
+
+
+def section_cv(cv_text: str) -> dict:
+    return sectioner.section(cv_text)
+
+
+def is_confident(parsed: dict) -> bool:
+    """Résultat local suffisant : moyenne, expériences et formations au-dessus du seuil"""
+    return parsed["confidence"]["gate"] >= CV_SECTIONER_MIN_CONFIDENCE
+
+
+def cv_sectioner_stats() -> dict:
+    return sectioner.stats()
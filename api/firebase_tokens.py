@@ -0,0 +1,297 @@
+"""
+Vérification des ID tokens Firebase, mise en cache jusqu'à leur expiration
+
+auth.verify_id_token était appelé à chaque requête authentifiée. Un token
+vérifié est désormais gardé (par SHA-256) jusqu'à son "exp" : la requête
+suivante ne coûte qu'un hash et une lecture de dictionnaire. Un token
+expiré est retiré et refusé.
+
+La première vérification se fait localement (signature RS256, audience,
+émetteur) avec les certificats de Google, préchargés au démarrage et
+rafraîchis en arrière-plan avant la fin de leur max-age. Sans google-auth
+ou sans identifiant de projet, elle passe par auth.verify_id_token.
+
+Révocation : l'état d'un compte (désactivé, tokens valides après...) est
+lu avant d'accepter son premier token (auth.get_user), puis relu en
+arrière-plan au plus tard toutes les TOKEN_REVOCATION_INTERVAL secondes ;
+les tokens révoqués sont refusés, qu'ils soient en cache ou non. Un état
+illisible fait refuser le token.
+
+verify() peut faire des appels réseau (certificats, get_user) : depuis une
+route async, essayer verify_cached() puis verify() dans un thread.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+from result_cache import ResultCache
+
+try:
+    from google.auth import jwt as google_jwt
+    GOOGLE_AUTH_AVAILABLE = True
+except ImportError:
+    GOOGLE_AUTH_AVAILABLE = False
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_REVOCATION_INTERVAL = float(os.getenv("TOKEN_REVOCATION_INTERVAL", 300))
+# Rafraîchir les certificats avant la fin de leur max-age
+CERTS_REFRESH_MARGIN = 300
+CERTS_DEFAULT_MAX_AGE = 3600
+# Clé inconnue (rotation) : nouveau téléchargement, au plus une fois par minute
+CERTS_MIN_REFETCH_INTERVAL = 60
+
+
+class TokenRejected(Exception):
+    """Token expiré, révoqué ou invalide"""
+
+
+class FirebaseCerts:
+    """Certificats de signature des ID tokens, préchargés et rafraîchis en arrière-plan"""
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL):
+        self.url = url
+        self.certs: Dict[str, str] = {}
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def fetch(self) -> Dict[str, str]:
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else CERTS_DEFAULT_MAX_AGE
+        certs = response.json()
+        with self._lock:
+            self.certs = certs
+            self.fetched_at = time.time()
+            self.expires_at = self.fetched_at + max_age
+            self.fetches += 1
+        return certs
+
+    def get(self, kid: Optional[str] = None) -> Dict[str, str]:
+        """Certificats en mémoire ; téléchargés seulement s'ils ont expiré ou si la clé est inconnue"""
+        now = time.time()
+        stale = self.expires_at <= now
+        unknown = kid is not None and kid not in self.certs and now - self.fetched_at > CERTS_MIN_REFETCH_INTERVAL
+        if stale or unknown:
+            try:
+                self.fetch()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Certificats Firebase non rafraîchis: {e}")
+        return self.certs
+
+    def start(self):
+        """Préchargement (au démarrage), puis rafraîchissement périodique"""
+        try:
+            self.fetch()
+            print(f"✅ Certificats Firebase préchargés: {len(self.certs)} clés, valides {int(self.expires_at - time.time())} s")
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Certificats Firebase non préchargés: {e}")
+        self._schedule()
+
+    def _schedule(self):
+        # Échec : nouvel essai dans une minute
+        delay = max(CERTS_MIN_REFETCH_INTERVAL, self.expires_at - time.time() - CERTS_REFRESH_MARGIN)
+        self._timer = threading.Timer(delay, self._refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh(self):
+        try:
+            self.fetch()
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Rafraîchissement des certificats Firebase en échec: {e}")
+        self._schedule()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.certs),
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "expires_in_seconds": max(0, int(self.expires_at - time.time())),
+        }
+
+
+class FirebaseTokenVerifier:
+    """Tokens vérifiés en cache (LRU, jusqu'à exp) et état de révocation par compte"""
+
+    def __init__(self, project_id: Optional[str], fallback: Callable[[str], dict],
+                 user_lookup: Optional[Callable] = None, certs: Optional[FirebaseCerts] = None,
+                 max_entries: int = TOKEN_CACHE_SIZE, revocation_interval: float = TOKEN_REVOCATION_INTERVAL):
+        self.project_id = project_id
+        self.fallback = fallback  # auth.verify_id_token
+        self.user_lookup = user_lookup  # auth.get_user
+        self.certs = certs or FirebaseCerts()
+        self.local = GOOGLE_AUTH_AVAILABLE and bool(project_id)
+        self.max_entries = max_entries
+        self.revocation_interval = revocation_interval
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # uid -> (tokens valides après, désactivé, vérifié à), borné comme le cache des tokens
+        self._users = ResultCache("firebase_token_accounts", max_entries=max_entries,
+                                  ttl=max(3600.0, 10 * revocation_interval))
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="firebase-revocation")
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.revocation_checks = 0
+
+    def verify_cached(self, token: str) -> Optional[dict]:
+        """Claims d'un token déjà vérifié (sans appel réseau), None s'il n'est pas en cache"""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                self.rejected += 1
+                raise TokenRejected("Token expiré")
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Compte en cache avec le token : l'état connu suffit, relu en arrière-plan
+        self._check_revocation(entry[0], key, now)
+        return entry[0]
+
+    def verify(self, token: str) -> dict:
+        """Claims du token (avec "uid") ; lève TokenRejected ou l'erreur de Firebase. Peut bloquer (réseau)."""
+        claims = self.verify_cached(token)
+        if claims is not None:
+            return claims
+        key = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            self.misses += 1
+
+        try:
+            claims = self._decode(token)
+        except TokenRejected:
+            with self._lock:
+                self.rejected += 1
+            raise
+        if self.user_lookup is not None and self._users.get(claims["uid"]) is None:
+            # Premier token de ce compte (ou état oublié) : état lu avant d'accepter
+            self._load_user(claims["uid"], strict=True)
+        self._check_revocation(claims, None, now)
+        with self._lock:
+            self._entries[key] = (claims, float(claims["exp"]))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+    def _decode(self, token: str) -> dict:
+        if not self.local:
+            claims = dict(self.fallback(token))
+            claims.setdefault("uid", claims.get("sub"))
+            return claims
+        try:
+            header = google_jwt.decode_header(token)
+            if header.get("alg") != "RS256":
+                raise ValueError(f"algorithme {header.get('alg')} refusé")
+            certs = self.certs.get(header.get("kid"))
+            claims = google_jwt.decode(token, certs=certs, audience=self.project_id)
+        except ValueError as e:
+            raise TokenRejected(str(e)) from None
+        issuer = f"https://securetoken.google.com/{self.project_id}"
+        subject = claims.get("sub")
+        if claims.get("iss") != issuer:
+            raise TokenRejected("Émetteur du token invalide")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise TokenRejected("Sujet du token invalide")
+        if claims.get("auth_time", 0) > time.time() + 5:
+            raise TokenRejected("auth_time dans le futur")
+        claims["uid"] = subject
+        return claims
+
+    def _check_revocation(self, claims: dict, key: Optional[str], now: float):
+        """Refuser un token révoqué si l'état du compte est connu ; le relire en arrière-plan s'il est vieux"""
+        uid = claims["uid"]
+        state = self._users.get(uid)
+        if self.user_lookup is not None and (state is None or now - state[2] > self.revocation_interval):
+            self._refresh_user(uid)
+        if state is None:
+            # Sans user_lookup, ou état oublié pendant que le token est en cache (relu en arrière-plan)
+            return
+        valid_after, disabled, _ = state
+        if disabled or claims.get("iat", 0) < valid_after:
+            with self._lock:
+                if key is not None:
+                    self._entries.pop(key, None)
+                self.rejected += 1
+            raise TokenRejected("Compte désactivé" if disabled else "Token révoqué")
+
+    def _refresh_user(self, uid: str):
+        with self._lock:
+            if uid in self._pending:
+                return
+            self._pending.add(uid)
+        self._executor.submit(self._load_user, uid)
+
+    def _load_user(self, uid: str, strict: bool = False):
+        """Lire l'état du compte ; strict : une erreur fait refuser le token (TokenRejected)"""
+        try:
+            user = self.user_lookup(uid)
+            valid_after = (getattr(user, "tokens_valid_after_timestamp", None) or 0) / 1000
+            self._users.set(uid, (valid_after, bool(getattr(user, "disabled", False)), time.time()))
+            self.revocation_checks += 1
+        except Exception as e:
+            if type(e).__name__ == "UserNotFoundError":
+                self._users.set(uid, (0.0, True, time.time()))
+            elif strict:
+                with self._lock:
+                    self.rejected += 1
+                raise TokenRejected(f"État du compte non vérifié: {e}") from None
+            else:
+                print(f"⚠️ État du compte {uid} non vérifié: {e}")
+        finally:
+            if not strict:
+                with self._lock:
+                    self._pending.discard(uid)
+
+    def revoke(self, uid: str):
+        """Révocation faite par l'application : refus immédiat des tokens déjà émis"""
+        self._users.set(uid, (time.time(), False, time.time()))
+
+    def start(self):
+        if self.local:
+            self.certs.start()
+
+    def stop(self):
+        self.certs.stop()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": "local" if self.local else "firebase_admin",
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "accounts_tracked": self._users.stats()["entries"],
+                "revocation_checks": self.revocation_checks,
+                "certificates": self.certs.stats() if self.local else None,
+            }
@@ -0,0 +1,83 @@
+"""
+Requêtes de couverture (hedged requests)
+
+Si un appel n'a pas répondu après le p95 des latences récentes, une copie
+est envoyée et la première réponse valide l'emporte ; l'autre est annulée.
+Réduit la latence de queue (un appel bloqué sur une instance lente) au prix
+d'environ 5 % d'appels en plus.
+"""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+
+class Hedger:
+    """Fenêtre de latences récentes et exécution avec copie retardée"""
+
+    def __init__(self, enabled: bool = False, window: int = 200, min_samples: int = 20,
+                 min_delay: float = 1.0, quantile: float = 0.95):
+        self.enabled = enabled
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.quantile = quantile
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, latency: float):
+        self._latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """Délai avant la copie (p95), None tant que l'historique est insuffisant"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.quantile))
+        return max(self.min_delay, ordered[index])
+
+    async def run(self, primary: Callable[[], Awaitable[Any]],
+                  backup: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Exécuter primary ; si activé et trop lent, lancer backup (primary par
+        défaut) en parallèle et retourner le premier résultat sans erreur.
+        """
+        self.calls += 1
+        delay = self.delay() if self.enabled else None
+        if delay is None:
+            return await primary()
+
+        first = asyncio.ensure_future(primary())
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            second = asyncio.ensure_future((backup or primary)())
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        delay = self.delay()
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedged, 3) if self.hedged else 0.0,
+            "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+        }
@@ -1,14 +1,46 @@
 from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 import uvicorn
 import os
 import json
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 import base64
 import io
+import sys
+import asyncio
+import time
+
+# Modules internes (api/) importables quel que soit le point d'entrée
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai_client
+from result_cache import ResultCache, cache_key
+from prompt_registry import get_template, registry_info
+from input_compaction import (
+    COMPACTION_VERSION, compact_cv, compaction_stats, output_token_budget
+)
+from job_analysis import analyze_job_description, job_analysis_cache, render_analysis
+from job_queue import JobQueue, QueueClosed
+from ats_scoring import score_cv
+from skill_taxonomy import taxonomy_info
+from cv_sectioner import FIELDS as CV_FIELDS, cv_sectioner_stats, is_confident, section_cv
+from user_profiles import cached_profile, load_profile, store_credits, store_profile, user_cache_stats
+from firebase_tokens import FirebaseTokenVerifier
+from credit_ledger import CreditLedger, FirestoreCreditStore, InsufficientCredits, UnknownAccount
+from write_behind import WriteBehindQueue
+from content_blobs import (
+    add_to_batch, content_blob_stats, delete_user_content, history_fields, mark_stored, resolve_generated_cvs
+)
+from pdf_upload import PDF_MAX_BYTES, UploadError, receive_pdf
+from language_detection import (
+    DEFAULT_TARGET_LANGUAGE, is_reliable, language_detection_stats, warm_up as load_language_profiles
+)
 
 # Firebase imports
 try:
@@ -37,27 +69,42 @@ except ImportError:
     OPENAI_AVAILABLE = False
     print("⚠️ OpenAI non installé")
 
-# PDF import
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-    print("✅ PyPDF2 importé avec succès")
-except ImportError:
-    PDF_AVAILABLE = False
-    print("⚠️ PyPDF2 non installé")
+# PDF (extraction dans un pool de processus, voir pdf_extraction.py)
+from pdf_backends import BACKENDS as PDF_BACKENDS
+from pdf_extraction import PDF_AVAILABLE, ExtractionTimeout, PDFExtractor
+if PDF_AVAILABLE:
+    print(f"✅ Extraction PDF disponible: {', '.join(PDF_BACKENDS)}")
+else:
+    print("⚠️ Aucune bibliothèque PDF installée (PyPDF2, pypdf, pdfminer.six, pypdfium2)")
 
 # Modèles de données
 class CVGenerationRequest(BaseModel):
     cv_content: str
     job_description: str
     user_id: str
-    target_language: str = "french"  # Langue de l'offre d'emploi
+    target_language: Optional[str] = None  # Langue de l'offre d'emploi (détectée si absente)
 
 class CVGenerationResponse(BaseModel):
     optimized_cv: str
     ats_score: int
     success: bool
     message: str
+    matched_keywords: List[str] = []
+    missing_keywords: List[str] = []
+
+class BatchJob(BaseModel):
+    job_description: str
+    target_language: Optional[str] = None  # Par défaut : celle du lot
+
+class CVBatchGenerationRequest(BaseModel):
+    cv_content: str
+    jobs: List[BatchJob]
+    user_id: str
+    target_language: Optional[str] = None  # Par défaut : détectée pour chaque offre
+
+class CVBatchJobResult(CVGenerationResponse):
+    index: int
+    cached: bool = False
 
 class CVParsingRequest(BaseModel):
     cv_text: str
@@ -74,6 +121,11 @@ class CVParsingResponse(BaseModel):
     softSkills: str
     certifications: list
     additionalInfo: str
+    confidence: Optional[dict] = None  # Confiance du découpage local, par champ, "overall" et "gate"
+    source: str = "ai"  # "local" : découpage par règles, sans appel à l'IA
+
+class JobAnalysisRequest(BaseModel):
+    job_description: str
 
 class PDFExtractionRequest(BaseModel):
     pdf_base64: str
@@ -82,6 +134,10 @@ class PDFExtractionResponse(BaseModel):
     text: str
     success: bool
     message: str
+    pages: int = 0
+    truncated: bool = False  # Au-delà de PDF_MAX_PAGES
+    metadata: Optional[dict] = None  # Temps par page, tâches parallèles
+    cached: bool = False
 
 app = FastAPI(title="CV Bien API", version="8.1.0-CV-STRUCTURE-PERFECT")
 
@@ -166,6 +222,38 @@ if FIREBASE_AVAILABLE:
         print("🔄 Mode sans Firebase...")
         db = None
 
+# Vérification des ID tokens en cache, certificats préchargés (voir firebase_tokens.py)
+token_verifier = FirebaseTokenVerifier(
+    project_id=os.getenv("FIREBASE_PROJECT_ID", "cvbien-backend"),
+    fallback=auth.verify_id_token,
+    user_lookup=auth.get_user
+) if FIREBASE_AVAILABLE else None
+
+@app.on_event("startup")
+async def prefetch_firebase_certs():
+    """Certificats de signature téléchargés avant la première requête authentifiée"""
+    if token_verifier and db:
+        await asyncio.get_running_loop().run_in_executor(None, token_verifier.start)
+
+@app.on_event("shutdown")
+def stop_token_verifier():
+    if token_verifier:
+        token_verifier.stop()
+
+# Mouvements de crédits atomiques et livre des crédits (voir credit_ledger.py)
+credit_ledger = CreditLedger(FirestoreCreditStore(db)) if db else None
+
+@app.on_event("startup")
+def start_credit_ledger():
+    if credit_ledger:
+        credit_ledger.start()
+
+@app.on_event("shutdown")
+def flush_credit_ledger():
+    """Écrire les entrées du livre encore en attente"""
+    if credit_ledger:
+        credit_ledger.stop()
+
 # Configuration OpenAI
 client = None
 if OPENAI_AVAILABLE:
@@ -185,19 +273,82 @@ if OPENAI_AVAILABLE:
 else:
     print("❌ OpenAI SDK non disponible")
 
+# Prompts compilés au démarrage (api/prompts/)
+OPTIMIZE_CV_PROMPT = get_template("optimize_cv")
+PARSE_CV_PROMPT = get_template("parse_cv")
+
+# Cache des CV optimisés (mémoire + SQLite partagé optionnel)
+# La version du prompt fait partie de la clé : modifier le prompt invalide le cache
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")  # ex: /tmp/cvbien_cache.db
+optimize_cv_cache = ResultCache(
+    "optimize_cv",
+    max_entries=int(os.getenv("OPTIMIZE_CV_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("OPTIMIZE_CV_CACHE_TTL", 86400)),
+    db_path=RESULT_CACHE_DB,
+)
+
+# Texte extrait des PDF, par SHA-256 du fichier (un même CV est envoyé pour chaque offre)
+pdf_extraction_cache = ResultCache(
+    "pdf_extraction",
+    max_entries=int(os.getenv("PDF_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("PDF_CACHE_TTL", 30 * 86400)),
+    db_path=RESULT_CACHE_DB,
+)
+pdf_extractor = PDFExtractor(cache=pdf_extraction_cache)
+
+# Traitement par lot : un CV, plusieurs offres
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 30))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 5))
+
+# Offre envoyée au modèle : texte nettoyé ("text") ou analyse compacte ("analysis")
+JOB_PROMPT_MODE = os.getenv("JOB_PROMPT_MODE", "text")
+
+def job_prompt_text(job_description: str) -> str:
+    """Offre d'emploi telle qu'envoyée au modèle (analyse mémorisée par offre)"""
+    if not job_description:
+        return job_description
+    analysis = analyze_job_description(job_description)
+    if JOB_PROMPT_MODE == "analysis":
+        return render_analysis(analysis)
+    return analysis["cleaned_text"]
+
+def cache_bypass_requested(http_request: Request) -> bool:
+    """Le client demande à ignorer le cache (X-Cache-Bypass: 1 ou Cache-Control: no-cache)"""
+    if http_request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in http_request.headers.get("cache-control", "").lower()
+
+@app.on_event("shutdown")
+async def shutdown_openai_client():
+    """Fermer le pool de connexions OpenAI"""
+    await openai_client.close_client()
+
+@app.on_event("shutdown")
+def shutdown_pdf_extractor():
+    """Arrêter les processus d'extraction PDF"""
+    pdf_extractor.shutdown()
+
 # Middleware CORS manuel supprimé - on utilise seulement CORSMiddleware
 
 # Security
 security = HTTPBearer()
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_firebase_id_token(id_token: str) -> dict:
+    """Token en cache (sans attente), sinon vérification complète hors de la boucle (certificats, état du compte)"""
+    return token_verifier.verify_cached(id_token) or await run_in_threadpool(token_verifier.verify, id_token)
+
+async def load_user_profile(uid: str):
+    """Profil en cache (sans attente), sinon lecture Firestore hors de la boucle ; None s'il n'existe pas"""
+    return cached_profile(uid) or await run_in_threadpool(load_profile, db, uid, True, credit_ledger)
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Vérifier le token Firebase"""
     if not FIREBASE_AVAILABLE or not db:
         raise HTTPException(status_code=503, detail="Firebase non disponible")
     
     try:
         # Vérifier le token Firebase
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = await verify_firebase_id_token(credentials.credentials)
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Token invalide: {str(e)}")
@@ -241,11 +392,14 @@ def version():
              "openai_available": OPENAI_AVAILABLE,
              "openai_key": "configured" if os.getenv("OPENAI_API_KEY") else "missing",
              "cors": "ENABLED",
+             "prompts": registry_info(),
+             "skill_taxonomy": taxonomy_info(),
+             "pdf_backends": {name: backend.version for name, backend in PDF_BACKENDS.items()},
              "cv_improvements": "✅ Structure parfaite: pas de *, pas de gros mensonges, filtrage intelligent, une seule page"
          }
 
 @app.get("/test-openai")
-def test_openai():
+async def test_openai():
     """Tester la connexion OpenAI"""
     debug_info = {
         "openai_available": OPENAI_AVAILABLE,
@@ -262,31 +416,22 @@ def test_openai():
         if not api_key:
             return {"success": False, "message": "OPENAI_API_KEY manquante", "debug": debug_info}
         
-        import requests
-        
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             "model": "gpt-4o-mini",
             "messages": [{"role": "user", "content": "Test"}],
             "max_tokens": 10
         }
         
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
-        
-        if response.status_code == 200:
-            return {
-                "success": True, 
-                "message": "OpenAI fonctionne",
-                "model": "gpt-4o-mini",
-                "debug": debug_info
-            }
-        else:
-            return {"success": False, "message": f"OpenAI API error: {response.status_code}", "debug": debug_info}
+        await openai_client.chat_completion(data, timeout=15)
+        return {
+            "success": True, 
+            "message": "OpenAI fonctionne",
+            "model": "gpt-4o-mini",
+            "debug": debug_info
+        }
             
+    except openai_client.OpenAIError as e:
+        return {"success": False, "message": f"OpenAI API error: {e.status_code}", "debug": debug_info}
     except Exception as e:
         return {"success": False, "message": f"Erreur OpenAI: {str(e)}", "debug": debug_info}
 
@@ -294,6 +439,29 @@ def test_openai():
 def health():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/metrics")
+def metrics():
+    """Compteurs internes (caches, files d'attente...)"""
+    return {
+        "optimize_cv_cache": optimize_cv_cache.stats(),
+        "openai_single_flight": openai_client.single_flight_stats(),
+        "openai_rate_limiter": openai_client.rate_limiter_stats(),
+        "openai_circuit_breaker": openai_client.circuit_breaker_stats(),
+        "openai_hedging": openai_client.hedging_stats(),
+        "input_compaction": compaction_stats(),
+        "job_analysis_cache": job_analysis_cache.stats(),
+        "language_detection": language_detection_stats(),
+        "cv_sectioner": cv_sectioner_stats(),
+        "user_profile_cache": user_cache_stats(),
+        "firebase_tokens": token_verifier.stats() if token_verifier else None,
+        "credit_ledger": credit_ledger.stats() if credit_ledger else None,
+        "generated_cv_writer": generated_cv_writer.stats() if generated_cv_writer else None,
+        "content_blobs": content_blob_stats(),
+        "pdf_extraction": pdf_extractor.stats(),
+        "pdf_extraction_cache": pdf_extraction_cache.stats(),
+        "job_queue": job_queue.stats() if job_queue else None
+    }
+
 @app.get("/api/test-stripe")
 def test_stripe():
     """Test de configuration Stripe"""
@@ -373,14 +541,13 @@ async def validate_firebase_token(token_data: dict):
             raise HTTPException(status_code=400, detail="Token manquant")
         
         # Vérifier le token Firebase
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = await verify_firebase_id_token(id_token)
         uid = decoded_token['uid']
         
-        # Récupérer les infos utilisateur depuis Firestore
-        user_doc = db.collection('users').document(uid).get()
+        # Récupérer les infos utilisateur (cache, sinon Firestore)
+        user_data = await load_user_profile(uid)
         
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return {
                 "success": True,
                 "user": {
@@ -398,7 +565,8 @@ async def validate_firebase_token(token_data: dict):
                 "credits": 0,  # Nouveau compte sans crédits
                 "created_at": datetime.now().isoformat()
             }
-            db.collection('users').document(uid).set(user_data)
+            await run_in_threadpool(db.collection('users').document(uid).set, user_data)
+            store_profile(uid, user_data)
             
             return {
                 "success": True,
@@ -422,10 +590,9 @@ async def get_user_profile(current_user: dict = Depends(verify_token)):
     
     try:
         uid = current_user['uid']
-        user_doc = db.collection('users').document(uid).get()
+        user_data = await load_user_profile(uid)
         
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return {
                 "success": True,
                 "user": {
@@ -442,6 +609,61 @@ async def get_user_profile(current_user: dict = Depends(verify_token)):
         print(f"❌ Erreur récupération profil: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+@app.get("/api/user/generated-cvs")
+async def get_generated_cvs(limit: int = 20, include_content: bool = False,
+                            current_user: dict = Depends(verify_token)):
+    """Historique des CV générés (offre d'emploi, et les CV eux-mêmes si include_content)"""
+    if not db:
+        raise HTTPException(status_code=503, detail="Firebase non disponible")
+
+    def load_history(uid: str, limit: int, fields: list) -> list:
+        # Les limit plus récents, champs utiles seulement (index composite : firestore.indexes.json)
+        query = (
+            db.collection('generated_cvs')
+            .where('user_id', '==', uid)
+            .order_by('created_at', direction=firestore.Query.DESCENDING)
+            .limit(limit)
+            .select(history_fields(fields))
+        )
+        documents = [{"id": doc.id, **doc.to_dict()} for doc in query.stream()]
+        # Textes lus dans content_blobs, chaque blob une seule fois
+        return resolve_generated_cvs(db, documents, fields)
+
+    try:
+        limit = max(1, min(limit, 100))
+        fields = ["job_description", "original_content", "optimized_content"] if include_content else ["job_description"]
+        documents = await run_in_threadpool(load_history, current_user['uid'], limit, fields)
+
+        return {
+            "success": True,
+            "generated_cvs": documents
+        }
+
+    except Exception as e:
+        print(f"❌ Erreur récupération historique: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.delete("/api/user/generated-cvs")
+async def delete_generated_cvs(current_user: dict = Depends(verify_token)):
+    """
+    Supprimer l'historique des CV générés et les textes des CV (content_blobs).
+    À appeler aussi à la suppression d'un compte.
+    """
+    if not db:
+        raise HTTPException(status_code=503, detail="Firebase non disponible")
+
+    try:
+        deleted = await run_in_threadpool(delete_user_content, db, current_user['uid'])
+        print(f"🗑️ Historique supprimé: {deleted['generated_cvs']} CV, {deleted['blobs']} textes")
+        return {
+            "success": True,
+            "deleted": deleted
+        }
+
+    except Exception as e:
+        print(f"❌ Erreur suppression historique: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
 @app.post("/api/user/consume-credits")
 async def consume_credits(request: dict, current_user: dict = Depends(verify_token)):
     """Consommer des crédits"""
@@ -451,19 +673,14 @@ async def consume_credits(request: dict, current_user: dict = Depends(verify_tok
     try:
         amount = request.get("amount", 1)
         uid = current_user['uid']
-        user_doc = db.collection('users').document(uid).get()
-        
-        if not user_doc.exists:
+        # Solde vérifié et décrémenté dans une même transaction
+        try:
+            new_credits = await run_in_threadpool(credit_ledger.debit, uid, amount, "consume")
+        except UnknownAccount:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        
-        user_data = user_doc.to_dict()
-        current_credits = user_data.get("credits", 0)
-        
-        if current_credits < amount:
+        except InsufficientCredits:
             raise HTTPException(status_code=400, detail="Crédits insuffisants")
-        
-        new_credits = current_credits - amount
-        db.collection('users').document(uid).update({"credits": new_credits})
+        store_credits(uid, new_credits)
         
         return {
             "success": True,
@@ -568,17 +785,13 @@ async def test_payment(request: dict, current_user: dict = Depends(verify_token)
         
         # Simuler un paiement réussi
         uid = current_user['uid']
-        user_doc = db.collection('users').document(uid).get()
-        
-        if not user_doc.exists:
-            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        
-        user_data = user_doc.to_dict()
-        current_credits = user_data.get("credits", 0)
-        new_credits = current_credits + credits
         
         # Mettre à jour les crédits
-        db.collection('users').document(uid).update({"credits": new_credits})
+        try:
+            new_credits, _ = await run_in_threadpool(credit_ledger.credit, uid, credits, "test_payment")
+        except UnknownAccount:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        store_credits(uid, new_credits)
         
         return {
             "success": True,
@@ -606,22 +819,13 @@ async def confirm_payment(request: dict):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id manquant")
         
-        # Récupérer l'utilisateur
-        user_doc = db.collection('users').document(user_id).get()
-        print(f"🔧 DEBUG: user_doc.exists={user_doc.exists}")
-        
-        if not user_doc.exists:
+        # Mettre à jour les crédits
+        try:
+            new_credits, _ = await run_in_threadpool(credit_ledger.credit, user_id, credits, "confirm_payment")
+        except UnknownAccount:
             print(f"❌ Utilisateur {user_id} non trouvé dans Firestore")
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        
-        user_data = user_doc.to_dict()
-        current_credits = user_data.get("credits", 0)
-        new_credits = current_credits + credits
-        
-        print(f"🔧 DEBUG: current_credits={current_credits}, new_credits={new_credits}")
-        
-        # Mettre à jour les crédits
-        db.collection('users').document(user_id).update({"credits": new_credits})
+        store_credits(user_id, new_credits)
         
         print(f"✅ Crédits mis à jour: {credits} ajoutés, total: {new_credits}")
         
@@ -693,22 +897,25 @@ async def confirm_payment_stripe(request: dict):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id manquant dans les métadonnées")
         
-        # Récupérer l'utilisateur
-        user_doc = db.collection('users').document(user_id).get()
-        print(f"🔧 DEBUG: user_doc.exists={user_doc.exists}")
-        
-        if not user_doc.exists:
+        # Mettre à jour les crédits : une seule fois par session, même si le webhook arrive en même temps
+        try:
+            new_credits, applied = await run_in_threadpool(
+                credit_ledger.credit, user_id, credits, "stripe", reference=session_id, idempotency_key=f"stripe:{session_id}"
+            )
+        except UnknownAccount:
             print(f"❌ Utilisateur {user_id} non trouvé dans Firestore")
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        store_credits(user_id, new_credits)
         
-        user_data = user_doc.to_dict()
-        current_credits = user_data.get("credits", 0)
-        new_credits = current_credits + credits
-        
-        print(f"🔧 DEBUG: current_credits={current_credits}, new_credits={new_credits}")
-        
-        # Mettre à jour les crédits
-        db.collection('users').document(user_id).update({"credits": new_credits})
+        if not applied:
+            print(f"⚠️ Session {session_id} déjà créditée - crédits déjà ajoutés")
+            return {
+                "success": True,
+                "credits": new_credits,
+                "added": credits,
+                "method": "already_processed",
+                "message": "Paiement déjà confirmé"
+            }
         
         # Marquer cette session comme traitée
         processed_sessions_ref.set({
@@ -813,16 +1020,26 @@ async def stripe_webhook(request: Request):
                         "message": "Paiement déjà confirmé"
                     }
                 
-                # Récupérer l'utilisateur
-                user_doc = db.collection('users').document(user_id).get()
+                # Mettre à jour les crédits : une seule fois par session (voir confirm-payment-stripe)
+                try:
+                    new_credits, applied = await run_in_threadpool(
+                        credit_ledger.credit, user_id, credits, "stripe", reference=session_id, idempotency_key=f"stripe:{session_id}"
+                    )
+                except UnknownAccount:
+                    new_credits, applied = None, None
                 
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    current_credits = user_data.get("credits", 0)
-                    new_credits = current_credits + credits
-                    
-                    # Mettre à jour les crédits
-                    db.collection('users').document(user_id).update({"credits": new_credits})
+                if applied is False:
+                    store_credits(user_id, new_credits)
+                    print(f"⚠️ Session {session_id} déjà créditée - crédits déjà ajoutés")
+                    return {
+                        "status": "success",
+                        "credits_added": credits,
+                        "total_credits": new_credits,
+                        "message": "Paiement déjà confirmé"
+                    }
+                
+                if applied:
+                    store_credits(user_id, new_credits)
                     
                     # Marquer cette session comme traitée
                     processed_sessions_ref.set({
@@ -857,40 +1074,156 @@ async def stripe_webhook(request: Request):
             error_message = "Webhook secret manquant ou invalide. Vérifiez STRIPE_WEBHOOK_SECRET dans les variables d'environnement."
         raise HTTPException(status_code=500, detail=f"Erreur webhook: {error_message}")
 
+async def extract_pdf_data(pdf_data, use_cache: bool = True) -> PDFExtractionResponse:
+    """Extraire le texte dans le pool de processus (la boucle reste libre), ou le relire en cache"""
+    try:
+        result = await pdf_extractor.extract(pdf_data, use_cache)
+    except ExtractionTimeout as e:
+        print(f"⚠️ Extraction PDF abandonnée: {e}")
+        return PDFExtractionResponse(text="", success=False, message=str(e))
+    
+    text = result["text"]
+    if result["cached"]:
+        print("⚡ Texte du PDF trouvé en cache")
+    metadata = {
+        "page_seconds": result["page_seconds"],
+        "seconds": result["seconds"],
+        "parallel_tasks": result["tasks"],
+        "backend": result["backend"]
+    }
+    if not text.strip():
+        return PDFExtractionResponse(
+            text="",
+            success=False,
+            message="Aucun texte trouvé dans le PDF",
+            pages=result["pages"],
+            metadata=metadata,
+            cached=result["cached"]
+        )
+    
+    return PDFExtractionResponse(
+        text=text.strip(),
+        success=True,
+        message="Texte extrait avec succès",
+        pages=result["pages"],
+        truncated=result["truncated"],
+        metadata=metadata,
+        cached=result["cached"]
+    )
+
+def pdf_pages_stream(pdf_data, use_cache: bool = True, cleanup=None) -> StreamingResponse:
+    """
+    Pages en Server-Sent Events au fil de l'extraction : "page" (numéro,
+    texte, secondes ; les tranches parallèles arrivent dans l'ordre où elles
+    se terminent), puis "done", ou "error". En cache : toutes les pages d'un coup.
+    pdf_data : octets ou chemin ; cleanup est appelé à la fin du flux.
+    """
+    key = pdf_extractor.document_key(pdf_data)
+    cached = pdf_extractor.lookup(key) if use_cache else None
+    
+    async def cached_pages():
+        for index, (text, seconds) in enumerate(zip(cached["page_texts"], cached["page_seconds"])):
+            yield cached["pages"], index, text, seconds
+    
+    async def event_stream():
+        start = time.perf_counter()
+        total = extracted = 0
+        details = {"backend": cached.get("backend")} if cached else {}
+        pages = cached_pages() if cached else pdf_extractor.iter_pages(pdf_data, key, details)
+        try:
+            async for total, index, text, seconds in pages:
+                extracted += 1
+                yield sse_event("page", {"page": index + 1, "text": text, "seconds": round(seconds, 4)})
+            yield sse_event("done", {
+                "success": extracted > 0,
+                "pages": total,
+                "pages_extracted": extracted,
+                "truncated": total > extracted,
+                "seconds": round(time.perf_counter() - start, 4),
+                "backend": details.get("backend"),
+                "cached": cached is not None
+            })
+        except Exception as e:
+            print(f"❌ Erreur extraction PDF (stream): {e}")
+            yield sse_event("error", {"message": f"Erreur extraction PDF: {str(e)}"})
+        finally:
+            if cleanup:
+                cleanup()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def pdf_cache_allowed(http_request: Request) -> bool:
+    """Relire le cache d'extraction, sauf demande contraire du client"""
+    if cache_bypass_requested(http_request):
+        pdf_extraction_cache.record_bypass()
+        return False
+    return True
+
 @app.post("/extract-pdf", response_model=PDFExtractionResponse)
-async def extract_pdf(request: PDFExtractionRequest):
-    """Extraire le texte d'un PDF"""
+async def extract_pdf(request: PDFExtractionRequest, http_request: Request, stream: bool = False):
+    """Extraire le texte d'un PDF (?stream=true : pages en Server-Sent Events)"""
     print(f"🔍 DEBUG - Extraction PDF demandée")
     print(f"🔍 DEBUG - PDF base64 length: {len(request.pdf_base64)}")
     
     if not PDF_AVAILABLE:
-        raise HTTPException(status_code=503, detail="PyPDF2 non disponible")
+        raise HTTPException(status_code=503, detail="Aucune bibliothèque PDF disponible")
     
     try:
         # Décoder le PDF base64
         pdf_data = base64.b64decode(request.pdf_base64)
+        use_cache = pdf_cache_allowed(http_request)
+        if stream:
+            return pdf_pages_stream(pdf_data, use_cache)
+        return await extract_pdf_data(pdf_data, use_cache)
         
-        # Créer un objet PDF
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_data))
-        
-        # Extraire le texte de toutes les pages
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        
-        if not text.strip():
-            return PDFExtractionResponse(
-                text="",
-                success=False,
-                message="Aucun texte trouvé dans le PDF"
-            )
-        
+    except Exception as e:
+        print(f"❌ Erreur extraction PDF: {e}")
         return PDFExtractionResponse(
-            text=text.strip(),
-            success=True,
-            message="Texte extrait avec succès"
+            text="",
+            success=False,
+            message=f"Erreur extraction PDF: {str(e)}"
         )
-        
+
+@app.post("/extract-pdf/upload", response_model=PDFExtractionResponse)
+async def extract_pdf_upload(request: Request, stream: bool = False):
+    """
+    Extraire le texte d'un PDF envoyé tel quel : multipart/form-data (champ
+    "file") ou corps brut application/pdf. Le fichier est lu en flux dans
+    un fichier temporaire, plafonné à PDF_MAX_BYTES. ?stream=true : pages
+    en Server-Sent Events.
+    """
+    if not PDF_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Aucune bibliothèque PDF disponible")
+    
+    try:
+        # Fichier nommé : les workers l'ouvrent eux-mêmes, le PDF n'est pas relu en mémoire
+        pdf_file, size = await receive_pdf(request, PDF_MAX_BYTES, named=True)
+    except UploadError as e:
+        print(f"⚠️ PDF refusé: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    print(f"🔍 DEBUG - PDF reçu en flux: {size} octets")
+    pdf_file.close()
+    pdf_path = pdf_file.name
+    
+    def remove_upload():
+        try:
+            os.unlink(pdf_path)
+        except OSError:
+            pass
+    
+    streaming = False
+    try:
+        use_cache = pdf_cache_allowed(request)
+        if stream:
+            response = pdf_pages_stream(pdf_path, use_cache, cleanup=remove_upload)
+            streaming = True
+            return response
+        return await extract_pdf_data(pdf_path, use_cache)
     except Exception as e:
         print(f"❌ Erreur extraction PDF: {e}")
         return PDFExtractionResponse(
@@ -898,9 +1231,184 @@ async def extract_pdf(request: PDFExtractionRequest):
             success=False,
             message=f"Erreur extraction PDF: {str(e)}"
         )
+    finally:
+        # En streaming, supprimé à la fin du flux
+        if not streaming:
+            remove_upload()
+
+def validate_cv_generation_request(request: CVGenerationRequest):
+    """Vérifier les champs requis d'une demande de génération"""
+    if not request.cv_content or not request.cv_content.strip():
+        raise HTTPException(status_code=422, detail="cv_content est requis et ne peut pas être vide")
+    if not request.job_description or not request.job_description.strip():
+        raise HTTPException(status_code=422, detail="job_description est requis et ne peut pas être vide")
+    if not request.user_id or not request.user_id.strip():
+        raise HTTPException(status_code=422, detail="user_id est requis et ne peut pas être vide")
+
+def resolve_target_language(request: CVGenerationRequest) -> CVGenerationRequest:
+    """Langue cible absente : celle de l'offre (analyse mémorisée par hash de l'offre)"""
+    if not request.target_language:
+        analysis = analyze_job_description(request.job_description)
+        if is_reliable(analysis["language_confidence"]):
+            request.target_language = analysis["language"]
+        else:
+            request.target_language = DEFAULT_TARGET_LANGUAGE
+        print(f"🌍 Langue cible détectée: {request.target_language} "
+              f"(fiabilité {analysis['language_confidence']})")
+    return request
+
+def build_optimize_cv_payload(request: CVGenerationRequest, compacted_cv: Optional[str] = None) -> dict:
+    """
+    Construire la requête chat/completions pour l'optimisation d'un CV.
+    compacted_cv évite de recompacter le même CV (traitement par lot).
+    """
+    cv_content = compacted_cv if compacted_cv is not None else compact_cv(request.cv_content)
+    return {
+        "model": "gpt-4o-mini",
+        "messages": OPTIMIZE_CV_PROMPT.messages(
+            cv_content=cv_content,
+            job_description=job_prompt_text(request.job_description),
+            target_language=request.target_language,
+            target_language_upper=request.target_language.upper(),
+        ),
+        # Le CV optimisé fait ~1,5x le CV source (une page maximum)
+        "max_tokens": output_token_budget(cv_content, ratio=1.5, floor=1200, ceiling=4000),
+        "temperature": 0.7
+    }
+
+def sse_event(event: str, payload: dict) -> str:
+    """Formater un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def optimize_cv_cache_key(request: CVGenerationRequest) -> str:
+    """Clé de cache : contenu du CV, offre, langue cible et version du prompt"""
+    return cache_key(
+        request.cv_content,
+        request.job_description,
+        request.target_language,
+        OPTIMIZE_CV_PROMPT.version,
+        COMPACTION_VERSION,
+        JOB_PROMPT_MODE,
+    )
+
+def calculate_ats_score(content: str, job_description: str) -> dict:
+    """
+    Score ATS du CV pour l'offre (couverture pondérée des mots-clés, calcul
+    local < 1 ms) : {"score", "matched", "missing", ...}
+    """
+    return score_cv(content, job_description)
+
+def ats_response_fields(ats: dict) -> dict:
+    """Champs de réponse issus du score ATS"""
+    return {
+        "ats_score": ats["score"],
+        "matched_keywords": ats["matched"],
+        "missing_keywords": ats["missing"]
+    }
+
+def write_generated_cvs(cvs: list):
+    """
+    Écrire des CV générés en un seul commit (identifiants fixés à la mise en
+    file : réécriture sans doublon), textes dans content_blobs (voir content_blobs.py)
+    """
+    # Un WriteBatch Firestore est limité à 500 écritures : 100 CV et leurs 3 blobs au plus
+    for start in range(0, len(cvs), 100):
+        batch = db.batch()
+        blobs = set()
+        for doc_id, cv_data in cvs[start:start + 100]:
+            batch.set(db.collection('generated_cvs').document(doc_id), add_to_batch(db, batch, cv_data, blobs))
+        batch.commit()
+        mark_stored(blobs)
+    print(f"✅ {len(cvs)} CV sauvegardés dans Firestore")
+
+# Sauvegarde des CV générés hors du chemin de la requête (voir write_behind.py)
+generated_cv_writer = WriteBehindQueue("generated_cvs", write_generated_cvs) if db else None
+
+@app.on_event("startup")
+async def start_generated_cv_writer():
+    if generated_cv_writer:
+        await generated_cv_writer.start()
+
+@app.on_event("shutdown")
+async def flush_generated_cv_writer():
+    """Écrire les CV encore en file avant l'arrêt"""
+    if generated_cv_writer:
+        await generated_cv_writer.stop()
+
+async def save_generated_cv(request: CVGenerationRequest, content: str, ats_score: int):
+    """Mettre le CV généré en file pour Firestore si disponible"""
+    if not db:
+        return
+    try:
+        cv_data = {
+            "user_id": request.user_id,
+            "original_content": request.cv_content,
+            "optimized_content": content,
+            "job_description": request.job_description,
+            "ats_score": ats_score,
+            "prompt_version": OPTIMIZE_CV_PROMPT.version,
+            "created_at": datetime.now(),
+            "is_downloaded": False
+        }
+        
+        await generated_cv_writer.submit((db.collection('generated_cvs').document().id, cv_data))
+    except Exception as e:
+        print(f"⚠️ Erreur sauvegarde Firestore: {e}")
+
+@app.post("/analyze-job")
+async def analyze_job(request: JobAnalysisRequest):
+    """Analyser une offre d'emploi (langue, mots-clés, compétences demandées)"""
+    if not request.job_description or not request.job_description.strip():
+        raise HTTPException(status_code=422, detail="job_description est requis et ne peut pas être vide")
+    
+    analysis = analyze_job_description(request.job_description)
+    return {
+        "success": True,
+        "hash": analysis["hash"],
+        "language": analysis["language"],
+        "keywords": analysis["keywords"],
+        "required_skills": analysis["required_skills"],
+        "skills": analysis["skills"],
+        "cleaned_text": analysis["cleaned_text"]
+    }
+
+async def generate_optimized_cv(request: CVGenerationRequest, use_cache: bool = True,
+                                compacted_cv: Optional[str] = None) -> tuple:
+    """
+    Générer un CV optimisé (ou le relire en cache), puis le sauvegarder.
+    Retourne (contenu, score ATS détaillé, trouvé en cache).
+    """
+    key = optimize_cv_cache_key(request)
+    cached = optimize_cv_cache.get(key) if use_cache else None
+    
+    if cached:
+        print("⚡ CV optimisé trouvé en cache")
+        content = cached["optimized_cv"]
+        ats = calculate_ats_score(content, request.job_description)
+        await save_generated_cv(request, content, ats["score"])
+        return content, ats, True
+    
+    print("🤖 Génération CV avec OpenAI...")
+    
+    # Configuration directe de l'API key
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=503, detail="OPENAI_API_KEY manquante")
+    
+    data = build_optimize_cv_payload(request, compacted_cv)
+    response_data = await openai_client.coalesced_chat_completion(data)
+    content = response_data['choices'][0]['message']['content']
+    
+    ats = calculate_ats_score(content, request.job_description)
+    optimize_cv_cache.set(key, {"optimized_cv": content})
+    
+    # Sauvegarder dans Firestore si disponible
+    await save_generated_cv(request, content, ats["score"])
+    
+    return content, ats, False
 
 @app.post("/optimize-cv", response_model=CVGenerationResponse)
-async def optimize_cv(request: CVGenerationRequest):
+async def optimize_cv(request: CVGenerationRequest, http_request: Request, response: Response):
     """Optimiser un CV avec OpenAI"""
     print(f"🔍 DEBUG - Requête reçue: {request}")
     print(f"🔍 DEBUG - cv_content: {request.cv_content[:100] if request.cv_content else 'VIDE'}...")
@@ -909,198 +1417,25 @@ async def optimize_cv(request: CVGenerationRequest):
     print(f"🌍 DEBUG - target_language: {request.target_language}")
     
     # Validation des champs requis
-    if not request.cv_content or not request.cv_content.strip():
-        raise HTTPException(status_code=422, detail="cv_content est requis et ne peut pas être vide")
-    if not request.job_description or not request.job_description.strip():
-        raise HTTPException(status_code=422, detail="job_description est requis et ne peut pas être vide")
-    if not request.user_id or not request.user_id.strip():
-        raise HTTPException(status_code=422, detail="user_id est requis et ne peut pas être vide")
+    validate_cv_generation_request(request)
+    resolve_target_language(request)
     
     if not OPENAI_AVAILABLE:
         raise HTTPException(status_code=503, detail="OpenAI SDK non disponible")
     
     try:
-        print("🤖 Génération CV avec OpenAI...")
+        use_cache = not cache_bypass_requested(http_request)
+        if not use_cache:
+            optimize_cv_cache.record_bypass()
         
-        # Configuration directe de l'API key
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=503, detail="OPENAI_API_KEY manquante")
-        
-        # Utiliser l'API REST OpenAI directement
-        import requests
-        
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        data = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                     {
-                         "role": "system",
-                         "content": f"""Tu es un expert en optimisation de CV. Tu génères des CV avec une structure PRÉCISE et professionnelle.
-
-🚨🚨🚨 RÈGLE DE LANGUE ABSOLUE - PRIORITÉ #1 - OBLIGATOIRE 🚨🚨🚨
-1. La langue cible est : {request.target_language.upper()}
-2. GÉNÈRE le CV ENTIER dans cette langue ({request.target_language}).
-3. JAMAIS de mélange de langues dans le CV.
-4. Cette règle est ABSOLUE et doit être respectée à 100%.
-
-STRUCTURE OBLIGATOIRE À RESPECTER (dans cet ordre exact) :
-
-1. EN-TÊTE :
-   - Prénom NOM (en GRAS et CENTRÉ, couleur bleue)
-   - Coordonnées centrées : "Ville | Téléphone | Email | Site web"
-   - Titre professionnel générique (en GRAS et centré, couleur bleue)
-     Exemples : "Consultant Junior", "Frontend Developer", "Data Analyst", "Marketing Specialist"
-
-2. RÉSUMÉ PROFESSIONNEL (SANS TITRE) :
-   - Paragraphe de 3-4 phrases qui synthétise les forces
-   - Montre l'alignement avec le poste recherché
-   - Intègre les mots-clés de l'offre d'emploi
-
-3. EXPÉRIENCE PROFESSIONNELLE :
-   - Titre de section en MAJUSCULES + GRAS + ligne horizontale bleue RAPPROCHÉE
-   - Filtre intelligemment : supprime les jobs étudiants non pertinents (courte durée)
-   - Pour chaque expérience :
-     - Titre du Poste (en gras)
-     - Nom de l'entreprise (Dates)
-     - • Description avec pourcentages réalistes (PAS de chiffres infondés)
-     - • Description avec pourcentages réalistes
-
-4. FORMATION (ACADÉMIQUE) :
-   - Titre de section en MAJUSCULES + GRAS + ligne horizontale bleue RAPPROCHÉE
-   - Diplôme (en gras)
-   - Institution (Dates)
-   - • Spécialisation/détails
-
-5. CERTIFICATIONS & RÉALISATIONS (si nécessaire) :
-   - Titre de section en MAJUSCULES + GRAS + ligne horizontale bleue RAPPROCHÉE
-   - • Certification 1
-   - • Certification 2
-
-6. INFORMATIONS ADDITIONNELLES (si nécessaire) :
-   - Titre de section en MAJUSCULES + GRAS + ligne horizontale bleue RAPPROCHÉE
-   - • Information 1
-   - • Information 2
-
-RÈGLES STRICTES :
-
-1. **PAS DE SYMBOLES * :**
-   - Supprime TOUS les * du CV généré
-   - Utilise uniquement du texte propre
-
-2. **PAS DE GROS MENSONGES :**
-   - Utilise seulement des pourcentages réalistes
-   - PAS de chiffres infondés (ex: "200k de chiffre d'affaires")
-   - Reste crédible et professionnel
-
-3. **CONSERVATION OBLIGATOIRE :**
-   - JAMAIS enlever d'informations du CV original
-   - TOUJOURS ajouter/enrichir, jamais supprimer
-   - Conserver TOUS les liens/URLs du CV original
-   - Garder toutes les expériences, même courtes
-   - Préserver toutes les compétences et formations
-
-4. **UNE SEULE PAGE :**
-   - Le CV doit impérativement tenir sur 1 page
-   - Si nécessaire, compacter le texte ou réduire les espacements
-   - JAMAIS 2 pages
-
-5. **ENRICHISSEMENT INTELLIGENT :**
-   - Ajoute des détails pertinents manquants
-   - Enrichit les descriptions existantes
-   - Intègre les mots-clés de l'offre d'emploi
-   - Ajoute des pourcentages réalistes aux réalisations
-   - Complète avec des compétences connexes
-
-6. **STYLE PROFESSIONNEL :**
-   - Couleurs : Nom en bleu, titres de sections en bleu, lignes horizontales en bleu
-   - Ligne horizontale RAPPROCHÉE des titres de sections
-   - Espacement cohérent entre sections
-   - Texte sobre, professionnel, compact
-
-7. **INTELLIGENCE DE PLACEMENT :**
-   - Analyse intelligemment le CV original
-   - Place chaque information dans la bonne section
-   - Adapte le contenu selon la langue de l'offre d'emploi
-   - Utilise les données de l'aperçu comme référence
-
-8. **OPTIMISATION ATS :**
-   - Utilise le vocabulaire exact de l'offre d'emploi
-   - Répète naturellement les mots-clés importants
-   - Intègre les compétences demandées (sous forme d'intérêt si absentes)
-
-IMPORTANT : Respecte EXACTEMENT cette structure et utilise l'intelligence pour placer les informations correctement."""
-                     },
-                     {
-                         "role": "user",
-                         "content": f"""CV ORIGINAL :
-{request.cv_content}
-
-DESCRIPTION DU POSTE :
-{request.job_description}
-
-🚨 CONSIGNES CRITIQUES :
-
-1. **LANGUE ABSOLUE :** Le CV généré DOIT être en {request.target_language.upper()} (langue de l'offre d'emploi).
-
-2. **STRUCTURE EXACTE :** Prénom Nom → Contact → Titre générique → Résumé sans titre → Expériences → Formation → Certifications → Infos additionnelles
-
-3. **PAS DE SYMBOLES * :** Supprime TOUS les * du CV généré
-
-4. **PAS DE GROS MENSONGES :** Utilise seulement des pourcentages réalistes, PAS de chiffres infondés
-
-5. **CONSERVATION ABSOLUE :** JAMAIS enlever d'informations du CV original, TOUJOURS ajouter/enrichir
-
-6. **LIENS OBLIGATOIRES :** Conserver TOUS les liens/URLs du CV original
-
-7. **UNE SEULE PAGE :** Le CV doit tenir sur 1 page, jamais 2 pages
-
-8. **INTELLIGENCE DE PLACEMENT :** Place chaque information dans la bonne section de façon intelligente
-
-Génère un CV professionnel avec cette structure EXACTE, dans la langue de l'offre d'emploi !"""
-                     }
-            ],
-            "max_tokens": 4000,
-            "temperature": 0.7
-        }
-        
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
-        
-        if response.status_code != 200:
-            raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
-        
-        response_data = response.json()
-        
-        content = response_data['choices'][0]['message']['content']
-        
-        # Calculer un score ATS simulé (basé sur la longueur et les mots-clés)
-        ats_score = min(95, max(60, len(content) // 50 + 30))
-        
-        # Sauvegarder dans Firestore si disponible
-        if db:
-            try:
-                cv_data = {
-                    "user_id": request.user_id,
-                    "original_content": request.cv_content,
-                    "optimized_content": content,
-                    "job_description": request.job_description,
-                    "ats_score": ats_score,
-                    "created_at": datetime.now(),
-                    "is_downloaded": False
-                }
-                
-                db.collection('generated_cvs').add(cv_data)
-                print(f"✅ CV sauvegardé dans Firestore pour l'utilisateur {request.user_id}")
-            except Exception as e:
-                print(f"⚠️ Erreur sauvegarde Firestore: {e}")
+        content, ats, from_cache = await openai_client.cancel_on_disconnect(
+            http_request, generate_optimized_cv(request, use_cache)
+        )
+        response.headers["X-Cache"] = "HIT" if from_cache else "MISS"
         
         return CVGenerationResponse(
             optimized_cv=content,
-            ats_score=ats_score,
+            **ats_response_fields(ats),
             success=True,
             message="CV optimisé avec succès"
         )
@@ -1114,107 +1449,342 @@ Génère un CV professionnel avec cette structure EXACTE, dans la langue de l'of
             message=f"Erreur lors de l'optimisation: {str(e)}"
         )
 
-@app.post("/parse-cv", response_model=CVParsingResponse)
-async def parse_cv(request: CVParsingRequest):
-    """Parser un CV avec l'IA pour extraire les informations structurées"""
-    print(f"🔍 DEBUG - Parsing CV avec IA...")
-    print(f"🔍 DEBUG - cv_text length: {len(request.cv_text) if request.cv_text else 0}")
+@app.post("/optimize-cv/batch")
+async def optimize_cv_batch(request: CVBatchGenerationRequest, http_request: Request, stream: bool = False):
+    """
+    Optimiser un CV pour plusieurs offres d'emploi.
+
+    Le CV est compacté une seule fois, puis les générations tournent en
+    parallèle (au plus BATCH_CONCURRENCY à la fois). Chaque offre a son
+    propre résultat. Avec ?stream=true, les résultats arrivent en
+    Server-Sent Events ("result" par offre terminée, puis "done").
+    """
+    print(f"🔍 DEBUG - Lot reçu: {len(request.jobs)} offres pour user_id: {request.user_id}")
+    
+    if not request.cv_content or not request.cv_content.strip():
+        raise HTTPException(status_code=422, detail="cv_content est requis et ne peut pas être vide")
+    if not request.user_id or not request.user_id.strip():
+        raise HTTPException(status_code=422, detail="user_id est requis et ne peut pas être vide")
+    if not request.jobs:
+        raise HTTPException(status_code=422, detail="jobs est requis et ne peut pas être vide")
+    if len(request.jobs) > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=422, detail=f"Maximum {BATCH_MAX_JOBS} offres par lot")
     
     if not OPENAI_AVAILABLE:
         raise HTTPException(status_code=503, detail="OpenAI SDK non disponible")
     
+    use_cache = not cache_bypass_requested(http_request)
+    if not use_cache:
+        optimize_cv_cache.record_bypass()
+    
+    # Travail commun à toutes les offres
+    compacted_cv = compact_cv(request.cv_content)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run_job(index: int, job: BatchJob) -> CVBatchJobResult:
+        job_request = CVGenerationRequest(
+            cv_content=request.cv_content,
+            job_description=job.job_description,
+            user_id=request.user_id,
+            target_language=job.target_language or request.target_language
+        )
+        try:
+            validate_cv_generation_request(job_request)
+            resolve_target_language(job_request)
+            async with semaphore:
+                content, ats, from_cache = await generate_optimized_cv(job_request, use_cache, compacted_cv)
+            return CVBatchJobResult(
+                index=index,
+                optimized_cv=content,
+                **ats_response_fields(ats),
+                success=True,
+                cached=from_cache,
+                message="CV optimisé avec succès"
+            )
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"❌ Erreur lot (offre {index}): {detail}")
+            return CVBatchJobResult(
+                index=index,
+                optimized_cv=request.cv_content,
+                ats_score=50,
+                success=False,
+                message=f"Erreur lors de l'optimisation: {detail}"
+            )
+    
+    tasks = [asyncio.ensure_future(run_job(i, job)) for i, job in enumerate(request.jobs)]
+    
+    def summary(results: list) -> dict:
+        succeeded = sum(1 for r in results if r.success)
+        return {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded}
+    
+    if not stream:
+        try:
+            results = await openai_client.cancel_on_disconnect(http_request, asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+        return {
+            "success": any(r.success for r in results),
+            **summary(results),
+            "results": jsonable_encoder(results)
+        }
+    
+    async def event_stream():
+        results = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                results.append(result)
+                yield sse_event("result", jsonable_encoder(result))
+            yield sse_event("done", {"success": any(r.success for r in results), **summary(results)})
+        finally:
+            # Client parti : inutile de finir les générations restantes
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# File de tâches : génération en arrière-plan (désactivée si JOB_QUEUE_WORKERS=0)
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", 2))
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "cvbien_jobs.db")
+JOB_QUEUE_DRAIN_TIMEOUT = float(os.getenv("JOB_QUEUE_DRAIN_TIMEOUT", 30))
+
+async def run_queued_job(kind: str, payload: dict) -> dict:
+    """Exécuter une tâche de la file"""
+    if kind == "optimize_cv":
+        request = resolve_target_language(CVGenerationRequest(**payload))
+        content, ats, from_cache = await generate_optimized_cv(request)
+        return {"optimized_cv": content, **ats_response_fields(ats), "cached": from_cache}
+    raise ValueError(f"Type de tâche inconnu: {kind}")
+
+job_queue = None
+if JOB_QUEUE_WORKERS > 0:
     try:
-        print("🤖 Parsing CV avec OpenAI...")
-        
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=503, detail="OPENAI_API_KEY manquante")
-        
-        import requests
-        
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
+        job_queue = JobQueue(JOB_QUEUE_DB, run_queued_job, workers=JOB_QUEUE_WORKERS)
+    except Exception as e:
+        print(f"⚠️ File de tâches indisponible ({JOB_QUEUE_DB}): {e}")
+        job_queue = None
+
+@app.on_event("startup")
+def load_language_detection():
+    """Profils de langue chargés avant la première requête"""
+    load_language_profiles()
+
+@app.on_event("startup")
+async def start_job_queue():
+    if job_queue:
+        await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """Terminer les tâches en cours avant l'arrêt"""
+    if job_queue:
+        await job_queue.stop(timeout=JOB_QUEUE_DRAIN_TIMEOUT)
+
+def job_response(job: dict) -> dict:
+    return {
+        "success": True,
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+@app.post("/jobs/optimize-cv", status_code=202)
+async def submit_optimize_cv_job(request: CVGenerationRequest):
+    """Soumettre une optimisation de CV : retourne immédiatement un job_id"""
+    validate_cv_generation_request(request)
+    resolve_target_language(request)
+    
+    if not OPENAI_AVAILABLE:
+        raise HTTPException(status_code=503, detail="OpenAI SDK non disponible")
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="File de tâches non disponible")
+    
+    try:
+        job_id = job_queue.submit("optimize_cv", jsonable_encoder(request))
+    except QueueClosed as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    print(f"📥 Tâche {job_id} soumise pour l'utilisateur {request.user_id}")
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """État d'une tâche (à interroger périodiquement)"""
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="File de tâches non disponible")
+    
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return job_response(job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Suivre une tâche en Server-Sent Events : "status" à chaque changement, puis "result" ou "error" """
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="File de tâches non disponible")
+    if not job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    
+    async def event_stream():
+        last_status = None
+        while True:
+            job = job_queue.get(job_id)
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield sse_event("status", {"job_id": job_id, "status": last_status})
+            if last_status == "succeeded":
+                yield sse_event("result", job_response(job))
+                return
+            if last_status == "failed":
+                yield sse_event("error", job_response(job))
+                return
+            await job_queue.wait_for_change(job_id, timeout=1.0)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/optimize-cv/stream")
+async def optimize_cv_stream(request: CVGenerationRequest, http_request: Request):
+    """
+    Optimiser un CV avec OpenAI en Server-Sent Events.
+
+    Événements : "token" (fragment de texte) au fil de la génération, puis
+    "done" (score ATS) une fois le CV complet sauvegardé, ou "error".
+    """
+    print(f"🔍 DEBUG - Requête stream reçue pour user_id: {request.user_id}")
+    print(f"🌍 DEBUG - target_language: {request.target_language}")
+    
+    validate_cv_generation_request(request)
+    resolve_target_language(request)
+    
+    if not OPENAI_AVAILABLE:
+        raise HTTPException(status_code=503, detail="OpenAI SDK non disponible")
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=503, detail="OPENAI_API_KEY manquante")
+    
+    data = build_optimize_cv_payload(request)
+    key = optimize_cv_cache_key(request)
+    if cache_bypass_requested(http_request):
+        optimize_cv_cache.record_bypass()
+        cached = None
+    else:
+        cached = optimize_cv_cache.get(key)
+    
+    async def event_stream():
+        parts = []
+        try:
+            if cached:
+                # Résultat déjà connu : un seul fragment avec le CV complet
+                print("⚡ CV optimisé trouvé en cache (stream)")
+                content = cached["optimized_cv"]
+                yield sse_event("token", {"content": content})
+            else:
+                print("🤖 Génération CV en streaming avec OpenAI...")
+                async for delta in openai_client.stream_chat_completion(data):
+                    parts.append(delta)
+                    yield sse_event("token", {"content": delta})
+                
+                content = "".join(parts)
+                optimize_cv_cache.set(key, {"optimized_cv": content})
+            
+            ats = calculate_ats_score(content, request.job_description)
+            await save_generated_cv(request, content, ats["score"])
+            
+            yield sse_event("done", {
+                **ats_response_fields(ats),
+                "success": True,
+                "message": "CV optimisé avec succès"
+            })
+        except Exception as e:
+            print(f"❌ Erreur OpenAI (stream): {e}")
+            yield sse_event("error", {
+                "success": False,
+                "message": f"Erreur lors de l'optimisation: {str(e)}"
+            })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Cache": "HIT" if cached else "MISS"
         }
+    )
+
+def local_parsing_response(parsed: dict) -> CVParsingResponse:
+    return CVParsingResponse(
+        **{field: parsed[field] for field in CV_FIELDS},
+        confidence=parsed["confidence"],
+        source="local"
+    )
+
+@app.post("/parse-cv", response_model=CVParsingResponse)
+async def parse_cv(request: CVParsingRequest, http_request: Request, enrich: Optional[bool] = None):
+    """
+    Parser un CV : découpage local d'abord (quelques ms), IA seulement pour
+    l'enrichir selon le poste (par défaut si job_description est fourni,
+    ?enrich=false pour s'en passer) ou si le découpage local est peu fiable
+    """
+    print(f"🔍 DEBUG - Parsing CV...")
+    print(f"🔍 DEBUG - cv_text length: {len(request.cv_text) if request.cv_text else 0}")
+    
+    local = section_cv(request.cv_text)
+    if enrich is None:
+        enrich = bool(request.job_description.strip())
+    if not enrich and is_confident(local):
+        print(f"⚡ CV découpé localement (confiance {local['confidence']['overall']}, plus basse {local['confidence']['gate']})")
+        return local_parsing_response(local)
+    
+    # Sans IA : le découpage local, même imparfait, plutôt qu'une erreur
+    if not OPENAI_AVAILABLE or not os.getenv("OPENAI_API_KEY"):
+        if local["sections"]:
+            print("⚠️ IA indisponible, découpage local retourné")
+            return local_parsing_response(local)
+        if not OPENAI_AVAILABLE:
+            raise HTTPException(status_code=503, detail="OpenAI SDK non disponible")
+        raise HTTPException(status_code=503, detail="OPENAI_API_KEY manquante")
+    
+    try:
+        print(f"🤖 Parsing CV avec OpenAI ({'enrichissement' if enrich else 'confiance locale ' + str(local['confidence']['gate'])})...")
         
+        cv_text = compact_cv(request.cv_text)
+        job_description = job_prompt_text(request.job_description)
         data = {
             "model": "gpt-4o-mini",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": """Tu es un expert en parsing et enrichissement de CV. Tu dois extraire les informations d'un CV et les enrichir intelligemment selon le poste recherché.
-
-Tu dois retourner UNIQUEMENT un JSON valide avec cette structure exacte :
-
-{
-  "name": "NOM PRÉNOM",
-  "contact": "Ville | Téléphone | Email | Site web",
-  "title": "Titre professionnel adapté au poste",
-  "summary": "Résumé professionnel enrichi avec les compétences du poste",
-  "experience": [
-    {
-      "company": "Nom de l'entreprise",
-      "position": "Titre du poste",
-      "period": "Période (ex: Janvier 2023 - Décembre 2024)",
-      "description": ["Description enrichie 1", "Description enrichie 2"]
-    }
-  ],
-  "education": [
-    {
-      "institution": "Nom de l'institution",
-      "degree": "Diplôme",
-      "period": "Période (ex: 2020-2023)",
-      "description": "Description du programme enrichie avec lien au poste"
-    }
-  ],
-  "technicalSkills": "Compétences techniques originales + compétences techniques du poste + outils/logiciels du job (ex: Python, HTML, CSS, JavaScript, SQL, Tableau, Power BI, Salesforce, Jira, Confluence) séparées par des virgules",
-  "softSkills": "Qualités comportementales attendues (ex: Esprit d'équipe, Créativité, Esprit ouvert, Leadership) séparées par des virgules",
-  "certifications": ["Certification 1 (description courte)", "Certification 2 (description courte)"],
-  "additionalInfo": "Informations additionnelles (langues, etc.)"
-}
-
-RÈGLES D'ENRICHISSEMENT :
-1. **TITRE** : Adapte le titre professionnel au poste recherché
-2. **RÉSUMÉ** : Enrichis avec les compétences demandées dans le job
-3. **EXPÉRIENCES** : Ajoute des compétences du poste dans les descriptions
-4. **FORMATION** : Enrichis les descriptions pour montrer le lien avec le poste recherché
-5. **TECHNICALSKILLS** : Compétences techniques originales + compétences techniques du poste (basiques si manquantes) + outils/logiciels mentionnés dans le job
-6. **SOFTSKILLS** : Qualités comportementales attendues (esprit d'équipe, créativité, esprit ouvert, leadership, etc.)
-7. **CERTIFICATIONS** : UNIQUEMENT celles qui existent dans le CV original, n'invente RIEN, ajoute une description courte entre parenthèses
-8. **LANGUES** : Mets les langues sans ** dans additionalInfo, en dernière position
-9. **FORMATION-POSTE** : Pour chaque formation, ajoute une phrase qui montre le lien avec le poste recherché
-10. **CRÉDIBILITÉ** : Ne mens jamais, enrichis seulement avec du réaliste
-11. **LIENS** : Préserve TOUS les liens/URLs du CV original (email, site web, LinkedIn, etc.) - si il y en a plusieurs, mets les tous
-12. **CONSERVATION** : Ne supprime JAMAIS de compétences existantes, ajoute seulement
-13. **PAS DE N/A** : Ne mets JAMAIS "N/A" ou "Non spécifié", utilise des valeurs par défaut appropriées
-
-RÈGLES IMPORTANTES :
-- Retourne UNIQUEMENT le JSON, rien d'autre
-- Pas de markdown, pas de ```json```
-- Structure exacte respectée
-- Enrichis intelligemment selon le poste
-- Garde la crédibilité, pas de mensonges
-- Pour les compétences techniques : analyse la description de poste pour identifier tous les outils, logiciels, technologies mentionnés
-- Pour les formations : ajoute toujours une phrase qui explique pourquoi cette formation est pertinente pour le poste
-- Exemple formation-poste : "Programme orienté gestion de projet et analyse de données, compétences clés pour un Business Analyst"
-- Pour les langues : si tu vois "bilingue (en/fr)" ou similaire, inclus-le dans additionalInfo
-- Évite absolument "N/A", "Non spécifié", "Non disponible" - utilise des valeurs par défaut appropriées """
-                },
-                {
-                    "role": "user",
-                    "content": f"Parse ce CV et enrichis-le selon ce poste, puis retourne le JSON structuré :\n\nCV :\n{request.cv_text}\n\nPOSTE RECHERCHÉ :\n{request.job_description if request.job_description else 'Pas de description de poste fournie'}"
-                }
-            ],
-            "max_tokens": 2000,
+            "messages": PARSE_CV_PROMPT.messages(
+                cv_text=cv_text,
+                job_description=job_description if job_description else 'Pas de description de poste fournie'
+            ),
+            # JSON structuré : ~1,5x le CV source plus la structure
+            "max_tokens": output_token_budget(cv_text, ratio=1.5, floor=800, ceiling=2000),
             "temperature": 0.3
         }
         
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
-        
-        if response.status_code != 200:
-            raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
-        
-        response_data = response.json()
+        response_data = await openai_client.cancel_on_disconnect(
+            http_request, openai_client.coalesced_chat_completion(data)
+        )
         content = response_data['choices'][0]['message']['content']
         
         # Parser le JSON retourné par l'IA
@@ -1231,7 +1801,8 @@ RÈGLES IMPORTANTES :
                 technicalSkills=parsed_data.get('technicalSkills', ''),
                 softSkills=parsed_data.get('softSkills', ''),
                 certifications=parsed_data.get('certifications', []),
-                additionalInfo=parsed_data.get('additionalInfo', '')
+                additionalInfo=parsed_data.get('additionalInfo', ''),
+                confidence=local["confidence"]
             )
             
         except json.JSONDecodeError as e:
@@ -1239,6 +1810,12 @@ RÈGLES IMPORTANTES :
             print(f"❌ Contenu reçu: {content}")
             raise HTTPException(status_code=500, detail="Erreur parsing JSON de l'IA")
         
+    except openai_client.CircuitOpen as e:
+        if local["sections"]:
+            print(f"🛑 IA indisponible ({e}), découpage local retourné")
+            return local_parsing_response(local)
+        print(f"🛑 Parsing CV refusé: {e}")
+        raise HTTPException(status_code=503, detail=f"Service IA temporairement indisponible: {str(e)}")
     except Exception as e:
         print(f"❌ Erreur parsing CV: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du parsing: {str(e)}")
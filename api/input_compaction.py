@@ -0,0 +1,183 @@
+"""
+Compaction des entrées avant l'appel au modèle
+
+- nettoie les artefacts d'extraction PDF (sauts de page, numéros de page,
+  ligatures, mots coupés en fin de ligne, espaces multiples)
+- supprime les lignes répétées (en-têtes / pieds de page de chaque page)
+- retire des offres d'emploi les mentions légales et les listes d'avantages
+- tronque au budget de tokens configuré, ligne par ligne
+
+Changer les règles ci-dessous impose d'incrémenter COMPACTION_VERSION (elle
+fait partie des clés de cache).
+"""
+import os
+import re
+
+from tokens import count_tokens
+
+COMPACTION_VERSION = "2"
+
+CV_TOKEN_BUDGET = int(os.getenv("CV_TOKEN_BUDGET", 3000))
+JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", 1500))
+
+# Lignes plus courtes : puces, dates, intitulés... jamais dédoublonnées
+MIN_DEDUP_LINE_LENGTH = 15
+
+_LIGATURES = str.maketrans({
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl",
+    "\u00a0": " ", "\u2009": " ", "\u202f": " ",
+    "\u200b": None, "\u200c": None, "\u200d": None, "\ufeff": None,
+})
+
+_PAGE_NUMBER = re.compile(
+    r"^\s*(?:(?:page|pagina)\s*\d+\s*(?:(?:/|of|sur|de|van)\s*\d+)?|-?\s*\d{1,3}\s*-?)\s*$",
+    re.IGNORECASE,
+)
+# "2/3" seul sur sa ligne : numéro de page si 1 <= N <= M <= MAX_PAGE_TOTAL ; "09/2019",
+# "03/19" (zéro initial) ou "9/19" (année sur deux chiffres) sont des dates
+_PAGE_FRACTION = re.compile(r"^([1-9]\d?)\s*/\s*([1-9]\d?)$")
+MAX_PAGE_TOTAL = 12
+_HYPHEN_BREAK = re.compile(r"(?<=[a-zà-ÿ])-\n(?=[a-zà-ÿ])")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+_LEGAL_LINE = re.compile(
+    r"equal opportunit|égalité des chances|egalite des chances|gelijke kansen|"
+    r"without regard to|sans distinction|zonder onderscheid|"
+    r"\bRGPD\b|\bGDPR\b|\bAVG\b|données personnelles|personal data|persoonsgegevens|"
+    r"privacy (?:policy|statement|verklaring)|politique de confidentialité|"
+    r"agences? de recrutement|recruitment agenc|wervingsbureau|"
+    r"acquisitie naar aanleiding",
+    re.IGNORECASE,
+)
+_BENEFITS_HEADING = re.compile(
+    r"^\W*(?:what we offer|we offer|our offer|benefits|perks|why join us|"
+    r"ce que nous (?:vous )?offrons|nous (?:vous )?offrons|notre offre|avantages|pourquoi nous rejoindre|"
+    r"wat (?:wij|we) (?:bieden|bieden jou)|wij bieden|ons aanbod|arbeidsvoorwaarden|waarom bij ons)\b",
+    re.IGNORECASE,
+)
+
+_stats = {
+    "calls": 0,
+    "tokens_in": 0,
+    "tokens_out": 0,
+}
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 60:
+        return False
+    return stripped.endswith(":") or (stripped.isupper() and len(stripped) > 3)
+
+
+def is_page_number(line: str) -> bool:
+    """Ligne qui n'est qu'un numéro de page ("3", "- 3 -", "Page 2 sur 4", "2/3")"""
+    if _PAGE_NUMBER.match(line):
+        return True
+    match = _PAGE_FRACTION.match(line)
+    return match is not None and int(match.group(1)) <= int(match.group(2)) <= MAX_PAGE_TOTAL
+
+
+def normalize_text(text: str, drop_page_numbers: bool = True) -> str:
+    """Nettoyer les artefacts d'extraction et les espaces"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n")
+    text = text.translate(_LIGATURES)
+    text = _HYPHEN_BREAK.sub("", text)
+    lines = []
+    for line in text.split("\n"):
+        line = _SPACES.sub(" ", line).strip()
+        if drop_page_numbers and is_page_number(line):
+            continue
+        lines.append(line)
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def drop_duplicate_lines(text: str) -> str:
+    """Supprimer les lignes longues déjà vues (en-têtes/pieds de page répétés)"""
+    seen = set()
+    kept = []
+    for line in text.split("\n"):
+        key = line.casefold()
+        if len(line) >= MIN_DEDUP_LINE_LENGTH:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return _BLANK_LINES.sub("\n\n", "\n".join(kept)).strip()
+
+
+def drop_job_boilerplate(text: str) -> str:
+    """Retirer mentions légales et sections d'avantages d'une offre d'emploi"""
+    kept = []
+    in_benefits = False
+    for line in text.split("\n"):
+        if _BENEFITS_HEADING.match(line):
+            in_benefits = True
+            continue
+        if in_benefits:
+            if _is_heading(line):
+                in_benefits = False
+            else:
+                continue
+        if _LEGAL_LINE.search(line):
+            continue
+        kept.append(line)
+    return _BLANK_LINES.sub("\n\n", "\n".join(kept)).strip()
+
+
+def trim_to_budget(text: str, max_tokens: int) -> str:
+    """Garder les premières lignes tant que le budget de tokens n'est pas atteint"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept).strip()
+
+
+def _record(original: str, compacted: str):
+    _stats["calls"] += 1
+    _stats["tokens_in"] += count_tokens(original)
+    _stats["tokens_out"] += count_tokens(compacted)
+
+
+def compact_cv(text: str, max_tokens: int = CV_TOKEN_BUDGET) -> str:
+    """Compacter le texte d'un CV (toutes les informations sont conservées sauf dépassement du budget)"""
+    if not text:
+        return text
+    compacted = trim_to_budget(drop_duplicate_lines(normalize_text(text)), max_tokens)
+    _record(text, compacted)
+    return compacted
+
+
+def compact_job_description(text: str, max_tokens: int = JOB_TOKEN_BUDGET) -> str:
+    """Compacter une offre d'emploi : nettoyage, boilerplate, doublons, budget"""
+    if not text:
+        return text
+    cleaned = drop_duplicate_lines(drop_job_boilerplate(normalize_text(text)))
+    compacted = trim_to_budget(cleaned, max_tokens)
+    _record(text, compacted)
+    return compacted
+
+
+def output_token_budget(source_text: str, ratio: float, floor: int, ceiling: int) -> int:
+    """
+    max_tokens adapté à la taille attendue de la réponse : proportionnel au
+    texte source (le CV réécrit ou structuré), borné par floor et ceiling.
+    """
+    return max(floor, min(ceiling, int(count_tokens(source_text) * ratio)))
+
+
+def compaction_stats() -> dict:
+    saved = _stats["tokens_in"] - _stats["tokens_out"]
+    return {
+        **_stats,
+        "tokens_saved": saved,
+        "saved_ratio": round(saved / _stats["tokens_in"], 3) if _stats["tokens_in"] else 0.0,
+    }
@@ -0,0 +1,171 @@
+"""
+Analyse des offres d'emploi, partagée entre utilisateurs
+
+Beaucoup d'utilisateurs ciblent les mêmes offres : l'analyse (texte nettoyé,
+langue, mots-clés, compétences demandées, compétences de la taxonomie) est
+calculée une fois par offre et mémorisée par hash du texte normalisé, en
+mémoire et dans le cache SQLite partagé entre workers. La langue détectée
+sert aussi de langue cible quand le client ne l'indique pas.
+"""
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from input_compaction import COMPACTION_VERSION, compact_job_description, normalize_text
+from language_detection import detector as language_detector
+from result_cache import ResultCache, cache_key
+from skill_taxonomy import TAXONOMY
+
+ANALYZER_VERSION = "3"
+
+MAX_KEYWORDS = 25
+MAX_SKILLS = 20
+
+STOPWORDS = {
+    "french": {
+        "le", "la", "les", "un", "une", "des", "du", "de", "et", "ou", "en", "au", "aux",
+        "pour", "par", "avec", "sur", "dans", "est", "sont", "vous", "nous", "votre", "vos",
+        "notre", "nos", "qui", "que", "quoi", "dont", "son", "ses", "leur", "leurs", "ce",
+        "cette", "ces", "pas", "plus", "être", "avoir", "sera", "afin", "ainsi", "tout",
+        "tous", "toute", "toutes", "très", "bien", "comme", "aussi", "mais", "entre",
+    },
+    "english": {
+        "the", "and", "or", "a", "an", "of", "to", "in", "for", "with", "on", "at", "by",
+        "is", "are", "be", "will", "you", "your", "we", "our", "us", "who", "that", "this",
+        "these", "those", "as", "from", "have", "has", "not", "all", "any", "can", "able",
+        "should", "must", "would", "their", "they", "it", "its", "also", "more", "within",
+    },
+    "dutch": {
+        "de", "het", "een", "en", "of", "van", "voor", "met", "op", "in", "aan", "bij",
+        "is", "zijn", "wordt", "worden", "je", "jij", "jouw", "wij", "we", "ons", "onze",
+        "die", "dat", "deze", "dit", "als", "niet", "ook", "naar", "om", "te", "tot",
+        "over", "heb", "hebt", "heeft", "hebben", "kan", "kunnen", "moet", "zal", "er",
+    },
+}
+_ALL_STOPWORDS = set().union(*STOPWORDS.values())
+
+_WORD = re.compile(r"[a-zà-ÿ][a-zà-ÿ0-9+#.\-]*[a-zà-ÿ0-9+#]|[a-zà-ÿ]{2,}", re.IGNORECASE)
+# SQL, PowerBI, Node.js, C#, SAP, AWS...
+_TECH_TERM = re.compile(r"\b(?:[A-Z]{2,6}[0-9]*|[A-Z][a-z]+[A-Z][A-Za-z]*|[A-Za-z]+\.js|C\+\+|C#|\.NET)(?![\w+#])")
+_BULLET = re.compile(r"^\s*(?:[-•*·▪–o]|\d+[.)])\s+")
+_REQUIREMENTS_HEADING = re.compile(
+    r"^\W*(?:requirements|qualifications|your profile|profile|what you bring|must have|skills|"
+    r"profil(?: recherché)?|exigences|compétences(?: requises)?|qualifications requises|"
+    r"profiel|vereisten|functie-?eisen|wat breng je mee|wat vragen wij|competenties)\b",
+    re.IGNORECASE,
+)
+
+JOB_ANALYSIS_CACHE_TTL = float(os.getenv("JOB_ANALYSIS_CACHE_TTL", 7 * 86400))
+job_analysis_cache = ResultCache(
+    "job_analysis",
+    max_entries=int(os.getenv("JOB_ANALYSIS_CACHE_SIZE", 1024)),
+    ttl=JOB_ANALYSIS_CACHE_TTL,
+    db_path=os.getenv("RESULT_CACHE_DB"),
+)
+
+
+def normalize_job_text(text: str) -> str:
+    """Forme canonique d'une offre (hash) : espaces et casse ignorés"""
+    return " ".join(normalize_text(text or "").casefold().split())
+
+
+def job_text_hash(text: str) -> str:
+    return cache_key(normalize_job_text(text), ANALYZER_VERSION, COMPACTION_VERSION)
+
+
+def _detect_language_with_confidence(text: str) -> Tuple[str, float]:
+    """Langue de l'offre (french / english / dutch) et fiabilité de la détection"""
+    language, confidence = language_detector.detect(text)
+    return language or "english", confidence
+
+
+def extract_tech_terms(text: str) -> List[str]:
+    """Termes techniques (sigles, CamelCase, frameworks .js...) dans l'ordre d'apparition"""
+    tech = []
+    for line in text.split("\n"):
+        if line.isupper() and len(line.split()) > 1 and not _BULLET.match(line):
+            continue  # titre de section en majuscules
+        for term in _TECH_TERM.findall(line):
+            if term.lower() not in _ALL_STOPWORDS and term not in tech:
+                tech.append(term)
+    return tech
+
+
+def extract_keywords(text: str, limit: int = MAX_KEYWORDS) -> List[str]:
+    """Termes les plus fréquents hors mots outils, termes techniques en tête"""
+    tech = extract_tech_terms(text)
+    counts = Counter(
+        w.lower().strip(".-") for w in _WORD.findall(text)
+        if len(w) > 2 and w.lower() not in _ALL_STOPWORDS
+    )
+    keywords = tech[:limit]
+    known = {k.lower() for k in keywords}
+    for word, _ in counts.most_common():
+        if len(keywords) >= limit:
+            break
+        if word not in known:
+            keywords.append(word)
+            known.add(word)
+    return keywords
+
+
+def extract_required_skills(text: str, limit: int = MAX_SKILLS) -> List[str]:
+    """Puces des sections profil / exigences de l'offre"""
+    skills = []
+    in_requirements = False
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if _REQUIREMENTS_HEADING.match(stripped) and len(stripped) <= 60:
+            in_requirements = True
+            continue
+        is_bullet = bool(_BULLET.match(stripped))
+        if in_requirements and not is_bullet and stripped.endswith(":"):
+            in_requirements = False
+            continue
+        if in_requirements and is_bullet:
+            skill = _BULLET.sub("", stripped).strip()[:120]
+            if skill and skill not in skills:
+                skills.append(skill)
+        if len(skills) >= limit:
+            break
+    return skills
+
+
+def _analyze(job_description: str) -> dict:
+    cleaned = compact_job_description(job_description)
+    language, confidence = _detect_language_with_confidence(cleaned)
+    return {
+        "version": ANALYZER_VERSION,
+        "language": language,
+        "language_confidence": confidence,
+        "keywords": extract_keywords(cleaned),
+        "required_skills": extract_required_skills(cleaned),
+        "skills": TAXONOMY.skills_in(cleaned),
+        "cleaned_text": cleaned,
+    }
+
+
+def analyze_job_description(job_description: str) -> dict:
+    """Analyse mémorisée d'une offre d'emploi (clé : hash du texte normalisé)"""
+    key = job_text_hash(job_description)
+    analysis = job_analysis_cache.get(key)
+    if analysis is None:
+        analysis = _analyze(job_description)
+        job_analysis_cache.set(key, analysis)
+    return {**analysis, "hash": key}
+
+
+def render_analysis(analysis: dict) -> str:
+    """Version compacte de l'offre pour le prompt (JOB_PROMPT_MODE=analysis)"""
+    first_line = analysis["cleaned_text"].split("\n", 1)[0]
+    parts = [first_line]
+    if analysis["required_skills"]:
+        parts.append("Compétences requises :\n" + "\n".join(f"- {s}" for s in analysis["required_skills"]))
+    if analysis.get("skills"):
+        parts.append("Compétences détectées : " + ", ".join(analysis["skills"]))
+    if analysis["keywords"]:
+        parts.append("Mots-clés : " + ", ".join(analysis["keywords"]))
+    return "\n\n".join(parts)
@@ -0,0 +1,264 @@
+"""
+File de tâches asynchrone persistante (SQLite)
+
+La soumission retourne immédiatement un identifiant ; des workers asyncio en
+arrière-plan exécutent la tâche (appel OpenAI) et enregistrent le résultat.
+Les tâches sont stockées dans SQLite : elles survivent à un redémarrage et
+plusieurs processus uvicorn peuvent partager le même fichier (chaque tâche
+est réservée par un UPDATE atomique avant d'être exécutée).
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+Handler = Callable[[str, dict], Awaitable[dict]]
+
+
+class QueueClosed(Exception):
+    """La file n'accepte plus de tâches (arrêt en cours)"""
+
+
+class JobQueue:
+    """File de tâches persistante avec workers asyncio"""
+
+    def __init__(self, db_path: str, handler: Handler, workers: int = 2,
+                 max_attempts: int = 3, poll_interval: float = 2.0, stale_after: float = 300.0):
+        self.db_path = db_path
+        self.handler = handler
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        # Une tâche "running" plus ancienne est considérée orpheline (processus
+        # arrêté brutalement) ; les plus récentes appartiennent à un autre worker.
+        # Le worker qui exécute une tâche rafraîchit updated_at toutes les
+        # stale_after / 3 secondes : une tâche longue n'est jamais rejouée tant
+        # que son processus vit. Vérifié au démarrage puis, quand un worker est
+        # inactif, toutes les stale_after / 4 secondes
+        self.stale_after = stale_after
+        self._next_stale_check = 0.0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._db.commit()
+
+        self._pending: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._running_jobs: Dict[asyncio.Task, str] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._accepting = False
+        self.completed = 0
+        self.failed = 0
+
+    # --- Cycle de vie ---
+
+    async def start(self):
+        """Reprendre les tâches interrompues et lancer les workers"""
+        self._pending = asyncio.Queue()
+        recovered = self._requeue_stale()
+        with self._lock:
+            queued = [row["id"] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            )]
+        for job_id in queued:
+            self._pending.put_nowait(job_id)
+
+        self._accepting = True
+        self._workers = [asyncio.ensure_future(self._worker(i)) for i in range(self.worker_count)]
+        print(f"✅ File de tâches: {self.worker_count} workers, {len(queued)} tâches en attente ({recovered} reprises)")
+
+    async def stop(self, timeout: float = 30.0):
+        """Arrêt propre : plus de soumissions, on termine les tâches en cours"""
+        self._accepting = False
+        if not self._workers:
+            return
+        for _ in self._workers:
+            self._pending.put_nowait(None)  # réveiller les workers inactifs
+
+        done, pending = await asyncio.wait(self._workers, timeout=timeout)
+        if pending:
+            print(f"⚠️ File de tâches: {len(self._running_jobs)} tâches interrompues, remises en attente")
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._workers = []
+        print("🛑 File de tâches arrêtée")
+
+    # --- API ---
+
+    def submit(self, kind: str, payload: dict) -> str:
+        if not self._accepting:
+            raise QueueClosed("File de tâches indisponible")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), QUEUED, now, now),
+            )
+            self._db.commit()
+        self._pending.put_nowait(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, result, error, attempts, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """Attendre un changement d'état (notifié dans ce processus, sinon délai écoulé)"""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Pas de notification (identifiant inconnu, ou tâche d'un autre processus) :
+            # l'entrée est retirée pour que _changed ne grossisse pas
+            if self._changed.get(job_id) is event:
+                del self._changed[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": len(self._workers),
+            "accepting": self._accepting,
+            "queue_depth": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "running_here": len(self._running_jobs),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    # --- Workers ---
+
+    def _requeue_stale(self) -> int:
+        """Rejouer les tâches restées "running" après un arrêt brutal (hors tâches en cours ici)"""
+        now = time.time()
+        stale_before = now - self.stale_after
+        self._next_stale_check = now + self.stale_after / 4
+        running_here = list(self._running_jobs.values())
+        exclude = f" AND id NOT IN ({', '.join('?' * len(running_here))})" if running_here else ""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status = ? AND updated_at < ? AND attempts >= ?" + exclude,
+                (FAILED, "Nombre maximal de tentatives atteint", now, RUNNING, stale_before, self.max_attempts,
+                 *running_here),
+            )
+            recovered = self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?" + exclude,
+                (QUEUED, now, RUNNING, stale_before, *running_here),
+            ).rowcount
+            self._db.commit()
+        return recovered
+
+    def _claim(self, job_id: Optional[str]) -> Optional[sqlite3.Row]:
+        """Réserver une tâche (celle demandée, ou la plus ancienne en attente)"""
+        with self._lock:
+            if job_id is None:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id = row["id"]
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED),
+            ).rowcount
+            self._db.commit()
+            if not claimed:
+                return None  # déjà prise par un autre worker / processus
+            return self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time(), job_id),
+            )
+            self._db.commit()
+        self._notify(job_id)
+
+    async def _heartbeat(self, job_id: str):
+        """Signe de vie d'une tâche en cours (voir stale_after)"""
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+                    (time.time(), job_id, RUNNING),
+                )
+                self._db.commit()
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job_id = await asyncio.wait_for(self._pending.get(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                job_id = None  # rien en local : tâches soumises à un autre processus ?
+            if not self._accepting:
+                return  # arrêt : les tâches non commencées restent en attente dans SQLite
+            if job_id is None and time.time() >= self._next_stale_check:
+                recovered = self._requeue_stale()
+                if recovered:
+                    print(f"🔄 File de tâches: {recovered} tâches orphelines remises en attente")
+
+            row = self._claim(job_id)
+            if row is None:
+                continue
+            self._notify(row["id"])
+
+            task = asyncio.current_task()
+            self._running_jobs[task] = row["id"]
+            heartbeat = asyncio.ensure_future(self._heartbeat(row["id"]))
+            try:
+                result = await self.handler(row["kind"], json.loads(row["payload"]))
+                self._finish(row["id"], SUCCEEDED, result=result)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # Arrêt forcé : la tâche sera rejouée au prochain démarrage
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                        (QUEUED, time.time(), row["id"]),
+                    )
+                    self._db.commit()
+                raise
+            except Exception as e:
+                print(f"❌ Tâche {row['id']} ({row['kind']}) échouée: {e}")
+                self._finish(row["id"], FAILED, error=str(e))
+                self.failed += 1
+            finally:
+                heartbeat.cancel()
+                self._running_jobs.pop(task, None)
@@ -0,0 +1,137 @@
+"""
+Détection de la langue d'un texte (français, anglais, néerlandais)
+
+Classifieur bayésien naïf sur les trigrammes de caractères. Les profils
+sont construits à partir des textes de référence api/languages/<langue>.txt
+au premier appel (ou au démarrage, voir warm_up) puis partagés par toutes
+les requêtes. Une détection prend de l'ordre de la milliseconde (voir
+benchmarks/bench_language_detection.py), sans dépendance externe.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+LANGUAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "languages")
+LANGUAGES = ("french", "english", "dutch")
+DEFAULT_TARGET_LANGUAGE = os.getenv("DEFAULT_TARGET_LANGUAGE", "french")
+
+# Début du texte seulement : au-delà, le verdict ne change plus
+MAX_CHARS = 1000
+# En dessous (trigrammes, écart moyen de log-vraisemblance), pas de verdict fiable
+MIN_NGRAMS = 12
+MIN_MARGIN = 0.15
+
+_NON_LETTER = re.compile(r"[^a-zà-ÿœæ]+")
+
+
+def ngrams(text: str) -> Counter:
+    """Trigrammes de caractères (mots bordés d'espaces, minuscules)"""
+    text = " " + _NON_LETTER.sub(" ", text[:MAX_CHARS].lower()).strip() + " "
+    return Counter(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def _corpus_ngrams(text: str) -> Counter:
+    """Trigrammes d'un texte de référence complet (sans limite de longueur)"""
+    counts = Counter()
+    for line in text.splitlines():
+        counts.update(ngrams(line))
+    return counts
+
+
+class LanguageDetector:
+    """Profils de trigrammes par langue, chargés une fois et partagés"""
+
+    def __init__(self, directory: str = LANGUAGES_DIR, languages=LANGUAGES):
+        self.directory = directory
+        self.languages = languages
+        self._profiles: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_seconds = 0.0
+
+    def _load(self) -> Dict[str, Tuple[Dict[str, float], float]]:
+        profiles = {}
+        for language in self.languages:
+            path = os.path.join(self.directory, f"{language}.txt")
+            try:
+                with open(path, encoding="utf-8") as f:
+                    counts = _corpus_ngrams(f.read())
+            except OSError as e:
+                print(f"⚠️ Profil de langue introuvable ({path}): {e}")
+                continue
+            # Lissage de Laplace : log P(trigramme | langue), et valeur des inconnus
+            denominator = sum(counts.values()) + len(counts) + 1
+            profiles[language] = (
+                {gram: math.log((count + 1) / denominator) for gram, count in counts.items()},
+                math.log(1 / denominator),
+            )
+        return profiles
+
+    @property
+    def profiles(self) -> Dict[str, Tuple[Dict[str, float], float]]:
+        if self._profiles is None:
+            with self._lock:
+                if self._profiles is None:
+                    self._profiles = self._load()
+                    print(f"✅ Profils de langue chargés: {', '.join(self._profiles) or 'aucun'}")
+        return self._profiles
+
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Langue la plus probable et fiabilité (0-1) ; None si le texte est vide
+        ou qu'aucun profil n'est disponible.
+        """
+        profiles = self.profiles
+        start = time.perf_counter()
+        grams = ngrams(text or "")
+        total = sum(grams.values())
+        if not total or not profiles:
+            return None, 0.0
+
+        scores = {}
+        for language, (logp, unseen) in profiles.items():
+            get = logp.get
+            scores[language] = sum(count * get(gram, unseen) for gram, count in grams.items())
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = ranked[0]
+        margin = (scores[best] - scores[ranked[1]]) / total if len(ranked) > 1 else MIN_MARGIN
+        # Fiabilité : écart moyen par trigramme rapporté au seuil, pénalisé si le texte est court
+        confidence = min(1.0, margin / (2 * MIN_MARGIN)) * min(1.0, total / (2 * MIN_NGRAMS))
+
+        self.calls += 1
+        self.total_seconds += time.perf_counter() - start
+        return best, round(confidence, 3)
+
+    def stats(self) -> dict:
+        return {
+            "profiles_loaded": self._profiles is not None,
+            "languages": list(self._profiles or ()),
+            "calls": self.calls,
+            "avg_ms": round(1000 * self.total_seconds / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+detector = LanguageDetector()
+
+
+def is_reliable(confidence: float) -> bool:
+    return confidence >= 0.5
+
+
+def detect_language(text: str, default: str = DEFAULT_TARGET_LANGUAGE) -> str:
+    """Langue du texte, ou default si la détection n'est pas fiable"""
+    language, confidence = detector.detect(text)
+    return language if language and is_reliable(confidence) else default
+
+
+def warm_up():
+    """Charger les profils (au démarrage, pour ne pas le faire pendant une requête)"""
+    return detector.profiles
+
+
+def language_detection_stats() -> dict:
+    return detector.stats()
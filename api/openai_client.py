@@ -0,0 +1,284 @@
+"""
+Client HTTP asynchrone partagé pour l'API OpenAI
+
+Un seul httpx.AsyncClient par worker : les connexions TLS vers api.openai.com
+restent ouvertes (keep-alive) et sont réutilisées d'un appel à l'autre, et un
+appel en cours ne bloque plus la boucle d'événements.
+
+Chaque appel passe par le limiteur de débit (rate_limiter.py) : au-delà des
+limites requêtes/tokens par minute, les appels attendent leur tour au lieu de
+recevoir un 429, et les 429 / 5xx sont rejoués avec un backoff exponentiel.
+Un disjoncteur (circuit_breaker.py) fait échouer immédiatement les appels
+quand OpenAI est en panne, et les requêtes de couverture (hedging.py),
+optionnelles, relancent un appel anormalement lent.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from circuit_breaker import CircuitBreaker, CircuitOpen  # noqa: F401 (réexporté)
+from hedging import Hedger
+from rate_limiter import RateLimiter
+from single_flight import SingleFlight
+from tokens import count_tokens
+
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+
+# Timeouts (secondes) - le timeout total borne toute la génération
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", 60))
+OPENAI_TOTAL_TIMEOUT = float(os.getenv("OPENAI_TOTAL_TIMEOUT", 90))
+
+# Pool de connexions
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", 20))
+
+# Limites du compte (recalées ensuite sur les en-têtes x-ratelimit-*)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 500))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 200000))
+
+# Nouvelles tentatives sur 429 / 5xx
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 4))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", 1))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", 30))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Disjoncteur : ouvert après N échecs consécutifs, appel de test après le délai
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", 5))
+OPENAI_BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", 30))
+
+# Requêtes de couverture (double le coût des appels lents, désactivé par défaut)
+OPENAI_HEDGE = os.getenv("OPENAI_HEDGE", "0").lower() in ("1", "true", "yes")
+OPENAI_HEDGE_MIN_DELAY = float(os.getenv("OPENAI_HEDGE_MIN_DELAY", 2))
+
+# Réservé par appel quand le payload ne fixe pas max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+_client: Optional[httpx.AsyncClient] = None
+_single_flight = SingleFlight("openai")
+_rate_limiter = RateLimiter(
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    backoff_base=OPENAI_BACKOFF_BASE,
+    backoff_max=OPENAI_BACKOFF_MAX,
+)
+_breaker = CircuitBreaker("OpenAI", OPENAI_BREAKER_THRESHOLD, OPENAI_BREAKER_RESET)
+_hedger = Hedger(enabled=OPENAI_HEDGE, min_delay=OPENAI_HEDGE_MIN_DELAY)
+
+
+class ClientDisconnected(Exception):
+    """Le client HTTP s'est déconnecté avant la fin de l'appel"""
+
+
+class OpenAIError(Exception):
+    """Erreur renvoyée par l'API OpenAI (statut HTTP != 200)"""
+
+    def __init__(self, status_code: int, body: str, headers: Optional[dict] = None):
+        super().__init__(f"OpenAI API error: {status_code} - {body}")
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Retourner le client partagé (créé au premier appel)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Fermer le client partagé (à l'arrêt du serveur)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def _headers() -> dict:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise OpenAIError(401, "OPENAI_API_KEY manquante")
+    return {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Tokens décomptés par OpenAI pour la limite TPM : prompt + max_tokens"""
+    prompt = sum(
+        count_tokens(message.get("content") or "") + 4
+        for message in payload.get("messages", [])
+    )
+    return prompt + int(payload.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def _retry_delay(error: OpenAIError, attempt: int) -> float:
+    """Délai avant de rejouer l'appel, ou relève error s'il ne faut pas réessayer"""
+    if error.status_code not in RETRYABLE_STATUS or attempt >= OPENAI_MAX_RETRIES:
+        raise error
+    if error.status_code == 429 and "insufficient_quota" in error.body:
+        raise error  # quota épuisé : attendre n'y changera rien
+    delay = _rate_limiter.backoff(attempt, error.headers, throttled=error.status_code == 429)
+    print(f"⚠️ OpenAI {error.status_code} - nouvel essai dans {delay:.1f}s ({attempt + 1}/{OPENAI_MAX_RETRIES})")
+    return delay
+
+
+def _record_response(response: httpx.Response):
+    """Mettre à jour limiteur et disjoncteur d'après une réponse OpenAI"""
+    _rate_limiter.observe_headers(response.headers)
+    if response.status_code >= 500:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success()
+
+
+async def chat_completion(payload: dict, timeout: Optional[float] = None) -> dict:
+    """
+    Appeler /v1/chat/completions et retourner la réponse JSON.
+
+    timeout borne la durée de chaque tentative (OPENAI_TOTAL_TIMEOUT par
+    défaut) ; l'attente dans la file du limiteur et les backoffs n'en font pas
+    partie. L'annulation de la tâche appelante ferme proprement la requête en cours.
+    """
+    headers = _headers()
+    estimated = estimate_tokens(payload)
+
+    async def _call():
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                get_client().post(OPENAI_API_URL, headers=headers, json=payload),
+                timeout=timeout or OPENAI_TOTAL_TIMEOUT,
+            )
+        except (asyncio.TimeoutError, httpx.TransportError):
+            _breaker.record_failure()
+            raise
+        _record_response(response)
+        if response.status_code != 200:
+            raise OpenAIError(response.status_code, response.text, dict(response.headers))
+        _hedger.observe(time.monotonic() - started)
+        return response.json()
+
+    async def _hedge_call():
+        await _rate_limiter.acquire(estimated)
+        return await _call()
+
+    attempt = 0
+    while True:
+        _breaker.check()
+        await _rate_limiter.acquire(estimated)
+        try:
+            data = await _hedger.run(_call, _hedge_call)
+        except OpenAIError as e:
+            await asyncio.sleep(_retry_delay(e, attempt))
+            attempt += 1
+            continue
+        _rate_limiter.reconcile(estimated, (data.get("usage") or {}).get("total_tokens"))
+        return data
+
+
+async def coalesced_chat_completion(payload: dict, timeout: Optional[float] = None) -> dict:
+    """
+    Comme chat_completion, mais les requêtes identiques déjà en cours dans ce
+    worker (double clic, retry du frontend) partagent un seul appel OpenAI.
+    """
+    key = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return await _single_flight.do(key, lambda: chat_completion(payload, timeout))
+
+
+def single_flight_stats() -> dict:
+    return _single_flight.stats()
+
+
+def rate_limiter_stats() -> dict:
+    return _rate_limiter.stats()
+
+
+def circuit_breaker_stats() -> dict:
+    return _breaker.stats()
+
+
+def hedging_stats() -> dict:
+    return _hedger.stats()
+
+
+async def stream_chat_completion(payload: dict) -> AsyncIterator[str]:
+    """
+    Appeler /v1/chat/completions en mode stream et produire les fragments de
+    texte au fur et à mesure de leur arrivée.
+
+    Le timeout de lecture s'applique entre deux fragments ; fermer le
+    générateur (client déconnecté) ferme la connexion vers OpenAI. Un 429 / 5xx
+    n'est rejoué qu'avant le premier fragment ; pas de requête de couverture
+    en streaming (les fragments déjà envoyés ne peuvent pas être repris).
+    """
+    headers = _headers()
+    payload = {**payload, "stream": True}
+    estimated = estimate_tokens(payload)
+
+    attempt = 0
+    while True:
+        _breaker.check()
+        await _rate_limiter.acquire(estimated)
+        try:
+            async with get_client().stream("POST", OPENAI_API_URL, headers=headers, json=payload) as response:
+                _record_response(response)
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        data = line[len("data: "):]
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if not chunk.get("choices"):
+                            continue
+                        delta = chunk["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+                    return
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                error = OpenAIError(response.status_code, body, dict(response.headers))
+        except httpx.TransportError:
+            _breaker.record_failure()
+            raise
+        await asyncio.sleep(_retry_delay(error, attempt))
+        attempt += 1
+
+
+async def cancel_on_disconnect(request, coro, poll_interval: float = 0.5):
+    """
+    Exécuter coro en l'annulant si le client HTTP se déconnecte entre-temps.
+
+    Évite de payer une génération complète pour un utilisateur qui a fermé
+    l'onglet ou relancé sa requête.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                print("🛑 Client déconnecté - appel OpenAI annulé")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,287 @@
+"""
+Bibliothèques d'extraction PDF interchangeables
+
+Chaque backend (PyPDF2, pypdf, pdfminer.six, pypdfium2) est optionnel :
+seuls ceux qui sont installés sont utilisés. Pour un document donné,
+choose_backends les ordonne d'après ses caractéristiques (nombre de pages,
+outil qui l'a produit) ; extract_pages essaie le premier et passe au
+suivant si le texte est vide ou illisible (voir text_quality).
+
+PDF_BACKENDS (ex: "pypdfium2,pypdf") impose l'ordre et la liste.
+"""
+import io
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+# Outils de mise en page : colonnes, blocs positionnés -> extraction avec analyse de la mise en page
+LAYOUT_PRODUCERS = re.compile(r"canva|indesign|illustrator|figma|photoshop|affinity|sketch|quarkxpress", re.I)
+# Au-delà, on privilégie la vitesse
+LARGE_DOCUMENT_PAGES = 20
+# En dessous, le texte est considéré comme illisible
+MIN_TEXT_QUALITY = 0.6
+
+
+class PDFBackend:
+    """Ouvre un PDF (octets ou chemin) et en extrait le texte page par page"""
+
+    name = ""
+    layout_aware = False
+
+    def open(self, source):
+        raise NotImplementedError
+
+    def page_count(self, document) -> int:
+        raise NotImplementedError
+
+    def page_text(self, document, index: int) -> str:
+        raise NotImplementedError
+
+    def producer(self, document) -> str:
+        return ""
+
+    def close(self, document):
+        pass
+
+
+def _stream(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+try:
+    import PyPDF2
+
+    class PyPDF2Backend(PDFBackend):
+        name = "PyPDF2"
+        version = PyPDF2.__version__
+
+        def open(self, source):
+            return PyPDF2.PdfReader(_stream(source))
+
+        def page_count(self, document) -> int:
+            return len(document.pages)
+
+        def page_text(self, document, index: int) -> str:
+            return document.pages[index].extract_text() or ""
+
+        def producer(self, document) -> str:
+            metadata = document.metadata or {}
+            return str(metadata.get("/Producer", "")) + " " + str(metadata.get("/Creator", ""))
+except ImportError:
+    PyPDF2Backend = None
+
+try:
+    import pypdf
+
+    class PypdfBackend(PDFBackend):
+        name = "pypdf"
+        version = pypdf.__version__
+
+        def open(self, source):
+            return pypdf.PdfReader(_stream(source))
+
+        def page_count(self, document) -> int:
+            return len(document.pages)
+
+        def page_text(self, document, index: int) -> str:
+            return document.pages[index].extract_text() or ""
+
+        def producer(self, document) -> str:
+            metadata = document.metadata or {}
+            return str(metadata.get("/Producer", "")) + " " + str(metadata.get("/Creator", ""))
+except ImportError:
+    PypdfBackend = None
+
+try:
+    import pdfminer
+    from pdfminer.high_level import extract_pages as pdfminer_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    class PdfminerBackend(PDFBackend):
+        """Analyse de la mise en page : colonnes et blocs remis dans l'ordre de lecture"""
+
+        name = "pdfminer"
+        version = pdfminer.__version__
+        layout_aware = True
+
+        def open(self, source):
+            if isinstance(source, (bytes, bytearray)):
+                return io.BytesIO(source)
+            return open(source, "rb")
+
+        def page_count(self, document) -> int:
+            document.seek(0)
+            return sum(1 for _ in PDFPage.get_pages(document))
+
+        def page_text(self, document, index: int) -> str:
+            document.seek(0)
+            for layout in pdfminer_pages(document, page_numbers=[index], laparams=LAParams()):
+                return "".join(
+                    element.get_text() for element in layout if isinstance(element, LTTextContainer)
+                )
+            return ""
+
+        def producer(self, document) -> str:
+            document.seek(0)
+            info = PDFDocument(PDFParser(document)).info
+            fields = info[0] if info else {}
+            return " ".join(
+                value.decode("latin-1", "ignore") if isinstance(value, bytes) else str(value)
+                for key, value in fields.items() if key in ("Producer", "Creator")
+            )
+
+        def close(self, document):
+            document.close()
+except ImportError:
+    PdfminerBackend = None
+
+try:
+    import pypdfium2
+
+    class PdfiumBackend(PDFBackend):
+        """Moteur de Chrome (C++) : le plus rapide, robuste aux PDF mal formés"""
+
+        name = "pypdfium2"
+        version = getattr(pypdfium2, "V_PYPDFIUM2", getattr(pypdfium2, "__version__", "?"))
+
+        def open(self, source):
+            return pypdfium2.PdfDocument(bytes(source) if isinstance(source, bytearray) else source)
+
+        def page_count(self, document) -> int:
+            return len(document)
+
+        def page_text(self, document, index: int) -> str:
+            page = document[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    return textpage.get_text_range()
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+
+        def producer(self, document) -> str:
+            metadata = document.get_metadata_dict()
+            return f"{metadata.get('Producer', '')} {metadata.get('Creator', '')}"
+
+        def close(self, document):
+            document.close()
+except ImportError:
+    PdfiumBackend = None
+
+# Ordre par défaut : du plus rapide au plus lent
+BACKENDS = {
+    backend.name: backend()
+    for backend in (PdfiumBackend, PypdfBackend, PyPDF2Backend, PdfminerBackend)
+    if backend is not None
+}
+_forced = [name.strip() for name in os.getenv("PDF_BACKENDS", "").split(",") if name.strip()]
+if _forced:
+    BACKENDS = {name: BACKENDS[name] for name in _forced if name in BACKENDS}
+
+
+def backends_version() -> str:
+    """Bibliothèques utilisées et leurs versions (pour invalider les caches)"""
+    return "+".join(f"{name}-{backend.version}" for name, backend in BACKENDS.items()) or "none"
+
+
+def choose_backends(pages: int, producer: str) -> List[str]:
+    """Ordre d'essai des backends pour un document"""
+    names = list(BACKENDS)
+    if _forced:
+        return names
+    if LAYOUT_PRODUCERS.search(producer or "") and pages <= LARGE_DOCUMENT_PAGES:
+        # CV graphiques (colonnes) : analyse de la mise en page d'abord
+        names.sort(key=lambda name: not BACKENDS[name].layout_aware)
+    elif pages > LARGE_DOCUMENT_PAGES:
+        # Document long : analyse de la mise en page en dernier recours seulement
+        names.sort(key=lambda name: BACKENDS[name].layout_aware)
+    return names
+
+
+_GOOD_CHAR = re.compile(r"[\w\s.,;:!?'\"()\-–—/@+&%€$#*•·]")
+_CID = re.compile(r"\(cid:\d+\)")
+
+
+def text_quality(text: str) -> float:
+    """
+    Lisibilité du texte (0-1) : part de caractères ordinaires, pénalisée par
+    les glyphes non décodés ("(cid:12)", U+FFFD, zone privée) et les lettres
+    espacées une à une ("J e a n").
+    """
+    sample = text[:5000]
+    stripped = "".join(sample.split())
+    if not stripped:
+        return 0.0
+    sample = _CID.sub("�", sample)
+    good = len(_GOOD_CHAR.findall(sample))
+    quality = good / len(sample)
+    words = sample.split()
+    single = sum(1 for word in words if len(word) == 1 and word.isalpha())
+    if len(words) >= 20 and single / len(words) > 0.5:
+        quality *= 0.5
+    return round(quality, 3)
+
+
+def probe_order(source) -> List[str]:
+    """Ordre d'essai d'après le document, lu avec le premier backend qui l'ouvre"""
+    for name, backend in BACKENDS.items():
+        try:
+            document = backend.open(source)
+        except Exception:
+            continue
+        try:
+            return choose_backends(backend.page_count(document), backend.producer(document))
+        except Exception:
+            continue
+        finally:
+            backend.close(document)
+    return list(BACKENDS)
+
+
+def extract_pages(source, start: int, stop: int, backends: Optional[List[str]] = None) -> dict:
+    """
+    Pages [start, stop) avec le premier backend dont le texte est lisible.
+    Sans liste imposée, l'ordre est choisi d'après le document. Retourne
+    {pages, items: [(index, texte, secondes)], backend, backends, quality}.
+    """
+    order = backends or probe_order(source)
+    best: Optional[Tuple[float, dict]] = None
+    for position, name in enumerate(order):
+        backend = BACKENDS.get(name)
+        if backend is None:
+            continue
+        try:
+            document = backend.open(source)
+        except Exception as e:
+            print(f"⚠️ PDF illisible avec {name}: {e}")
+            continue
+        try:
+            total = backend.page_count(document)
+            items = []
+            for index in range(start, min(stop, total)):
+                page_start = time.perf_counter()
+                text = backend.page_text(document, index)
+                items.append((index, text, time.perf_counter() - page_start))
+        except Exception as e:
+            print(f"⚠️ Extraction avec {name} en échec: {e}")
+            continue
+        finally:
+            backend.close(document)
+
+        quality = text_quality("\n".join(text for _, text, _ in items))
+        result = {"pages": total, "items": items, "backend": name, "backends": order, "quality": quality}
+        if not items or quality >= MIN_TEXT_QUALITY:
+            return result
+        if best is None or quality > best[0]:
+            best = (quality, result)
+        if position + 1 < len(order):
+            print(f"⚠️ Texte vide ou illisible avec {name} (qualité {quality}), essai suivant")
+    if best is None:
+        raise ValueError("Aucune bibliothèque PDF n'a pu lire ce document")
+    return best[1]
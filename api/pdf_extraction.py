@@ -0,0 +1,356 @@
+"""
+Extraction du texte des PDF dans un pool de processus dédié
+
+L'extraction elle-même passe par pdf_backends (PyPDF2, pypdf, pdfminer,
+pypdfium2 selon ce qui est installé). La plupart sont du Python pur : un
+PDF lourd occupe le processeur plusieurs secondes. Exécuté dans le handler, il bloquerait toutes les requêtes du
+worker. L'extraction tourne donc dans des processus séparés
+(PDF_WORKERS, un par cœur au plus), avec une limite de temps CPU par
+document (PDF_CPU_LIMIT) et un nombre maximal de pages (PDF_MAX_PAGES).
+
+PDF_WORKERS=0, ou une plateforme sans multiprocessing (fonctions
+serverless), revient à un thread : la boucle reste libre, mais sans
+limite CPU.
+
+Les documents longs sont découpés en tranches de PDF_PAGES_PER_TASK pages
+extraites en parallèle ; chaque page est chronométrée, et iter_pages rend
+les pages au fil de l'extraction (mode streaming de /extract-pdf). Les
+tranches se partagent le budget CPU du document (voir _CPUBudget) : un PDF
+piégé de 50 pages ne coûte pas plus qu'un PDF piégé d'une page.
+
+Un même CV est envoyé une fois par candidature : le résultat est mémorisé
+(ResultCache, mémoire puis SQLite) par SHA-256 des octets du PDF. Une
+extraction déjà faite ne coûte qu'un hash. La version de l'extracteur
+fait partie de la clé et de l'entrée : une mise à jour invalide le cache.
+"""
+import asyncio
+import collections
+import hashlib
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import tempfile
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pdf_backends import BACKENDS, backends_version, extract_pages
+
+PDF_AVAILABLE = bool(BACKENDS)
+
+# À changer quand le texte extrait change (découpage, nettoyage) ; les bibliothèques y figurent
+EXTRACTOR_VERSION = "2-" + backends_version()
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_CPU_LIMIT = float(os.getenv("PDF_CPU_LIMIT", 10))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 50))
+# Pages par tâche : au-delà, les tranches suivantes partent en parallèle
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 4))
+
+
+class ExtractionTimeout(Exception):
+    """Document abandonné : limite de temps CPU dépassée"""
+
+
+class _CPULimitReached(BaseException):
+    """Levée par le signal ; BaseException pour traverser les except Exception de PyPDF2"""
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CPULimitReached()
+
+
+def _init_worker():
+    # Le worker ignore Ctrl+C (le processus principal gère l'arrêt)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGPROF"):
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+
+
+@contextmanager
+def _cpu_limit(seconds: float):
+    """Minuterie sur le temps CPU du processus (worker du pool uniquement)"""
+    armed = seconds > 0 and hasattr(signal, "setitimer") and signal.getsignal(signal.SIGPROF) is _on_cpu_limit
+    if armed:
+        signal.setitimer(signal.ITIMER_PROF, seconds)
+    try:
+        yield
+    except _CPULimitReached:
+        raise ExtractionTimeout(f"PDF trop long à analyser (limite {seconds:g} s CPU)") from None
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def extract_range(source, start: int, stop: int, cpu_limit: float = PDF_CPU_LIMIT,
+                  backends: Optional[List[str]] = None) -> dict:
+    """
+    Pages [start, stop) d'un PDF (octets ou chemin), exécuté dans un worker.
+    Retourne le nombre total de pages, [(index, texte, secondes)] et le
+    backend retenu (voir pdf_backends.extract_pages), plus le temps CPU
+    consommé (cpu_seconds).
+    """
+    cpu_start = time.thread_time()
+    with _cpu_limit(cpu_limit):
+        result = extract_pages(source, start, stop, backends)
+    result["cpu_seconds"] = time.thread_time() - cpu_start
+    return result
+
+
+class _CPUBudget:
+    """
+    Temps CPU d'un document, partagé entre ses tranches. Les tranches
+    lancées ensemble se répartissent ce qui n'est ni consommé ni réservé, et
+    la minuterie de chacune est réglée sur sa part ; la part non utilisée
+    revient au budget quand la tranche se termine, pour les suivantes. La
+    somme ne dépasse donc jamais la limite, même avec des tranches en
+    parallèle.
+    """
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.available = limit
+        self.used = 0.0
+
+    def reserve(self, starting: int) -> float:
+        """Part d'une des starting tranches lancées maintenant"""
+        share = self.available / max(1, starting)
+        if share <= 0.001:
+            raise ExtractionTimeout(f"PDF trop long à analyser (limite {self.limit:g} s CPU par document)")
+        self.available -= share
+        return share
+
+    def release(self, share: float, used: float):
+        used = min(used, share)
+        self.used += used
+        self.available += share - used
+
+
+class PDFExtractor:
+    """Pool de processus partagé, créé au premier document"""
+
+    def __init__(self, workers: int = PDF_WORKERS, max_pages: int = PDF_MAX_PAGES,
+                 cpu_limit: float = PDF_CPU_LIMIT, pages_per_task: int = PDF_PAGES_PER_TASK,
+                 cache=None):
+        self.workers = workers
+        self.cache = cache  # ResultCache optionnel
+        self.max_pages = max_pages
+        self.cpu_limit = cpu_limit
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_failed = workers <= 0
+        self.in_flight = 0
+        self.tasks_in_flight = 0
+        self.parallel_documents = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.backend_uses = {}  # tranches extraites par backend
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._pool is None and not self._pool_failed:
+            try:
+                # spawn : pas de fork d'un processus qui a déjà une boucle et des threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                print(f"✅ Pool d'extraction PDF: {self.workers} processus")
+            except (OSError, NotImplementedError) as e:
+                print(f"⚠️ Pool de processus indisponible ({e}), extraction dans un thread")
+                self._pool_failed = True
+        return self._pool
+
+    async def _run(self, source, start: int, stop: int, cpu_limit: float,
+                   backends: Optional[List[str]] = None) -> dict:
+        """Une tranche de pages dans le pool (ou un thread), avec au plus cpu_limit secondes CPU"""
+        pool = self._get_pool()
+        self.tasks_in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                pool, extract_range, source, start, stop, cpu_limit, backends
+            )
+            self.backend_uses[result["backend"]] = self.backend_uses.get(result["backend"], 0) + 1
+            return result
+        except BrokenProcessPool:
+            # Worker mort (mémoire, signal) : pool recréé pour les documents suivants
+            print("⚠️ Pool d'extraction PDF cassé, recréation")
+            if self._pool is pool:
+                pool.shutdown(wait=False)
+                self._pool = None
+            raise
+        finally:
+            self.tasks_in_flight -= 1
+
+    def document_key(self, source) -> str:
+        """Clé de cache : SHA-256 du PDF (octets ou chemin, lu par morceaux), version de l'extracteur, plafond de pages"""
+        if isinstance(source, (bytes, bytearray)):
+            digest = hashlib.sha256(source)
+        else:
+            digest = hashlib.sha256()
+            with open(source, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        return f"{digest.hexdigest()}:{EXTRACTOR_VERSION}:{self.max_pages}"
+
+    def lookup(self, key: Optional[str]) -> Optional[dict]:
+        """Extraction mémorisée ({pages, page_texts, page_seconds}) ou None"""
+        if key is None or self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is not None and cached.get("extractor") != EXTRACTOR_VERSION:
+            return None
+        return cached
+
+    async def iter_pages(self, source, key: Optional[str] = None,
+                         details: Optional[dict] = None) -> AsyncIterator[Tuple[int, int, str, float]]:
+        """
+        Pages au fil de l'extraction : (nombre total de pages, index, texte,
+        secondes). La première tranche donne le nombre de pages ; les
+        suivantes sont extraites en parallèle et arrivent dans l'ordre où
+        elles se terminent. La première tranche choisit aussi le backend :
+        les suivantes commencent par celui-ci, noté dans details["backend"].
+        Au plus PDF_WORKERS tranches du document tournent à la fois ; lève
+        ExtractionTimeout quand le document dépasse son budget CPU (les
+        tranches pas encore lancées sont abandonnées).
+        Avec key, le résultat complet est mémorisé (voir lookup).
+        source : octets du PDF, ou chemin d'un fichier que l'appelant garde
+        jusqu'à la fin de l'itération (aucune copie envoyée aux workers).
+        """
+        self.in_flight += 1
+        start = time.perf_counter()
+        tasks = {}
+        shared_path = None
+        texts, timings = {}, {}
+        # Sans pool (thread), pas de minuterie : budget illimité (0)
+        budget = _CPUBudget(self.cpu_limit) if self.cpu_limit > 0 and self._get_pool() is not None else None
+        try:
+            share = budget.reserve(1) if budget else 0
+            first = await self._run(source, 0, min(self.pages_per_task, self.max_pages), share)
+            if budget:
+                budget.release(share, first["cpu_seconds"])
+            total = first["pages"]
+            # Tranches suivantes : backend retenu d'abord, les autres en repli
+            backends = [first["backend"]] + [name for name in first["backends"] if name != first["backend"]]
+            if details is not None:
+                details["backend"] = first["backend"]
+            for item in first["items"]:
+                texts[item[0]], timings[item[0]] = item[1], item[2]
+                yield (total, *item)
+
+            limit = min(total, self.max_pages)
+            if limit > self.pages_per_task:
+                # Un fichier partagé plutôt qu'une copie du PDF par tâche
+                if isinstance(source, (bytes, bytearray)):
+                    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                        f.write(source)
+                        shared_path = f.name
+                self.parallel_documents += 1
+                path = shared_path or source
+                ranges = collections.deque(range(self.pages_per_task, limit, self.pages_per_task))
+                while ranges or tasks:
+                    while ranges and len(tasks) < max(1, self.workers):
+                        starting = min(len(ranges), max(1, self.workers) - len(tasks))
+                        page = ranges.popleft()
+                        share = budget.reserve(starting) if budget else 0
+                        task = asyncio.ensure_future(
+                            self._run(path, page, min(page + self.pages_per_task, limit), share, backends)
+                        )
+                        tasks[task] = share
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        share = tasks.pop(task)
+                        chunk = task.result()
+                        if budget:
+                            budget.release(share, chunk["cpu_seconds"])
+                        for item in chunk["items"]:
+                            texts[item[0]], timings[item[0]] = item[1], item[2]
+                            yield (total, *item)
+            self.completed += 1
+            if key is not None and self.cache is not None:
+                order = sorted(texts)
+                self.cache.set(key, {
+                    "extractor": EXTRACTOR_VERSION,
+                    "backend": first["backend"],
+                    "pages": total,
+                    "page_texts": [texts[index] for index in order],
+                    "page_seconds": [round(timings[index], 4) for index in order],
+                })
+        except ExtractionTimeout:
+            self.timeouts += 1
+            self.failed += 1
+            # Minuterie d'une tranche (sa part du budget) : c'est le document qui dépasse sa limite
+            raise ExtractionTimeout(f"PDF trop long à analyser (limite {self.cpu_limit:g} s CPU par document)") from None
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            if shared_path:
+                try:
+                    os.unlink(shared_path)
+                except OSError:
+                    pass
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - start
+
+    async def extract(self, source, use_cache: bool = True) -> dict:
+        """Texte complet (pages remises dans l'ordre) et temps par page ; source : octets ou chemin (voir iter_pages)"""
+        start = time.perf_counter()
+        key = self.document_key(source) if self.cache is not None else None
+        cached = self.lookup(key) if use_cache else None
+        if cached is not None:
+            page_texts, page_seconds, total = cached["page_texts"], cached["page_seconds"], cached["pages"]
+            backend = cached.get("backend")
+        else:
+            total = 0
+            texts, timings, details = {}, {}, {}
+            async for total, index, text, seconds in self.iter_pages(source, key, details):
+                texts[index] = text
+                timings[index] = seconds
+            backend = details.get("backend")
+            order = sorted(texts)
+            page_texts = [texts[index] for index in order]
+            page_seconds = [round(timings[index], 4) for index in order]
+        return {
+            "text": "\n".join(page_texts),
+            "pages": total,
+            "pages_extracted": len(page_texts),
+            "truncated": total > len(page_texts),
+            "page_seconds": page_seconds,
+            "tasks": 0 if cached is not None else -(-len(page_texts) // self.pages_per_task),
+            "seconds": round(time.perf_counter() - start, 4),
+            "backend": backend,
+            "cached": cached is not None,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        done = self.completed + self.failed
+        return {
+            "workers": self.workers if not self._pool_failed else 0,
+            "mode": "process" if not self._pool_failed else "thread",
+            "in_flight": self.in_flight,
+            "tasks_in_flight": self.tasks_in_flight,
+            "queue_depth": max(0, self.tasks_in_flight - max(1, self.workers)),
+            "parallel_documents": self.parallel_documents,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cpu_timeouts": self.timeouts,
+            "avg_seconds": round(self.total_seconds / done, 3) if done else 0.0,
+            "max_pages": self.max_pages,
+            "pages_per_task": self.pages_per_task,
+            "cpu_limit_seconds": self.cpu_limit,
+            "backends": list(BACKENDS),
+            "backend_uses": dict(self.backend_uses),
+        }
+
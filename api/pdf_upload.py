@@ -0,0 +1,151 @@
+"""
+Réception d'un PDF en flux (multipart/form-data ou corps brut application/pdf)
+
+Le fichier est écrit au fil de l'eau dans un SpooledTemporaryFile (en
+mémoire jusqu'à PDF_SPOOL_BYTES, puis sur disque) : une seule copie du
+document, sans passage par base64 ni JSON. Avec named=True, il est écrit
+directement dans un fichier nommé, que les processus d'extraction ouvrent
+eux-mêmes (le PDF n'est ni relu en mémoire ni copié vers les workers). La taille est plafonnée
+(PDF_MAX_BYTES) : Content-Length trop grand est refusé avant toute lecture,
+et la réception s'arrête dès que le plafond est dépassé.
+"""
+import os
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import IO, Optional, Tuple
+
+from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", 10 * 1024 * 1024))
+PDF_SPOOL_BYTES = int(os.getenv("PDF_SPOOL_BYTES", 1024 * 1024))
+PDF_FIELD_NAME = "file"
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadError(Exception):
+    """Envoi refusé ; status_code est le code HTTP à retourner"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _CappedFile:
+    """Fichier temporaire qui refuse d'aller au-delà du plafond"""
+
+    def __init__(self, max_bytes: int, named: bool = False):
+        self.max_bytes = max_bytes
+        self.size = 0
+        if named:
+            self.file = NamedTemporaryFile(suffix=".pdf", delete=False)
+        else:
+            self.file = SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES)
+
+    def discard(self):
+        self.file.close()
+        if isinstance(self.file, SpooledTemporaryFile):
+            return
+        try:
+            os.unlink(self.file.name)
+        except OSError:
+            pass
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadError(413, f"PDF trop volumineux (maximum {self.max_bytes // (1024 * 1024)} Mo)")
+        self.file.write(data)
+
+
+class _FilePart:
+    """Extraction de la partie "file" d'un corps multipart, au fil des morceaux"""
+
+    def __init__(self, boundary: bytes, target: _CappedFile):
+        self.target = target
+        self.found = False
+        self._in_file = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+    def on_part_begin(self):
+        self._in_file = False
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        # Premier fichier du formulaire (champ "file" ou tout champ avec un nom de fichier)
+        is_file = options.get(b"name") == PDF_FIELD_NAME.encode() or b"filename" in options
+        self._in_file = is_file and not self.found
+        self.found = self.found or self._in_file
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.target.write(memoryview(data)[start:end])
+
+
+def _boundary(content_type: str) -> Optional[bytes]:
+    _, params = parse_options_header(content_type)
+    return params.get(b"boundary")
+
+
+async def receive_pdf(request, max_bytes: int = PDF_MAX_BYTES, named: bool = False) -> Tuple[IO[bytes], int]:
+    """
+    Lire le PDF envoyé (multipart, champ "file", ou corps brut) dans un
+    fichier temporaire repositionné au début. Retourne (fichier, taille).
+    named=True : fichier nommé (file.name), à supprimer par l'appelant.
+    Lève UploadError (413 trop gros, 400 corps invalide, 415 pas un PDF).
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + 64 * 1024:
+        # Marge pour l'enveloppe multipart ; le plafond exact est vérifié à la lecture
+        raise UploadError(413, f"PDF trop volumineux (maximum {max_bytes // (1024 * 1024)} Mo)")
+
+    target = _CappedFile(max_bytes, named)
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            boundary = _boundary(content_type)
+            if not boundary:
+                raise UploadError(400, "Corps multipart sans boundary")
+            part = _FilePart(boundary, target)
+            try:
+                async for chunk in request.stream():
+                    part.parser.write(chunk)
+                part.parser.finalize()
+            except MultipartParseError as e:
+                raise UploadError(400, f"Corps multipart invalide: {e}")
+            if not part.found:
+                raise UploadError(400, f"Champ '{PDF_FIELD_NAME}' manquant dans le formulaire")
+        else:
+            async for chunk in request.stream():
+                target.write(chunk)
+    except Exception:
+        target.discard()
+        raise
+
+    target.file.seek(0)
+    if target.file.read(len(PDF_MAGIC)) != PDF_MAGIC:
+        target.discard()
+        raise UploadError(415, "Le fichier envoyé n'est pas un PDF")
+    target.file.seek(0)
+    return target.file, target.size
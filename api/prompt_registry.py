@@ -0,0 +1,97 @@
+"""
+Registre des prompts versionnés
+
+Les templates sont des fichiers texte dans api/prompts/ chargés une seule
+fois au démarrage :
+- <nom>.system.txt : message système, entièrement statique
+- <nom>.user.txt ou <nom>.<variante>.user.txt : message utilisateur avec
+  des champs {champ} remplis à chaque requête
+
+Le message système statique passe en premier pour que le cache de préfixe
+d'OpenAI s'applique d'une requête à l'autre. La version d'un template est
+dérivée de son contenu : modifier un fichier change la version, ce qui
+invalide les caches et se retrouve dans les statistiques.
+"""
+import hashlib
+import os
+import string
+from typing import Dict, List
+
+from tokens import count_tokens
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+
+class PromptTemplate:
+    """Template de prompt compilé : préfixe statique + message utilisateur"""
+
+    def __init__(self, name: str, system: str, user_template: str):
+        self.name = name
+        self.system = system
+        self.user_template = user_template
+
+        digest = hashlib.sha256(f"{system}\x00{user_template}".encode("utf-8")).hexdigest()
+        self.version = f"{name}-{digest[:10]}"
+
+        parsed = list(string.Formatter().parse(user_template))
+        self.fields = sorted({field for _, field, _, _ in parsed if field})
+        static_user = "".join(literal for literal, _, _, _ in parsed)
+        self.system_tokens = count_tokens(system)
+        self.static_tokens = self.system_tokens + count_tokens(static_user)
+
+    def render_user(self, **fields) -> str:
+        return self.user_template.format(**fields)
+
+    def messages(self, **fields) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.render_user(**fields)},
+        ]
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "fields": self.fields,
+            "system_tokens": self.system_tokens,
+            "static_tokens": self.static_tokens,
+        }
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read().rstrip()
+
+
+def load_templates(directory: str = PROMPTS_DIR) -> Dict[str, PromptTemplate]:
+    """Charger et compiler tous les templates d'un répertoire"""
+    templates = {}
+    files = sorted(os.listdir(directory))
+    for system_file in (f for f in files if f.endswith(".system.txt")):
+        base = system_file[:-len(".system.txt")]
+        system = _read(os.path.join(directory, system_file))
+        for user_file in files:
+            if user_file == f"{base}.user.txt":
+                name = base
+            elif user_file.startswith(f"{base}.") and user_file.endswith(".user.txt"):
+                name = user_file[:-len(".user.txt")]
+            else:
+                continue
+            templates[name] = PromptTemplate(name, system, _read(os.path.join(directory, user_file)))
+    return templates
+
+
+TEMPLATES = load_templates()
+print(f"✅ {len(TEMPLATES)} prompts chargés: " + ", ".join(
+    f"{t.version} ({t.static_tokens} tokens statiques)" for t in TEMPLATES.values()
+))
+
+
+def get_template(name: str) -> PromptTemplate:
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"Prompt inconnu: {name}")
+
+
+def registry_info() -> dict:
+    return {name: template.info() for name, template in TEMPLATES.items()}
@@ -0,0 +1,170 @@
+"""
+Limiteur de débit adaptatif pour l'API OpenAI
+
+Deux seaux à jetons (requêtes/minute et tokens/minute). Une requête qui
+dépasserait la limite attend son tour dans la file au lieu d'être envoyée
+puis rejetée par un 429. Les limites réelles du compte sont apprises des
+en-têtes x-ratelimit-* et un 429 suspend les envois pendant le délai
+indiqué par Retry-After.
+"""
+import asyncio
+import random
+import re
+import time
+from typing import Optional
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Durée OpenAI ("20ms", "1.5s", "6m0s") ou Retry-After ("3") en secondes"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Seau à jetons : capacity jetons, rechargé sur une minute"""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+    def time_until(self, amount: float) -> float:
+        """Secondes avant que amount jetons soient disponibles"""
+        self._refill()
+        # Une demande plus grosse que le seau passe dès qu'il est plein
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float]):
+        """Recaler le seau sur les valeurs annoncées par le serveur"""
+        self._refill()
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """Seaux requêtes/minute et tokens/minute avec file d'attente FIFO"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._turn = asyncio.Lock()
+        self._blocked_until = 0.0
+        self.waiting = 0
+        self.throttled = 0
+        self.retries = 0
+        self.total_wait = 0.0
+
+    async def acquire(self, tokens: int):
+        """Attendre que la requête (tokens estimés) puisse partir, dans l'ordre d'arrivée"""
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            async with self._turn:
+                while True:
+                    delay = max(
+                        self._blocked_until - time.monotonic(),
+                        self.requests.time_until(1),
+                        self.tokens.time_until(tokens),
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+            self.total_wait += time.monotonic() - start
+
+    def reconcile(self, estimated: int, actual: Optional[int]):
+        """Rendre au seau les tokens réservés mais non consommés"""
+        if actual is not None and actual < estimated:
+            self.tokens.give_back(estimated - actual)
+
+    def observe_headers(self, headers: dict):
+        """Appliquer les en-têtes x-ratelimit-* d'une réponse OpenAI"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        self.requests.observe(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"))
+        self.tokens.observe(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+
+    def backoff(self, attempt: int, headers: Optional[dict] = None, throttled: bool = False) -> float:
+        """
+        Délai avant la tentative suivante : backoff exponentiel avec gigue,
+        au moins le Retry-After / x-ratelimit-reset-* annoncé. Après un 429
+        (throttled), toutes les requêtes sont suspendues jusqu'à l'échéance.
+        """
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        server_delay = max(
+            parse_duration(headers.get("retry-after")) or 0.0,
+            parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0
+            if headers.get("x-ratelimit-remaining-requests") == "0" else 0.0,
+            parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0
+            if headers.get("x-ratelimit-remaining-tokens") == "0" else 0.0,
+        )
+        exponential = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = max(server_delay, random.uniform(exponential / 2, exponential))
+        if throttled:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self.retries += 1
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "requests_bucket": round(self.requests.available(), 1),
+            "requests_capacity": self.requests.capacity,
+            "tokens_bucket": round(self.tokens.available()),
+            "tokens_capacity": self.tokens.capacity,
+            "queue_depth": self.waiting,
+            "blocked_for_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            "throttled_429": self.throttled,
+            "retries": self.retries,
+            "total_wait_seconds": round(self.total_wait, 2),
+        }
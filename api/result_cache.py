@@ -0,0 +1,160 @@
+"""
+Cache de résultats adressé par contenu
+
+Deux niveaux :
+- mémoire : LRU borné avec TTL, propre à chaque worker
+- disque (optionnel) : fichier SQLite partagé par tous les workers uvicorn
+  d'une même machine
+
+Les valeurs doivent être sérialisables en JSON.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def cache_key(*parts: str) -> str:
+    """Hash SHA-256 stable d'une liste de chaînes"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = (part or "").encode("utf-8")
+        # Préfixer la longueur évite les collisions ("ab", "c") / ("a", "bc")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Cache LRU + TTL en mémoire, doublé d'un niveau SQLite optionnel"""
+
+    def __init__(self, name: str, max_entries: int = 512, ttl: float = 86400,
+                 db_path: Optional[str] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._sets_since_purge = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_entries ("
+                    "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+                )
+                self._db.commit()
+                print(f"✅ Cache {name}: niveau SQLite actif ({db_path})")
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache {name}: SQLite indisponible ({e}), mémoire seule")
+                self._db = None
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._memory_set(key, value, now + self.ttl)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, value, expires_at)
+        self._disk_set(key, value, expires_at)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.name, key),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Cache {self.name}: erreur suppression SQLite: {e}")
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _memory_set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[Any]:
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.name, key, now),
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"⚠️ Cache {self.name}: erreur lecture SQLite: {e}")
+            return None
+
+    def _disk_set(self, key: str, value: Any, expires_at: float):
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.name, key, json.dumps(value, ensure_ascii=False), expires_at),
+                )
+                self._sets_since_purge += 1
+                if self._sets_since_purge >= 100:
+                    self._db.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+                    self._sets_since_purge = 0
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache {self.name}: erreur écriture SQLite: {e}")
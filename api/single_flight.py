@@ -0,0 +1,58 @@
+"""
+Regroupement des appels identiques en cours (single-flight)
+
+Si un appel avec la même clé est déjà en cours, les demandes suivantes
+attendent son résultat au lieu de relancer l'appel. L'appel partagé n'est
+annulé que lorsque plus aucun demandeur ne l'attend.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Exécute au plus un appel par clé à la fois"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            flight = _Flight(task)
+            self._flights[key] = flight
+            task.add_done_callback(lambda _t, k=key, f=flight: self._forget(k, f))
+        else:
+            self.coalesced += 1
+            print(f"🔗 {self.name}: requête identique en cours, résultat partagé")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,343 @@
+"""
+Taxonomie des compétences compilée en automate Aho-Corasick
+
+api/skills/taxonomy.txt (compétences, synonymes, variantes FR / EN / NL) est
+compilé en un fichier binaire compact : automate sur les mots (transitions
+dans une table de hachage à adressage ouvert, liens d'échec, sorties
+fusionnées), vocabulaire et noms canoniques. Le fichier est projeté en
+mémoire (mmap, lecture seule) : les workers uvicorn partagent les mêmes
+pages. Un seul passage sur le texte trouve toutes les compétences.
+
+Le binaire est recompilé automatiquement si la source a changé (hash de la
+source dans l'en-tête). Sur un système de fichiers en lecture seule,
+l'automate est construit en mémoire. Compilation manuelle :
+    python api/skill_taxonomy.py
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SKILLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skills")
+SKILL_TAXONOMY_SOURCE = os.getenv("SKILL_TAXONOMY_SOURCE", os.path.join(SKILLS_DIR, "taxonomy.txt"))
+SKILL_TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH", os.path.join(SKILLS_DIR, "taxonomy.bin"))
+
+MAGIC = b"CVSK"
+FORMAT_VERSION = 1
+# magic, version, noeuds, cases de hachage, sorties, vocabulaire, compétences,
+# taille du vocabulaire, taille des noms, sha256 de la source
+_HEADER = struct.Struct("<4sIIIIIIII32s")
+_BODY_OFFSET = _HEADER.size + (-_HEADER.size % 8)
+_HASH_MULT = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+# Mots bruts déjà vus -> identifiant dans le vocabulaire (0 : inconnu)
+TOKEN_CACHE_SIZE = 100_000
+
+# Mots du texte en minuscules ; "c++", "c#", ".net", "node.js" restent entiers
+TOKEN_PATTERN = re.compile(r"[a-zà-ÿ0-9.][a-zà-ÿ0-9+#.\-]*")
+ACCENT_FOLD = str.maketrans(
+    "àáâãäåçèéêëìíîïñòóôõöùúûüýÿ",
+    "aaaaaaceeeeiiiinooooouuuuyy",
+)
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token: str) -> str:
+    """Forme de comparaison : sans accents, ponctuation finale ni "s" du pluriel"""
+    token = token.rstrip(".-").translate(ACCENT_FOLD)
+    if len(token) > 3 and token[-1] == "s" and token[-2] != "s" and token.isalpha():
+        token = token[:-1]
+    return token
+
+
+def words(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def parse_taxonomy(text: str) -> List[Tuple[str, str, List[str]]]:
+    """Lignes de la source -> [(nom canonique, catégorie, variantes)]"""
+    skills = []
+    category = "other"
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            category = line[1:-1].strip()
+            continue
+        parts = [part.strip() for part in line.split("|")]
+        name, variants = parts[0], [p for p in parts[1:] if p]
+        if "(" not in name:
+            variants.insert(0, name)
+        skills.append((name, category, variants))
+    return skills
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+def compile_taxonomy(text: str) -> bytes:
+    """Compiler la source en binaire (voir _HEADER pour le format)"""
+    skills = parse_taxonomy(text)
+    vocab: Dict[str, int] = {}
+    children: List[Dict[int, int]] = [{}]
+    outputs: List[set] = [set()]
+
+    for skill_id, (_, _, variants) in enumerate(skills):
+        for variant in variants:
+            tokens = [normalize_token(w) for w in words(variant)]
+            tokens = [t for t in tokens if t]
+            if not tokens:
+                continue
+            node = 0
+            for token in tokens:
+                token_id = vocab.setdefault(token, len(vocab))
+                nxt = children[node].get(token_id)
+                if nxt is None:
+                    nxt = len(children)
+                    children[node][token_id] = nxt
+                    children.append({})
+                    outputs.append(set())
+                node = nxt
+            outputs[node].add((skill_id, len(tokens)))
+
+    # Liens d'échec (parcours en largeur) et sorties héritées du suffixe
+    fail = [0] * len(children)
+    queue = deque(children[0].values())
+    while queue:
+        node = queue.popleft()
+        for token_id, child in children[node].items():
+            state = fail[node]
+            while state and token_id not in children[state]:
+                state = fail[state]
+            target = children[state].get(token_id, 0)
+            fail[child] = target if target != child else 0
+            outputs[child] |= outputs[fail[child]]
+            queue.append(child)
+
+    out_start, out_skill, out_length = [0], [], []
+    for node_outputs in outputs:
+        for skill_id, length in sorted(node_outputs):
+            out_skill.append(skill_id)
+            out_length.append(length)
+        out_start.append(len(out_skill))
+
+    edges = [(node, token_id, child) for node, table in enumerate(children) for token_id, child in table.items()]
+    bits = max(1, (2 * len(edges) - 1).bit_length())
+    slots = 1 << bits
+    keys, values = [0] * slots, [0] * slots
+    for node, token_id, child in edges:
+        key = (node << 32) | (token_id + 1)
+        slot = ((key * _HASH_MULT) & _MASK64) >> (64 - bits)
+        while keys[slot]:
+            slot = (slot + 1) & (slots - 1)
+        keys[slot], values[slot] = key, child
+
+    vocab_blob = "\n".join(sorted(vocab, key=vocab.get)).encode("utf-8")
+    names_blob = "\n".join(f"{name}\t{category}" for name, category, _ in skills).encode("utf-8")
+
+    body = bytearray()
+    for fmt, array in (("I", fail), ("I", out_start), ("I", out_skill), ("I", out_length),
+                       ("Q", keys), ("I", values)):
+        body.extend(struct.pack(f"<{len(array)}{fmt}", *array))
+        _align(body)
+    body.extend(vocab_blob)
+    _align(body)
+    body.extend(names_blob)
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(children), slots, len(out_skill), len(vocab), len(skills),
+        len(vocab_blob), len(names_blob), hashlib.sha256(text.encode("utf-8")).digest(),
+    )
+    return header.ljust(_BODY_OFFSET, b"\0") + bytes(body)
+
+
+def longest_matches(matches: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """
+    Écarter les correspondances incluses dans une plus longue ("Power BI"
+    ne compte pas aussi comme "BI"), dans l'ordre du texte.
+    """
+    kept = []
+    max_end = -1
+    for match in sorted(matches, key=lambda m: (m[1], -m[2])):
+        if match[2] > max_end or (kept and match[1:] == kept[-1][1:]):
+            kept.append(match)
+            max_end = max(max_end, match[2])
+    return kept
+
+
+class SkillTaxonomy:
+    """Automate compilé, lu directement dans le binaire (mmap ou octets)"""
+
+    def __init__(self, buffer, path: Optional[str] = None, mapped: bool = False):
+        (magic, version, nodes, slots, n_outputs, n_vocab, n_skills,
+         vocab_bytes, names_bytes, source_hash) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Format de taxonomie inconnu")
+        self._buffer = buffer
+        self.path = path
+        self.mapped = mapped
+        self.source_hash = source_hash
+        self.size = len(buffer)
+
+        view = memoryview(buffer)
+        offset = _BODY_OFFSET
+
+        def section(fmt: str, count: int):
+            nonlocal offset
+            length = count * struct.calcsize(fmt)
+            array = view[offset:offset + length].cast(fmt)
+            offset += length + (-length % 8)
+            return array
+
+        self._fail = section("I", nodes)
+        self._out_start = section("I", nodes + 1)
+        self._out_skill = section("I", n_outputs)
+        self._out_length = section("I", n_outputs)
+        self._keys = section("Q", slots)
+        self._values = section("I", slots)
+        self._slot_mask = slots - 1
+        self._shift = 64 - (slots.bit_length() - 1)
+
+        vocab = bytes(view[offset:offset + vocab_bytes]).decode("utf-8")
+        offset += vocab_bytes + (-vocab_bytes % 8)
+        self._vocab = {token: i + 1 for i, token in enumerate(vocab.split("\n"))} if n_vocab else {}
+        self._token_ids: Dict[str, int] = {}
+        names = bytes(view[offset:offset + names_bytes]).decode("utf-8")
+        entries = [entry.split("\t") for entry in names.split("\n")] if n_skills else []
+        self.names = [entry[0] for entry in entries]
+        self.categories = [entry[1] for entry in entries]
+        self.nodes = nodes
+
+    def scan(self, tokens: Iterable[str]) -> List[Tuple[int, int, int]]:
+        """Compétences trouvées dans une suite de mots : [(id, début, fin)]"""
+        vocab, token_ids = self._vocab, self._token_ids
+        keys, values, fail = self._keys, self._values, self._fail
+        out_start, out_skill, out_length = self._out_start, self._out_skill, self._out_length
+        mask, shift = self._slot_mask, self._shift
+        matches = []
+        node = 0
+        for position, token in enumerate(tokens):
+            token_id = token_ids.get(token)
+            if token_id is None:
+                token_id = vocab.get(normalize_token(token), 0)
+                if len(token_ids) < TOKEN_CACHE_SIZE:
+                    token_ids[token] = token_id
+            if not token_id:
+                node = 0
+                continue
+            while True:
+                key = (node << 32) | token_id
+                slot = ((key * _HASH_MULT) & _MASK64) >> shift
+                found = keys[slot]
+                while found and found != key:
+                    slot = (slot + 1) & mask
+                    found = keys[slot]
+                if found:
+                    node = values[slot]
+                    break
+                if not node:
+                    break
+                node = fail[node]
+            for i in range(out_start[node], out_start[node + 1]):
+                matches.append((out_skill[i], position - out_length[i] + 1, position + 1))
+        return matches
+
+    def skill_ids(self, text: str) -> set:
+        return {skill_id for skill_id, _, _ in longest_matches(self.scan(words(text)))}
+
+    def skills_in(self, text: str) -> List[str]:
+        """Noms canoniques des compétences du texte, dans l'ordre d'apparition"""
+        seen = []
+        for skill_id, _, _ in longest_matches(self.scan(words(text))):
+            name = self.names[skill_id]
+            if name not in seen:
+                seen.append(name)
+        return seen
+
+    def info(self) -> dict:
+        return {
+            "skills": len(self.names),
+            "vocabulary": len(self._vocab),
+            "nodes": self.nodes,
+            "bytes": self.size,
+            "memory_mapped": self.mapped,
+            "source_hash": self.source_hash.hex()[:10],
+        }
+
+
+def _read_source() -> Optional[str]:
+    try:
+        with open(SKILL_TAXONOMY_SOURCE, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    try:
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def build(source: str, path: str = SKILL_TAXONOMY_PATH) -> bytes:
+    """Compiler la source et écrire le binaire (remplacement atomique)"""
+    data = compile_taxonomy(source)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data
+
+
+def load_taxonomy() -> SkillTaxonomy:
+    """Projeter le binaire en mémoire, en le recompilant si la source a changé"""
+    source = _read_source()
+    source_hash = hashlib.sha256(source.encode("utf-8")).digest() if source is not None else None
+
+    mapped = _map(SKILL_TAXONOMY_PATH)
+    if mapped is not None:
+        # En-tête vérifié avant de créer les vues : un binaire périmé reste refermable
+        try:
+            magic, version, *_, file_hash = _HEADER.unpack_from(mapped, 0)
+        except struct.error:
+            magic = version = file_hash = None
+        if magic == MAGIC and version == FORMAT_VERSION and source_hash in (None, file_hash):
+            return SkillTaxonomy(mapped, SKILL_TAXONOMY_PATH, mapped=True)
+        mapped.close()
+
+    if source is None:
+        print(f"⚠️ Taxonomie des compétences introuvable ({SKILL_TAXONOMY_SOURCE})")
+        return SkillTaxonomy(compile_taxonomy(""))
+
+    try:
+        build(source)
+        mapped = _map(SKILL_TAXONOMY_PATH)
+        if mapped is not None:
+            print(f"✅ Taxonomie des compétences compilée: {SKILL_TAXONOMY_PATH}")
+            return SkillTaxonomy(mapped, SKILL_TAXONOMY_PATH, mapped=True)
+    except OSError as e:
+        print(f"⚠️ Taxonomie non écrite ({e}), automate gardé en mémoire")
+    return SkillTaxonomy(compile_taxonomy(source))
+
+
+TAXONOMY = load_taxonomy()
+
+
+def taxonomy_info() -> dict:
+    return TAXONOMY.info()
+
+
+if __name__ == "__main__":
+    source = _read_source()
+    if source is None:
+        raise SystemExit(f"Source introuvable: {SKILL_TAXONOMY_SOURCE}")
+    data = build(source)
+    print(f"✅ {SKILL_TAXONOMY_PATH}: {len(parse_taxonomy(source))} compétences, {len(data)} octets")
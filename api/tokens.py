@@ -0,0 +1,42 @@
+"""
+Comptage local des tokens
+
+Utilise tiktoken (encodage de gpt-4o-mini) s'il est installé, sinon une
+estimation à ~4 caractères par token.
+"""
+import math
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+_encoding = None
+# Échec de chargement mémorisé : estimation sans nouvel essai (ni nouveau message) à chaque appel
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+                print(f"⚠️ Encodage o200k_base indisponible ({e}), cl100k_base utilisé")
+            except Exception as e:
+                _encoding_failed = True
+                print(f"⚠️ tiktoken indisponible ({e}), estimation utilisée")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens de text pour le modèle"""
+    if not text:
+        return 0
+    encoding = _get_encoding() if TIKTOKEN_AVAILABLE else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
@@ -0,0 +1,78 @@
+"""
+Profils utilisateurs (e-mail, nom, crédits) mis en cache par uid
+
+Le frontend interroge le profil en continu : chaque lecture coûtait un
+aller-retour Firestore sur le document complet. Le profil est gardé en
+mémoire USER_CACHE_TTL secondes et seuls les champs utiles sont lus.
+Toute écriture de crédits met le cache à jour (write-through) : le solde
+lu juste après un paiement ou une consommation est le bon, sans relire
+Firestore.
+
+Le cache est propre à chaque worker : un autre worker peut voir l'ancien
+solde pendant au plus USER_CACHE_TTL secondes. Les opérations qui
+modifient les crédits ne s'y fient pas : elles passent par les
+transactions de credit_ledger.py, qui lisent le solde dans Firestore.
+"""
+import os
+from typing import Optional
+
+from result_cache import ResultCache
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+PROFILE_FIELDS = ["email", "name", "credits"]
+
+user_profile_cache = ResultCache(
+    "user_profiles",
+    max_entries=int(os.getenv("USER_CACHE_SIZE", 10000)),
+    ttl=USER_CACHE_TTL,
+)
+
+
+def profile_from(data: dict) -> dict:
+    return {
+        "email": data.get("email"),
+        "name": data.get("name"),
+        "credits": data.get("credits", 0),
+    }
+
+
+def load_profile(db, uid: str, fresh: bool = False, ledger=None) -> Optional[dict]:
+    """
+    Profil de l'utilisateur (cache, sinon Firestore), None s'il n'existe pas.
+    Pour un compte dont le solde est réparti sur plusieurs compteurs, le
+    solde est additionné par le ledger (CreditLedger).
+    """
+    if not fresh:
+        cached = user_profile_cache.get(uid)
+        if cached is not None:
+            return cached
+    user_doc = db.collection('users').document(uid).get(field_paths=PROFILE_FIELDS)
+    if not user_doc.exists:
+        user_profile_cache.delete(uid)
+        return None
+    profile = profile_from(user_doc.to_dict())
+    if ledger is not None and ledger.sharded(uid):
+        profile["credits"] = ledger.balance(uid)
+    user_profile_cache.set(uid, profile)
+    return profile
+
+
+def cached_profile(uid: str) -> Optional[dict]:
+    """Profil en cache seulement (sans I/O), None s'il n'y est pas"""
+    return user_profile_cache.get(uid)
+
+
+def store_profile(uid: str, profile: dict):
+    """Après création ou réécriture du document utilisateur"""
+    user_profile_cache.set(uid, profile_from(profile))
+
+
+def store_credits(uid: str, credits: int):
+    """Après écriture du solde dans Firestore"""
+    cached = user_profile_cache.get(uid)
+    if cached is not None:
+        user_profile_cache.set(uid, {**cached, "credits": credits})
+
+
+def user_cache_stats() -> dict:
+    return user_profile_cache.stats()
@@ -0,0 +1,168 @@
+"""
+File d'écriture différée (write-behind) vers Firestore
+
+save_generated_cv attendait db.collection('generated_cvs').add() avant de
+répondre : un aller-retour Firestore sur chaque génération. Les documents
+sont maintenant mis en file et une tâche asyncio les écrit par lots
+(WRITE_BEHIND_BATCH_SIZE documents, ou au plus tard après
+WRITE_BEHIND_FLUSH_INTERVAL secondes), dans un thread pour ne pas bloquer
+la boucle.
+
+Un lot en échec est réessayé (WRITE_BEHIND_MAX_ATTEMPTS fois, délai
+croissant) ; l'identifiant de chaque document est choisi à la mise en
+file, donc un lot réécrit après un échec ne crée pas de doublon. À l'arrêt,
+la file est vidée. File pleine ou non démarrée : l'élément est écrit
+seul, dans un thread, et l'appelant attend cette écriture (pas de perte,
+la boucle n'est pas bloquée).
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, List, Optional
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 50))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 1))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 5000))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+RETRY_BASE_DELAY = 0.5
+
+_STOP = object()
+
+Writer = Callable[[List[Any]], None]
+
+
+class WriteBehindQueue:
+    """Écritures regroupées par lots et faites en arrière-plan"""
+
+    def __init__(self, name: str, writer: Writer, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL, max_pending: int = WRITE_BEHIND_MAX_PENDING,
+                 max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS):
+        self.name = name
+        self.writer = writer  # écrit une liste d'éléments en un seul commit (synchrone)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # En file, dans le lot en cours de constitution ou en cours d'écriture
+        self._pending = 0
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.direct_writes = 0
+        self.max_depth = 0
+        self._commit_seconds = 0.0
+        self._delay_seconds = 0.0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, item: Any):
+        """Mettre un élément en file (sans attendre) ; file pleine ou arrêtée : écriture directe, dans un thread"""
+        self.submitted += 1
+        if not self.running or self._queue.qsize() >= self.max_pending:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.writer, [item])
+            except Exception:
+                self.failed += 1
+                raise
+            self.direct_writes += 1
+            self.written += 1
+            return
+        self._queue.put_nowait((item, time.monotonic()))
+        self._pending += 1
+        self.max_depth = max(self.max_depth, self._pending)
+
+    async def _next_batch(self) -> tuple:
+        """Attendre un premier élément, puis compléter le lot jusqu'à sa taille ou la fin de la fenêtre"""
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        items = [item for item, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                start = time.monotonic()
+                try:
+                    await loop.run_in_executor(None, self.writer, items)
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self.failed += len(items)
+                        print(f"❌ {self.name}: {len(items)} écritures perdues après {attempt} essais ({e})")
+                        return
+                    self.retries += 1
+                    delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                    print(f"⚠️ {self.name}: écriture de {len(items)} éléments en échec ({e}), nouvel essai dans {delay:.1f} s")
+                    await asyncio.sleep(delay)
+                    continue
+                now = time.monotonic()
+                self.last_flush_ms = (now - start) * 1000
+                self._commit_seconds += now - start
+                self._delay_seconds += sum(now - queued_at for _, queued_at in batch)
+                self.written += len(items)
+                self.batches += 1
+                return
+        finally:
+            self._pending -= len(items)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        print(f"✅ {self.name}: écritures différées par lots de {self.batch_size} (fenêtre {self.flush_interval} s)")
+
+    async def stop(self):
+        """Refuser les nouveaux éléments et écrire ceux en attente"""
+        if not self.running:
+            return
+        # running devient faux avant le marqueur : rien n'est mis en file derrière lui
+        task, self._task = self._task, None
+        self._queue.put_nowait(_STOP)
+        await task
+        print(f"🛑 {self.name}: file vidée ({self.written} écrits, {self.failed} perdus)")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._pending,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": round((self.written - self.direct_writes) / self.batches, 1) if self.batches else 0.0,
+            "retries": self.retries,
+            "failed": self.failed,
+            "direct_writes": self.direct_writes,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+            "avg_flush_ms": round(self._commit_seconds / self.batches * 1000, 1) if self.batches else 0.0,
+            "avg_write_delay_ms": round(self._delay_seconds / (self.written - self.direct_writes) * 1000, 1)
+            if self.written > self.direct_writes else 0.0,
+        }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark : score ATS local (api/ats_scoring.py)
+
+Mesure le temps d'un score CV / offre une fois le profil de l'offre en
+cache (cas courant : même offre, CV successifs), et le premier score d'une
+offre (analyse + compilation du profil).
+
+Usage : python benchmarks/bench_ats_scoring.py [iterations]
+"""
+import os
+import sys
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from ats_scoring import score_cv  # noqa: E402
+
+JOB_FR = """Développeur Full Stack Python / React (H/F)
+
+Au sein de notre équipe produit, vous concevez et développez de nouvelles
+fonctionnalités pour notre plateforme SaaS.
+
+Missions :
+- Développement d'API REST en Python (FastAPI, Django)
+- Conception d'interfaces en React et TypeScript
+- Mise en place de tests automatisés et de pipelines CI/CD
+- Participation aux revues de code et à l'amélioration continue
+
+Profil recherché :
+- 3 ans d'expérience minimum en développement web
+- Maîtrise de Python, SQL et PostgreSQL
+- Connaissance de Docker, Kubernetes et AWS
+- Bonne communication et esprit d'équipe
+- Anglais professionnel
+
+Ce que nous offrons :
+- Télétravail partiel, tickets restaurant, mutuelle
+"""
+
+CV_FR = """Jean Dupont
+jean.dupont@example.com - Paris
+
+PROFIL
+Développeur web passionné, 5 ans d'expérience en Python et JavaScript.
+
+EXPÉRIENCE PROFESSIONNELLE
+Développeur Backend - Acme (2021 - aujourd'hui)
+- Développement d'API REST avec FastAPI et PostgreSQL
+- Migration de l'infrastructure vers Docker et AWS
+- Mise en place de pipelines CI/CD GitLab
+Développeur Full Stack - Startup (2019 - 2021)
+- Interfaces React, tests automatisés, revues de code
+
+FORMATION
+Master Informatique - Université de Lyon
+
+COMPÉTENCES
+Python, Django, FastAPI, SQL, React, Git, Linux, travail en équipe
+Langues : français, anglais
+""" * 3
+
+
+def bench(label: str, fn, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"{label:<40} {elapsed * 1000:8.3f} ms")
+
+
+def main():
+    start = time.perf_counter()
+    report = score_cv(CV_FR, JOB_FR)
+    print(f"{'premier score (analyse de l offre)':<40} {(time.perf_counter() - start) * 1000:8.3f} ms")
+    print(f"  score={report['score']} couverture={report['coverage']}")
+    print(f"  trouvés : {', '.join(report['matched'])}")
+    print(f"  manquants : {', '.join(report['missing'])}")
+
+    bench("score CV / offre (profil en cache)", lambda: score_cv(CV_FR, JOB_FR), ITERATIONS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark : stockage des CV générés, textes en clair ou blobs dédupliqués (api/content_blobs.py)
+
+Historique simulé : quelques utilisateurs, chacun avec un CV, qui postulent
+à des offres tirées d'un même ensemble. Un faux Firestore compte les octets
+écrits et relus :
+
+- textes en clair (ancien format) : chaque document recopie le CV d'origine,
+  le CV optimisé et l'offre ;
+- blobs : chaque texte est écrit une fois, compressé, et les documents ne
+  gardent que des références.
+
+Usage : python benchmarks/bench_content_blobs.py [utilisateurs] [générations_par_utilisateur]
+"""
+import os
+import random
+import sys
+import time
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+GENERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import content_blobs  # noqa: E402
+from content_blobs import add_to_batch, mark_stored, resolve_generated_cvs  # noqa: E402
+
+PARAGRAPHS = [
+    "Pilotage de projets de transformation digitale, coordination d'équipes pluridisciplinaires et suivi budgétaire.",
+    "Développement d'applications web en Python (FastAPI, Django) et TypeScript, déploiement sur AWS et GCP.",
+    "Analyse de données avec SQL, pandas et Power BI ; mise en place de tableaux de bord pour la direction.",
+    "Gestion de la relation client, négociation commerciale et fidélisation d'un portefeuille de comptes clés.",
+    "Rédaction de spécifications fonctionnelles, animation d'ateliers et accompagnement au changement.",
+    "Maîtrise des méthodes agiles (Scrum, Kanban), animation des cérémonies et amélioration continue.",
+]
+
+
+def document_size(data: dict) -> int:
+    return sum(len(value.encode("utf-8")) if isinstance(value, str) else len(value) if isinstance(value, bytes) else 8
+               for value in data.values())
+
+
+class Snapshot:
+    def __init__(self, doc_id, data):
+        self.id, self._data, self.exists = doc_id, data, data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.collections = {}
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.writes = 0
+        self.reads = 0
+        self._name = None
+
+    def collection(self, name):
+        self._name = name
+        return self
+
+    def document(self, doc_id):
+        return (self._name, doc_id)
+
+    def batch(self):
+        return self
+
+    def set(self, ref, data):
+        name, doc_id = ref
+        self.collections.setdefault(name, {})[doc_id] = data
+        self.bytes_written += document_size(data)
+        self.writes += 1
+
+    def commit(self):
+        pass
+
+    def get_all(self, refs):
+        for name, doc_id in refs:
+            data = self.collections.get(name, {}).get(doc_id)
+            self.reads += 1
+            self.bytes_read += document_size(data) if data else 0
+            yield Snapshot(doc_id, data)
+
+    def history(self, user_id):
+        documents = [dict(data) for data in self.collections["generated_cvs"].values() if data["user_id"] == user_id]
+        self.reads += len(documents)
+        self.bytes_read += sum(document_size(data) for data in documents)
+        return documents
+
+    def stored_bytes(self):
+        return sum(document_size(data) for docs in self.collections.values() for data in docs.values())
+
+
+def generations():
+    rng = random.Random(42)
+    jobs = [" ".join(rng.sample(PARAGRAPHS, 4)) + f" Offre {i}." for i in range(40)]
+    for user in range(USERS):
+        cv = "\n".join(rng.sample(PARAGRAPHS * 3, 12)) + f"\nCandidat {user}"
+        for _ in range(GENERATIONS):
+            job = rng.choice(jobs)
+            # Le CV optimisé varie d'une génération à l'autre ; un CV en cache revient à l'identique
+            optimized = cv + "\n" + job[:200] + ("" if rng.random() < 0.3 else f" v{rng.random():.6f}")
+            yield {"user_id": f"user-{user}", "original_content": cv, "optimized_content": optimized,
+                   "job_description": job, "ats_score": 80}
+
+
+def run(label, store_blobs: bool):
+    db = FakeFirestore()
+    start = time.perf_counter()
+    for i, cv_data in enumerate(generations()):
+        if store_blobs:
+            blobs = set()
+            db.set(("generated_cvs", f"cv-{i}"), add_to_batch(db, db, cv_data, blobs))
+            mark_stored(blobs)
+        else:
+            db.set(("generated_cvs", f"cv-{i}"), cv_data)
+    write_time = time.perf_counter() - start
+    written, writes = db.bytes_written, db.writes
+
+    # Historique de chaque utilisateur, offres seulement (vue liste)
+    db.bytes_read = db.reads = 0
+    for user in range(USERS):
+        documents = db.history(f"user-{user}")
+        if store_blobs:
+            resolve_generated_cvs(db, documents, ["job_description"])
+    print(f"{label:<22} stocké {db.stored_bytes() / 1024:9.1f} Ko | écrit {written / 1024:9.1f} Ko en {writes:5d} écritures "
+          f"({write_time * 1000:.0f} ms) | historiques lus {db.bytes_read / 1024:8.1f} Ko en {db.reads} lectures")
+
+
+def main():
+    print(f"{USERS} utilisateurs x {GENERATIONS} générations, compression {'zstd' if content_blobs.ZSTD_AVAILABLE else 'zlib'}\n")
+    run("textes en clair", store_blobs=False)
+    run("blobs dédupliqués", store_blobs=True)
+    stats = content_blobs.content_blob_stats()
+    print(f"\ncompression {stats['compression_ratio']}x, compression + déduplication {stats['storage_ratio']}x "
+          f"({stats['blobs_written']} blobs écrits, {stats['blobs_skipped']} déjà connus)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark : mouvements de crédits concurrents (api/credit_ledger.py)
+
+Sur MemoryCreditStore (verrou par document, latence simulée d'un
+aller-retour Firestore), des threads débitent le même compte en parallèle :
+
+- lecture puis réécriture du solde (ancien code) : mises à jour perdues ;
+- CreditLedger : débits en transaction, solde final exact ;
+- CreditLedger sur un compte réparti (CREDIT_SHARDS compteurs) : les
+  transactions ne se bloquent plus sur un seul document.
+
+Enfin, le même paiement Stripe confirmé en parallèle n'est crédité qu'une fois.
+
+Usage : python benchmarks/bench_credit_ledger.py [opérations] [threads] [latence_ms]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+OPERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+LATENCY = (float(sys.argv[3]) if len(sys.argv) > 3 else 5) / 1000
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from credit_ledger import CreditLedger, MemoryCreditStore  # noqa: E402
+
+INITIAL = OPERATIONS * 2
+
+
+def run(label, operation):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(lambda _: operation(), range(OPERATIONS)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:7.2f} s  {OPERATIONS / elapsed:8.0f} op/s", end="")
+    return elapsed
+
+
+def naive():
+    store = MemoryCreditStore({"user": INITIAL}, latency=LATENCY)
+
+    def consume():
+        # Lecture, puis écriture dans un second aller-retour
+        credits = store.balance("user", [0])
+        time.sleep(LATENCY)
+        store.counters[("user", 0)] = credits - 1
+
+    run("lecture puis réécriture", consume)
+    final = store.balance("user", [0])
+    print(f"  solde {final} (attendu {INITIAL - OPERATIONS}, {final - (INITIAL - OPERATIONS)} débits perdus)")
+
+
+def ledger(hot: bool):
+    store = MemoryCreditStore({"user": INITIAL}, latency=LATENCY)
+    ledger = CreditLedger(store, hot_accounts=["user"] if hot else [], batch_size=100)
+    ledger.start()
+    label = f"CreditLedger ({ledger.shards} compteurs)" if hot else "CreditLedger (transaction)"
+    if hot:
+        # Solde réparti sur les compteurs, comme après des crédits successifs
+        for shard in range(ledger.shards):
+            store.counters[("user", shard)] = INITIAL // ledger.shards
+    run(label, lambda: ledger.debit("user", 1, "consume"))
+    ledger.stop()
+    final = ledger.balance("user")
+    stats = ledger.stats()
+    status = "✅" if final == INITIAL - OPERATIONS else "❌"
+    print(f"  solde {final} {status} | livre: {stats['entries_written']} entrées en {stats['batches_written']} lots")
+
+
+def idempotent_payment():
+    store = MemoryCreditStore({"user": 0}, latency=LATENCY)
+    ledger = CreditLedger(store)
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(
+            lambda _: ledger.credit("user", 100, "stripe", idempotency_key="stripe:cs_test"), range(THREADS)
+        ))
+    applied = sum(1 for _, done in results if done)
+    status = "✅" if applied == 1 and ledger.balance("user") == 100 else "❌"
+    print(f"\npaiement confirmé {THREADS} fois en parallèle: {applied} crédit appliqué, solde {ledger.balance('user')} {status}")
+
+
+def main():
+    print(f"{OPERATIONS} débits de 1 crédit, {THREADS} threads, latence {LATENCY * 1000:.0f} ms\n")
+    naive()
+    ledger(hot=False)
+    ledger(hot=True)
+    idempotent_payment()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark : découpage local des CV (api/cv_sectioner.py)
+
+Découpe des CV d'exemple (français, anglais, néerlandais, et test-cv.pdf
+si PyPDF2 est installé), affiche les rubriques trouvées et la confiance
+par champ, puis la latence moyenne d'un découpage. À comparer avec un
+appel gpt-4o-mini de /parse-cv (plusieurs secondes).
+
+Usage : python benchmarks/bench_cv_sectioner.py [iterations] [cv.txt ...]
+"""
+import os
+import sys
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from cv_sectioner import CVSectioner, is_confident  # noqa: E402
+
+SAMPLES = {
+    "french": """Marie Dupont
+Chargée de marketing digital
+75011 Paris | 06 12 34 56 78 | marie.dupont@gmail.com | linkedin.com/in/mariedupont
+PROFIL
+Spécialiste du marketing digital avec 5 ans d'expérience en acquisition
+et en gestion de campagnes.
+EXPÉRIENCES PROFESSIONNELLES
+Chargée de marketing digital
+L'Oréal, Paris
+Janvier 2021 - Présent
+• Pilotage des campagnes SEA (budget 200 k€)
+• Mise en place de tableaux de bord Power BI pour le suivi
+des conversions
+Assistante marketing chez Decathlon - sept. 2018 – déc. 2020
+- Gestion des réseaux sociaux
+- Organisation d'événements
+FORMATION
+Master Marketing Digital
+Université Paris-Dauphine
+2016 - 2018
+Licence Économie - Université Lyon 2 - 2016
+Compétences : Google Ads, SEO, Power BI, Excel, HubSpot, Travail en équipe
+Certifications
+Google Analytics Individual Qualification (2022)
+Langues
+Français (natif), Anglais (C1), Espagnol (B1)
+Centres d'intérêt
+Course à pied, photographie""",
+    "english": """JAMES SMITH
+Data Analyst
+London | +44 7700 900123 | james.smith@outlook.com | github.com/jsmith
+Professional Summary
+Data analyst with four years of experience turning raw data into decisions.
+Work Experience
+Data Analyst at Monzo, London
+March 2021 - Present
+- Built SQL pipelines and Tableau dashboards for the credit team
+- Reduced reporting time by 40% with Python automation
+Junior Analyst | Deloitte | Sep 2019 - Feb 2021
+- Financial reporting and Excel models
+Education
+BSc Mathematics, University of Manchester, 2016 - 2019
+Skills
+Python, SQL, Tableau, Excel, Power BI, Statistics
+Languages
+English (native), French (B2)""",
+    "dutch": """Sanne de Vries
+Projectmanager
+sanne.devries@gmail.com
++31 6 12345678
+Profiel
+Ervaren projectmanager met oog voor detail en een passie voor logistiek.
+Werkervaring
+Projectmanager bij PostNL
+sinds 2020
+• Leiding over implementatie van een nieuw WMS
+Logistiek medewerker bij Bol.com 2017 - 2020
+• Planning en voorraadbeheer
+Opleiding
+Hogeschool Rotterdam - Bachelor Logistiek - 2013 - 2017
+Vaardigheden
+SAP, Excel, Prince2, Scrum
+Talen
+Nederlands, Engels, Duits""",
+}
+
+
+def load_corpus():
+    corpus = dict(SAMPLES)
+    for path in sys.argv[2:]:
+        with open(path, encoding="utf-8") as f:
+            corpus[os.path.basename(path)] = f.read()
+    try:
+        import PyPDF2
+        reader = PyPDF2.PdfReader(os.path.join(ROOT, "test-cv.pdf"))
+        corpus["test-cv.pdf"] = "\n".join(page.extract_text() or "" for page in reader.pages)
+    except (ImportError, OSError) as e:
+        print(f"test-cv.pdf ignoré: {e}")
+    return corpus
+
+
+def main():
+    sectioner = CVSectioner()
+    corpus = load_corpus()
+    for label, text in corpus.items():
+        parsed = sectioner.section(text)
+        confidence = parsed["confidence"]
+        status = "✅ local" if is_confident(parsed) else "🤖 IA"
+        print(f"\n{label}: {status} (confiance {confidence['overall']}, plus basse {confidence['gate']}) "
+              f"- rubriques: {', '.join(parsed['sections'])}")
+        print(f"  nom: {parsed['name']!r} ({confidence['name']}) | titre: {parsed['title']!r}")
+        print(f"  contact: {parsed['contact']!r}")
+        for entry in parsed["experience"]:
+            print(f"  expérience: {entry['position']!r} / {entry['company']!r} / {entry['period']!r} ({len(entry['description'])} puces)")
+        for entry in parsed["education"]:
+            print(f"  formation: {entry['degree']!r} / {entry['institution']!r} / {entry['period']!r}")
+        print(f"  compétences: {parsed['technicalSkills']!r} | soft: {parsed['softSkills']!r}")
+        print(f"  infos: {parsed['additionalInfo']!r}")
+
+    print()
+    for label, text in corpus.items():
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            sectioner.section(text)
+        elapsed = (time.perf_counter() - start) / ITERATIONS
+        print(f"{'découpage ' + label:<40} {elapsed * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
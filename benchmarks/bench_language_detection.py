@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark : détection de langue (api/language_detection.py)
+
+Mesure le chargement des profils, puis la latence d'une détection sur des
+offres courtes et longues. Compare avec langdetect (test_langdetect.py)
+s'il est installé.
+
+Usage : python benchmarks/bench_language_detection.py [iterations]
+"""
+import os
+import sys
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from language_detection import LanguageDetector  # noqa: E402
+
+SAMPLES = {
+    "english": "We are looking for a Senior Software Developer with 5+ years of experience in React and Node.js. The ideal candidate should have strong communication skills and be able to work in a team environment.",
+    "french": "Nous recherchons un Développeur Senior avec 5+ ans d'expérience en React et Node.js. Le candidat idéal doit avoir de solides compétences en communication et savoir travailler en équipe.",
+    "dutch": "Wij zoeken een Senior Software Developer met 5+ jaar ervaring in React en Node.js. De ideale kandidaat moet sterke communicatieve vaardigheden hebben en kunnen werken in een teamomgeving.",
+}
+# Offre longue : seul le début est analysé
+LONG_OFFER = SAMPLES["french"] * 20
+
+
+def bench(label: str, fn, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"{label:<40} {elapsed * 1000:8.3f} ms")
+
+
+def main():
+    detector = LanguageDetector()
+    start = time.perf_counter()
+    detector.profiles
+    print(f"{'chargement des profils':<40} {(time.perf_counter() - start) * 1000:8.3f} ms")
+
+    for expected, text in SAMPLES.items():
+        language, confidence = detector.detect(text)
+        status = "✅" if language == expected else "❌"
+        print(f"  {status} {expected}: {language} (fiabilité {confidence})")
+
+    bench("détection (offre courte)", lambda: detector.detect(SAMPLES["english"]), ITERATIONS)
+    bench("détection (offre longue)", lambda: detector.detect(LONG_OFFER), ITERATIONS)
+
+    try:
+        from langdetect import DetectorFactory, detect
+    except ImportError:
+        print("langdetect non installé : comparaison ignorée")
+        return
+    DetectorFactory.seed = 0
+    start = time.perf_counter()
+    detect(SAMPLES["english"])
+    print(f"{'langdetect : premier appel':<40} {(time.perf_counter() - start) * 1000:8.3f} ms")
+    bench("langdetect (offre courte)", lambda: detect(SAMPLES["english"]), max(1, ITERATIONS // 10))
+
+
+if __name__ == "__main__":
+    main()
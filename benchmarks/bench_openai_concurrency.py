@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark : générations OpenAI concurrentes sur un seul worker
+
+Compare l'ancien appel bloquant (requests.post dans un handler async) et le
+client httpx partagé (api/openai_client.py) contre un faux serveur OpenAI
+local qui répond après une latence fixe. Pour chaque niveau de concurrence,
+on mesure le débit de générations et la latence d'un health check lancé
+pendant la charge (= blocage de la boucle d'événements).
+
+Usage : python benchmarks/bench_openai_concurrency.py [latence_s]
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import requests
+import uvicorn
+from fastapi import FastAPI
+
+PORT = 8765
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+CONCURRENCY_LEVELS = [1, 5, 20, 50]
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["OPENAI_API_URL"] = f"http://127.0.0.1:{PORT}/v1/chat/completions"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+import openai_client  # noqa: E402
+
+fake_openai = FastAPI()
+
+
+@fake_openai.post("/v1/chat/completions")
+async def fake_completion():
+    await asyncio.sleep(LATENCY)
+    return {"choices": [{"message": {"content": "CV optimisé"}}]}
+
+
+def start_fake_server():
+    config = uvicorn.Config(fake_openai, host="127.0.0.1", port=PORT, log_level="error")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+PAYLOAD = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Test"}]}
+
+
+async def blocking_call():
+    """Ancien comportement : requests.post appelé directement dans la coroutine"""
+    response = requests.post(
+        os.environ["OPENAI_API_URL"],
+        headers={'Authorization': f'Bearer {os.environ["OPENAI_API_KEY"]}'},
+        json=PAYLOAD,
+    )
+    return response.json()
+
+
+async def pooled_call():
+    return await openai_client.chat_completion(PAYLOAD)
+
+
+async def health_probe(stop: asyncio.Event, samples: list):
+    """Mesurer le retard de la boucle pendant la charge (≈ latence /health)"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - start - 0.01)
+
+
+async def run(call, concurrency: int):
+    stop = asyncio.Event()
+    samples = []
+    probe = asyncio.create_task(health_probe(stop, samples))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return elapsed, max(samples) if samples else 0.0
+
+
+async def main():
+    start_fake_server()
+    print(f"🧪 Latence simulée OpenAI : {LATENCY:.2f}s\n")
+    print(f"{'mode':<10}{'concurrence':>12}{'durée (s)':>12}{'gén/s':>10}{'blocage max (ms)':>18}")
+    for name, call in (("bloquant", blocking_call), ("pool", pooled_call)):
+        for concurrency in CONCURRENCY_LEVELS:
+            elapsed, stall = await run(call, concurrency)
+            print(f"{name:<10}{concurrency:>12}{elapsed:>12.2f}{concurrency / elapsed:>10.1f}{stall * 1000:>18.0f}")
+    await openai_client.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
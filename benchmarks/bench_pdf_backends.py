@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark : bibliothèques d'extraction PDF (api/pdf_backends.py)
+
+Pour chaque PDF du corpus et chaque backend installé : temps d'extraction,
+nombre de caractères, lisibilité (text_quality) et, si un texte de
+référence <nom>.txt accompagne le PDF, similarité des mots avec celui-ci.
+Indique aussi l'ordre que choose_backends retient pour le document.
+
+Corpus : test-cv.pdf puis benchmarks/corpus/*.pdf, ou les fichiers passés
+en argument.
+
+Usage : python benchmarks/bench_pdf_backends.py [fichier.pdf ...]
+"""
+import difflib
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", 5))
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from pdf_backends import BACKENDS, probe_order, text_quality  # noqa: E402
+
+
+def corpus():
+    if len(sys.argv) > 1:
+        return sys.argv[1:]
+    return [os.path.join(ROOT, "test-cv.pdf")] + sorted(glob.glob(os.path.join(ROOT, "benchmarks", "corpus", "*.pdf")))
+
+
+def extract_all(backend, data: bytes) -> str:
+    document = backend.open(data)
+    try:
+        return "\n".join(backend.page_text(document, index) for index in range(backend.page_count(document)))
+    finally:
+        backend.close(document)
+
+
+def similarity(text: str, reference: str) -> float:
+    return round(difflib.SequenceMatcher(None, text.split(), reference.split(), autojunk=False).ratio(), 3)
+
+
+def main():
+    if not BACKENDS:
+        print("Aucune bibliothèque PDF installée (PyPDF2, pypdf, pdfminer.six, pypdfium2)")
+        return
+    print(f"Backends installés: {', '.join(f'{name} {backend.version}' for name, backend in BACKENDS.items())}")
+
+    for path in corpus():
+        with open(path, "rb") as f:
+            data = f.read()
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = f.read()
+        print(f"\n{os.path.basename(path)} ({len(data) // 1024} Ko) - ordre choisi: {', '.join(probe_order(data))}")
+        print(f"  {'backend':<12} {'ms':>9} {'caractères':>11} {'qualité':>8} {'référence':>10}")
+
+        for name, backend in BACKENDS.items():
+            try:
+                text = extract_all(backend, data)
+                start = time.perf_counter()
+                for _ in range(ITERATIONS):
+                    extract_all(backend, data)
+                elapsed = (time.perf_counter() - start) / ITERATIONS
+            except Exception as e:
+                print(f"  {name:<12} ❌ {e}")
+                continue
+            score = similarity(text, reference) if reference is not None else "-"
+            print(f"  {name:<12} {elapsed * 1000:9.2f} {len(text):11d} {text_quality(text):8.3f} {score:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark : sauvegarde des CV générés, écriture directe ou différée (api/write_behind.py)
+
+Un faux Firestore met latency_ms par commit. Des requêtes concurrentes
+sauvegardent chacune un document :
+
+- écriture directe (ancien code) : le commit est sur le chemin de la requête ;
+- WriteBehindQueue : la requête ne fait que mettre en file, les documents
+  partent par lots ; un commit sur trois échoue pour montrer les nouveaux
+  essais (aucun document perdu ni dupliqué).
+
+Usage : python benchmarks/bench_write_behind.py [requêtes] [latence_ms]
+"""
+import asyncio
+import os
+import sys
+import time
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+LATENCY = (float(sys.argv[2]) if len(sys.argv) > 2 else 40) / 1000
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import write_behind  # noqa: E402
+from write_behind import WriteBehindQueue  # noqa: E402
+
+write_behind.RETRY_BASE_DELAY = 0.05
+
+
+class FakeFirestore:
+    def __init__(self, fail_every: int = 0):
+        self.docs = {}
+        self.commits = 0
+        self.fail_every = fail_every
+
+    def commit(self, items):
+        time.sleep(LATENCY)
+        self.commits += 1
+        if self.fail_every and self.commits % self.fail_every == 0:
+            raise ConnectionError("deadline exceeded")
+        for doc_id, data in items:
+            self.docs[doc_id] = data
+
+
+async def handle_requests(save):
+    """Requêtes concurrentes ; retourne la latence moyenne de la sauvegarde côté requête"""
+    latencies = []
+
+    async def request(i):
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        await save((f"cv-{i}", {"user_id": f"user-{i % 50}", "ats_score": 80}))
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(request(i) for i in range(REQUESTS)))
+    return sum(latencies) / len(latencies)
+
+
+async def direct():
+    store = FakeFirestore()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # Au mieux de l'ancien code : commit dans un thread, attendu par la requête
+    latency = await handle_requests(lambda item: loop.run_in_executor(None, store.commit, [item]))
+    elapsed = time.perf_counter() - start
+    print(f"{'écriture directe':<28} requête {latency * 1000:8.2f} ms | {store.commits:4d} commits "
+          f"| {len(store.docs)} documents en {elapsed:.2f} s")
+
+
+async def queued():
+    store = FakeFirestore(fail_every=3)
+    queue = WriteBehindQueue("bench", store.commit, batch_size=50, flush_interval=0.2)
+    await queue.start()
+
+    async def save(item):
+        await queue.submit(item)
+
+    start = time.perf_counter()
+    latency = await handle_requests(save)
+    depth = queue.stats()["queue_depth"]
+    await queue.stop()
+    elapsed = time.perf_counter() - start
+    stats = queue.stats()
+    status = "✅" if len(store.docs) == REQUESTS and stats["failed"] == 0 else "❌"
+    print(f"{'WriteBehindQueue':<28} requête {latency * 1000:8.2f} ms | {store.commits:4d} commits "
+          f"| {len(store.docs)} documents en {elapsed:.2f} s {status}")
+    print(f"  file après les requêtes: {depth} | lots: {stats['batches']} (moy. {stats['avg_batch_size']}) "
+          f"| nouveaux essais: {stats['retries']} | commit moy. {stats['avg_flush_ms']} ms "
+          f"| délai moy. avant écriture {stats['avg_write_delay_ms']} ms")
+
+
+async def main():
+    print(f"{REQUESTS} CV sauvegardés, commit Firestore simulé à {LATENCY * 1000:.0f} ms\n")
+    await direct()
+    await queued()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,27 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import uvicorn
 import os
 import json
 from datetime import datetime
 from typing import Optional
-import openai
+import sys
+import asyncio
+
+# Modules partagés avec api/index.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+import openai_client
+from prompt_registry import get_template
+from input_compaction import compact_cv, compact_job_description, output_token_budget
+from ats_scoring import score_cv
+from language_detection import detect_language
+from user_profiles import cached_profile, load_profile, store_credits, store_profile
+from firebase_tokens import FirebaseTokenVerifier
+from credit_ledger import CreditLedger, FirestoreCreditStore, UnknownAccount
 
 # Firebase imports
 try:
@@ -106,17 +120,62 @@ if FIREBASE_AVAILABLE:
         print("🔄 Mode sans Firebase...")
         db = None
 
+# Vérification des ID tokens en cache, certificats préchargés (voir firebase_tokens.py)
+token_verifier = FirebaseTokenVerifier(
+    project_id=os.getenv("FIREBASE_PROJECT_ID", "cvbien-backend"),
+    fallback=auth.verify_id_token,
+    user_lookup=auth.get_user
+) if FIREBASE_AVAILABLE else None
+
+@app.on_event("startup")
+async def prefetch_firebase_certs():
+    """Certificats de signature téléchargés avant la première requête authentifiée"""
+    if token_verifier and db:
+        await asyncio.get_running_loop().run_in_executor(None, token_verifier.start)
+
+@app.on_event("shutdown")
+def stop_token_verifier():
+    if token_verifier:
+        token_verifier.stop()
+
+# Mouvements de crédits atomiques et livre des crédits (voir credit_ledger.py)
+credit_ledger = CreditLedger(FirestoreCreditStore(db)) if db else None
+
+@app.on_event("startup")
+def start_credit_ledger():
+    if credit_ledger:
+        credit_ledger.start()
+
+@app.on_event("shutdown")
+def flush_credit_ledger():
+    """Écrire les entrées du livre encore en attente"""
+    if credit_ledger:
+        credit_ledger.stop()
+
+@app.on_event("shutdown")
+async def shutdown_openai_client():
+    """Fermer le pool de connexions OpenAI"""
+    await openai_client.close_client()
+
 # Security
 security = HTTPBearer()
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_firebase_id_token(id_token: str) -> dict:
+    """Token en cache (sans attente), sinon vérification complète hors de la boucle (certificats, état du compte)"""
+    return token_verifier.verify_cached(id_token) or await run_in_threadpool(token_verifier.verify, id_token)
+
+async def load_user_profile(uid: str):
+    """Profil en cache (sans attente), sinon lecture Firestore hors de la boucle ; None s'il n'existe pas"""
+    return cached_profile(uid) or await run_in_threadpool(load_profile, db, uid, True, credit_ledger)
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Vérifier le token Firebase"""
     if not FIREBASE_AVAILABLE or not db:
         raise HTTPException(status_code=503, detail="Firebase non disponible")
     
     try:
         # Vérifier le token Firebase
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = await verify_firebase_id_token(credentials.credentials)
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Token invalide: {str(e)}")
@@ -153,14 +212,13 @@ async def validate_firebase_token(token_data: dict):
             raise HTTPException(status_code=400, detail="Token manquant")
         
         # Vérifier le token Firebase
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = await verify_firebase_id_token(id_token)
         uid = decoded_token['uid']
         
-        # Récupérer les infos utilisateur depuis Firestore
-        user_doc = db.collection('users').document(uid).get()
+        # Récupérer les infos utilisateur (cache, sinon Firestore)
+        user_data = await load_user_profile(uid)
         
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return {
                 "success": True,
                 "user": {
@@ -178,7 +236,8 @@ async def validate_firebase_token(token_data: dict):
                 "credits": 0,  # Nouveau compte sans crédits
                 "created_at": datetime.now().isoformat()
             }
-            db.collection('users').document(uid).set(user_data)
+            await run_in_threadpool(db.collection('users').document(uid).set, user_data)
+            store_profile(uid, user_data)
             
             return {
                 "success": True,
@@ -202,10 +261,9 @@ async def get_user_profile(current_user: dict = Depends(verify_token)):
     
     try:
         uid = current_user['uid']
-        user_doc = db.collection('users').document(uid).get()
+        user_data = await load_user_profile(uid)
         
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             return {
                 "success": True,
                 "user": {
@@ -231,75 +289,16 @@ async def optimize_cv(request: dict):
     try:
         cv_content = request.get("cv_content", "")
         job_description = request.get("job_description", "")
-        target_language = request.get("target_language", "french")
+        # Langue cible absente : détectée sur l'offre
+        target_language = request.get("target_language") or detect_language(job_description)
         instructions = request.get("instructions", "")
         
         print(f"🚀 Requête CV - Langue: {target_language}")
         print(f"📄 CV Content length: {len(cv_content)}")
         print(f"📋 Job Description length: {len(job_description)}")
         
-        # Instructions détaillées pour l'IA
-        detailed_instructions = """
-Instructions de Traitement du Modèle (Pour l'IA): 
-Objectif Principal : Adapter, reformuler et enrichir le CV actuel afin qu'il corresponde parfaitement à 100% aux exigences et au langage de l'offre d'emploi cible, positionnant le candidat comme le profil idéal.
-
-Analyse Approfondie :
-- Analyser le [Description d'Emploi Cible] pour identifier tous les mots-clés, les compétences techniques (hard skills), les qualités interpersonnelles (soft skills), les responsabilités et les exigences spécifiques (outils, méthodologies, certifications).
-- Analyser le [CV Actuel Complet] pour extraire toutes les informations pertinentes (expériences, formations, compétences, etc.).
-- S'assurer que 100% des informations du [CV Actuel Complet] sont conservées dans le nouveau CV, uniquement reformulées si nécessaire.
-
-Harmonisation et Reformulation (Stratégie d'Adaptation) :
-- Expériences Professionnelles : Pour chaque poste, réécrire les descriptions de responsabilités et d'accomplissements. Utiliser le langage et les mots-clés exacts trouvés dans l'offre d'emploi. Mettre l'accent sur les résultats (si possible, quantification) qui sont directement pertinents pour les fonctions listées dans l'offre cible. Chaque point doit sembler être une préparation directe au poste visé.
-- Éducation/Formation : Reformuler les descriptions de cours, projets ou mémoires pour souligner leur lien avec le domaine ou les technologies mentionnées dans l'offre d'emploi.
-
-Compétences Techniques (Hard Skills) :
-- Intégrer tous les outils/technologies mentionnés dans l'offre.
-- Règle du "Mensonge Blanc" : Si une compétence technique est demandée (ex. Python) et est absente du CV initial, l'ajouter avec une mention d'un niveau d'expertise de base ou intermédiaire (ex. "Bases solides en Python pour l'analyse de données" ou "Connaissance fonctionnelle de..."). NE PASinventer un niveau Expert si l'information n'est pas présente.
-
-Soft Skills : Intégrer tous les soft skills mentionnés dans l'offre d'emploi (ex. "Proactif", "Esprit d'équipe", "Résolution de problèmes complexes") dans la section Compétences sans justification supplémentaire.
-
-Rédaction des Éléments Clés :
-- Résumé Professionnel (Objectif) : Rédiger un paragraphe de 3-4 lignes percutant. Il doit immédiatement positionner le candidat comme la personne idéale en citant directement les exigences et la culture de l'entreprise (si elle est mentionnée) et en mentionnant les années d'expérience pertinentes et les compétences clés demandées dans l'offre.
-
-Structure et Mise en Forme (Pour l'Optimisation ATS) :
-Le nouveau CV doit respecter la structure exacte suivante pour faciliter la lecture des systèmes de suivi des candidatures (ATS) et des recruteurs :
-
-A. En-tête (Centré) :
-- Prénom NOM (Taille de police plus grande)
-- Informations de contact (Téléphone | E-mail | Lien LinkedIn/Portfolio) (Taille de police plus petite, centré)
-
-B. Résumé Professionnel (Centré) :
-- Le paragraphe rédigé selon l'instruction ci-dessus.
-
-C. Expériences Professionnelles (Titre Alignement à Gauche) :
-- Titre : EXPÉRIENCES PROFESSIONNELLES
-- Format : [Intitulé du Poste] | [Nom de l'Entreprise] | [Dates]
-- Liste à puces des responsabilités et réalisations reformulées.
-
-D. Éducation et Formations (Titre Alignement à Gauche) :
-- Titre : ÉDUCATION ET FORMATIONS
-- Format : [Diplôme] | [Établissement] | [Dates]
-- Liste des formations reformulées.
-
-E. Compétences (Titre Alignement à Gauche) :
-- Titre : COMPÉTENCES
-- Sous-sections claires :
-  - Hard Skills : Liste des technologies, outils, et méthodologies (y compris celles ajoutées via la règle du "Mensonge Blanc").
-  - Soft Skills : Liste de tous les soft skills demandés dans l'offre.
-  - Certifications/Projets : Toutes les certifications ou projets personnels/académiques mentionnés dans le CV initial. Pour chaque certification, ajouter une phrase explicative courte (ex: "Python Programming Certification (Certification professionnelle en programmation Python)").
-  - Langues : Niveaux de langue.
-
-F. Soft Skills (Titre Alignement à Gauche) :
-- Titre : SOFT SKILLS
-- Lister explicitement tous les soft skills demandés dans l'offre d'emploi avec des puces (ex: "• Leadership", "• Teamwork", "• Proactive", "• Analytical skills").
-
-Livrable : Le nouveau CV rédigé intégralement, structuré selon le format A-B-C-D-E, prêt à être copié/collé dans un document de mise en page. Ne pas fournir d'explication, seulement le CV final.
-        """
-        
         # Configuration OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        
-        if not openai.api_key:
+        if not os.getenv("OPENAI_API_KEY"):
             print("⚠️ OpenAI API Key non configurée, retour du CV original")
             return JSONResponse({
                 "success": True,
@@ -308,58 +307,25 @@ Livrable : Le nouveau CV rédigé intégralement, structuré selon le format A-B
                 "message": "CV retourné sans optimisation (OpenAI non configuré)"
             })
         
-        # Prompts selon la langue
-        language_prompts = {
-            "french": f"""
-{detailed_instructions}
-
-CV ACTUEL COMPLET:
-{cv_content}
-
-DESCRIPTION D'EMPLOI CIBLE:
-{job_description}
-
-Génère le nouveau CV optimisé selon les instructions ci-dessus, en français.
-""",
-            "english": f"""
-{detailed_instructions}
-
-CURRENT COMPLETE CV:
-{cv_content}
-
-TARGET JOB DESCRIPTION:
-{job_description}
-
-Generate the optimized CV according to the instructions above, in English.
-""",
-            "dutch": f"""
-{detailed_instructions}
-
-HUIDIGE VOLLEDIGE CV:
-{cv_content}
-
-DOELSTELLING FUNCTIEBESCHRIJVING:
-{job_description}
-
-Genereer de geoptimaliseerde CV volgens de bovenstaande instructies, in het Nederlands.
-"""
-        }
-        
-        prompt = language_prompts.get(target_language, language_prompts["french"])
+        # Prompt compilé selon la langue (instructions détaillées en préfixe statique)
+        try:
+            template = get_template(f"legacy_optimize_cv.{target_language}")
+        except KeyError:
+            template = get_template("legacy_optimize_cv.french")
         
         try:
             # Appel à l'API OpenAI
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Tu es un expert en recrutement et optimisation de CV. Tu adaptes parfaitement les CV aux offres d'emploi en respectant scrupuleusement toutes les instructions fournies."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.7
-            )
+            response = await openai_client.chat_completion({
+                "model": "gpt-4",
+                "messages": template.messages(
+                    cv_content=compact_cv(cv_content),
+                    job_description=compact_job_description(job_description)
+                ),
+                "max_tokens": output_token_budget(cv_content, ratio=1.5, floor=1200, ceiling=4000),
+                "temperature": 0.7
+            })
             
-            optimized_cv = response.choices[0].message.content.strip()
+            optimized_cv = response['choices'][0]['message']['content'].strip()
             
             # Calculer un score ATS réaliste
             ats_score = calculate_ats_score(optimized_cv, job_description)
@@ -394,48 +360,9 @@ Genereer de geoptimaliseerde CV volgens de bovenstaande instructies, in het Nede
         )
 
 def calculate_ats_score(cv_content: str, job_description: str) -> int:
-    """Calculer un score ATS réaliste basé sur la correspondance des mots-clés"""
+    """Calculer le score ATS (couverture pondérée des mots-clés de l'offre, voir api/ats_scoring.py)"""
     try:
-        # Extraire les mots-clés de l'offre d'emploi
-        job_keywords = set()
-        job_lower = job_description.lower()
-        
-        # Mots-clés techniques communs
-        tech_keywords = ['python', 'javascript', 'react', 'node', 'sql', 'excel', 'powerpoint', 'leadership', 'management', 'communication', 'project', 'team', 'analysis', 'data', 'development', 'design']
-        
-        for keyword in tech_keywords:
-            if keyword in job_lower:
-                job_keywords.add(keyword)
-        
-        # Extraire les mots-clés du CV
-        cv_keywords = set()
-        cv_lower = cv_content.lower()
-        
-        for keyword in tech_keywords:
-            if keyword in cv_lower:
-                cv_keywords.add(keyword)
-        
-        # Calculer le score de correspondance
-        if len(job_keywords) == 0:
-            return 80  # Score par défaut si pas de mots-clés détectés
-        
-        match_count = len(job_keywords.intersection(cv_keywords))
-        match_percentage = (match_count / len(job_keywords)) * 100
-        
-        # Bonus pour la structure
-        structure_bonus = 0
-        if 'experience' in cv_lower or 'expérience' in cv_lower:
-            structure_bonus += 10
-        if 'education' in cv_lower or 'formation' in cv_lower:
-            structure_bonus += 10
-        if 'skills' in cv_lower or 'compétences' in cv_lower:
-            structure_bonus += 10
-        if '@' in cv_content:  # Email
-            structure_bonus += 5
-        
-        final_score = min(100, match_percentage + structure_bonus)
-        return max(70, int(final_score))  # Score minimum de 70
-        
+        return score_cv(cv_content, job_description)["score"]
     except Exception as e:
         print(f"❌ Erreur calcul score ATS: {e}")
         return 80  # Score par défaut
@@ -555,22 +482,25 @@ async def confirm_payment_stripe(request: dict):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id manquant dans les métadonnées")
         
-        # Récupérer l'utilisateur
-        user_doc = db.collection('users').document(user_id).get()
-        print(f"🔧 DEBUG: user_doc.exists={user_doc.exists}")
-        
-        if not user_doc.exists:
+        # Mettre à jour les crédits, une seule fois par session
+        try:
+            new_credits, applied = await run_in_threadpool(
+                credit_ledger.credit, user_id, credits, "stripe", reference=session_id, idempotency_key=f"stripe:{session_id}"
+            )
+        except UnknownAccount:
             print(f"❌ Utilisateur {user_id} non trouvé dans Firestore")
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        store_credits(user_id, new_credits)
         
-        user_data = user_doc.to_dict()
-        current_credits = user_data.get("credits", 0)
-        new_credits = current_credits + credits
-        
-        print(f"🔧 DEBUG: current_credits={current_credits}, new_credits={new_credits}")
-        
-        # Mettre à jour les crédits
-        db.collection('users').document(user_id).update({"credits": new_credits})
+        if not applied:
+            print(f"⚠️ Session {session_id} déjà créditée - crédits déjà ajoutés")
+            return {
+                "success": True,
+                "credits": new_credits,
+                "added": credits,
+                "method": "already_processed",
+                "message": "Paiement déjà confirmé"
+            }
         
         print(f"✅ Crédits mis à jour via Stripe: {credits} ajoutés, total: {new_credits}")
         
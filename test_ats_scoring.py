@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests du score ATS local (api/ats_scoring.py) : les mots-clés manquants
+d'une offre française sont des compétences, pas des verbes conjugués ni
+des mots de remplissage
+
+Usage : python -m pytest test_ats_scoring.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+from ats_scoring import score_cv  # noqa: E402
+
+JOB_FR = """Data Analyst F/H - CDI - Lyon
+
+Qui sommes-nous ?
+Acteur majeur de la distribution alimentaire en France, notre groupe accompagne chaque jour des millions de clients. Pour renforcer notre direction Data, nous recherchons un(e) Data Analyst motivé(e) et curieux(se).
+
+Vos missions :
+- Vous concevez et maintenez les tableaux de bord de pilotage commercial sous Power BI
+- Vous analysez les ventes et les comportements d'achat pour proposer de nouvelles actions
+- Vous collaborez avec les équipes produit, marketing et finance
+- Vous automatisez la préparation des données en SQL et Python
+- Vous participez à la mise en place de nouveaux indicateurs de performance
+
+Profil recherché :
+- Diplômé(e) d'une école d'ingénieur ou d'un master en statistiques
+- 2 ans d'expérience minimum sur un poste similaire
+- Maîtrise de SQL, Python (pandas) et Power BI
+- Connaissance de Google Cloud Platform et BigQuery appréciée
+- Rigueur, esprit d'analyse et aisance relationnelle
+- Anglais courant
+
+Ce que nous vous proposons :
+- Télétravail jusqu'à 2 jours par semaine
+- Tickets restaurant, mutuelle, intéressement
+- Un environnement de travail stimulant au sein d'une équipe passionnée
+"""
+
+# Couvre les compétences de l'offre : seuls des termes peu importants restent manquants
+CV_MATCHING = """Marie Martin
+marie.martin@example.com
+
+EXPÉRIENCE
+Data Analyst - Retail SA (2021 - 2024)
+- Tableaux de bord Power BI et reporting des ventes, suivi des KPI
+- Requêtes SQL et scripts Python (pandas) sur Google Cloud Platform / BigQuery
+- Analyse des achats avec les équipes finance
+
+FORMATION
+Master statistiques - Université Lyon 2
+
+COMPÉTENCES
+SQL, Python, pandas, Power BI, BigQuery, rigueur, esprit d'analyse, communication
+Langues : anglais courant
+"""
+
+CV_JUNIOR = """Marie Martin
+marie.martin@example.com
+
+EXPÉRIENCE
+Analyste marketing - Retail SA (2021 - 2024)
+- Tableaux de bord Excel pour la direction commerciale
+
+FORMATION
+Master statistiques - Université Lyon 2
+
+COMPÉTENCES
+Excel, R, anglais
+"""
+
+FILLER = {
+    "cdi", "recherchons", "recherche", "concevez", "maintenez", "analysez", "nouvelles", "nouveaux",
+    "produit", "equipe", "appreciee", "similaire", "courant", "minimum", "ecole", "diplome",
+    "sommes-nous", "acteur", "majeur", "alimentaire",
+}
+
+
+def folded(term: str) -> str:
+    return term.lower().translate(str.maketrans("éèêàâîôûç", "eeeaaiouc"))
+
+
+def test_missing_keywords_are_not_filler():
+    report = score_cv(CV_MATCHING, JOB_FR)
+    missing = {folded(term) for term in report["missing"]}
+    assert not missing & FILLER, missing & FILLER
+    assert report["score"] >= 80
+
+
+def test_missing_skills_are_reported():
+    report = score_cv(CV_JUNIOR, JOB_FR)
+    missing = {folded(term) for term in report["missing"]}
+    for skill in ["power bi", "sql", "python", "pandas", "bigquery"]:
+        assert skill in missing, skill
+    assert not missing & FILLER, missing & FILLER
+    assert "English" in report["matched"]
+
+
+def test_no_sentence_reported_as_keyword():
+    for cv in (CV_MATCHING, CV_JUNIOR):
+        report = score_cv(cv, JOB_FR)
+        assert all(len(term.split()) <= 4 for term in report["missing"] + report["matched"])
+
+
+if __name__ == "__main__":
+    test_missing_keywords_are_not_filler()
+    test_missing_skills_are_reported()
+    test_no_sentence_reported_as_keyword()
+    print("✅ Tests ats_scoring OK")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests du grand livre des crédits (api/credit_ledger.py) avec MemoryCreditStore :
+crédit idempotent (session Stripe), débits sans découvert, comptes
+répartis sur plusieurs compteurs, écritures du livre par lots
+
+Usage : python -m pytest test_credit_ledger.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+from credit_ledger import CreditLedger, InsufficientCredits, MemoryCreditStore, UnknownAccount  # noqa: E402
+
+SHARDS = 8
+
+
+def make_ledger(balance: int, hot: bool = False, latency: float = 0.0, **kwargs) -> CreditLedger:
+    store = MemoryCreditStore({"u1": balance}, latency=latency)
+    return CreditLedger(store, hot_accounts={"u1"} if hot else (), shards=SHARDS, **kwargs)
+
+
+class SlowWrites(dict):
+    """Compteurs dont l'écriture prend du temps (aller-retour simulé) : élargit les courses"""
+
+    def __setitem__(self, key, value):
+        time.sleep(0.002)
+        super().__setitem__(key, value)
+
+
+def run_threads(count: int, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize("hot", [False, True])
+def test_same_idempotency_key_is_applied_once(hot):
+    ledger = make_ledger(5, hot=hot)
+    first = ledger.credit("u1", 10, "stripe", reference="cs_1", idempotency_key="stripe:cs_1")
+    second = ledger.credit("u1", 10, "stripe", reference="cs_1", idempotency_key="stripe:cs_1")
+    assert first == (15, True)
+    assert second == (15, False)
+    assert ledger.balance("u1") == 15
+    assert ledger.stats()["duplicate_credits"] == 1
+    # Entrée écrite dans la transaction, pas une seconde fois par lot
+    assert [entry["reference"] for entry in ledger.store.entries] == ["cs_1"]
+
+
+@pytest.mark.parametrize("hot", [False, True])
+def test_concurrent_credits_with_same_key_apply_once(hot):
+    # Confirmation et webhook en même temps, sur des compteurs différents
+    ledger = make_ledger(0, hot=hot, latency=0.002)
+    ledger.store.counters = SlowWrites(ledger.store.counters)
+    results = []
+    run_threads(16, lambda: results.append(
+        ledger.credit("u1", 10, "stripe", reference="cs_2", idempotency_key="stripe:cs_2")
+    ))
+    assert sum(applied for _, applied in results) == 1
+    assert ledger.balance("u1") == 10
+
+
+def test_debit_past_balance_is_rejected_across_shards():
+    ledger = make_ledger(0, hot=True)
+    # Solde réparti sur plusieurs compteurs
+    for _ in range(SHARDS * 2):
+        ledger.credit("u1", 1, "test")
+    assert ledger.balance("u1") == SHARDS * 2
+    with pytest.raises(InsufficientCredits):
+        ledger.debit("u1", SHARDS * 2 + 1, "consume")
+    assert ledger.balance("u1") == SHARDS * 2
+    assert ledger.stats()["rejected"] == 1
+    # Tout le solde, pris sur l'ensemble des compteurs
+    assert ledger.debit("u1", SHARDS * 2, "consume") == 0
+    assert all(value == 0 for (uid, _), value in ledger.store.counters.items() if uid == "u1")
+
+
+@pytest.mark.parametrize("hot", [False, True])
+def test_concurrent_debits_cannot_overdraw(hot):
+    ledger = make_ledger(20, hot=hot, latency=0.001)
+    if hot:
+        # Une partie du solde sur les autres compteurs
+        ledger.store.counters[("u1", 0)] = 4
+        for shard in range(1, SHARDS):
+            ledger.store.counters[("u1", shard)] = 2 + (shard == 1) * 2
+    assert ledger.balance("u1") == 20
+    outcomes = []
+
+    def consume():
+        try:
+            outcomes.append(ledger.debit("u1", 1, "consume"))
+        except InsufficientCredits:
+            outcomes.append(None)
+
+    run_threads(50, consume)
+    assert sum(outcome is not None for outcome in outcomes) == 20
+    assert ledger.balance("u1") == 0
+    assert all(value >= 0 for value in ledger.store.counters.values())
+
+
+def test_unknown_account_is_rejected():
+    ledger = make_ledger(5)
+    with pytest.raises(UnknownAccount):
+        ledger.debit("missing", 1, "consume")
+    with pytest.raises(UnknownAccount):
+        ledger.credit("missing", 1, "stripe", idempotency_key="stripe:cs_3")
+
+
+def test_entries_are_written_in_batches():
+    ledger = make_ledger(100, batch_size=5, flush_interval=3600)
+    ledger.start()
+    try:
+        for _ in range(12):
+            ledger.debit("u1", 1, "consume")
+        stats = ledger.stats()
+        assert (stats["entries_written"], stats["batches_written"], stats["pending_entries"]) == (10, 2, 2)
+    finally:
+        ledger.stop()
+    stats = ledger.stats()
+    assert (stats["entries_written"], stats["batches_written"], stats["pending_entries"]) == (12, 3, 0)
+    assert [entry["balance_after"] for entry in ledger.store.entries] == list(range(99, 87, -1))
+    assert all(entry["delta"] == -1 and entry["reason"] == "consume" for entry in ledger.store.entries)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
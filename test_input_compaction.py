@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests du nettoyage des entrées (api/input_compaction.py) : numéros de page
+retirés, dates seules sur leur ligne conservées
+
+Usage : python -m pytest test_input_compaction.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+from input_compaction import is_page_number, normalize_text  # noqa: E402
+
+
+def test_page_numbers_are_dropped():
+    for line in ["3", "- 3 -", "Page 2", "Page 2 sur 4", "pagina 1 van 3", "1/2", "2 / 3"]:
+        assert is_page_number(line), line
+    text = normalize_text("Expérience\n1/2\nChef de projet\nPage 2 sur 2")
+    assert text == "Expérience\nChef de projet"
+
+
+def test_date_only_lines_are_kept():
+    dates = ["09/2019", "03/2019 - 06/2021", "2019", "03/19", "9/19", "12/2020", "2018 - 2020"]
+    for line in dates:
+        assert not is_page_number(line), line
+    text = normalize_text("Chef de projet\n" + "\n".join(dates))
+    assert text.split("\n")[1:] == dates
+
+
+def test_page_numbers_kept_on_request():
+    assert normalize_text("Expérience\n1/2", drop_page_numbers=False) == "Expérience\n1/2"
+
+
+if __name__ == "__main__":
+    test_page_numbers_are_dropped()
+    test_date_only_lines_are_kept()
+    test_page_numbers_kept_on_request()
+    print("✅ Tests input_compaction OK")